@@ -16,6 +16,10 @@ class DecodeCatalystDocument
 
     private const MAX_RETRIES = 2;
 
+    private const SERVER_BUSY_RETRIES = 20;
+
+    private const SERVER_BUSY_DELAY = 250000; // 0.25 seconds, grows with each retry
+
     public function __invoke($binary)
     {
         // Validate input data
@@ -35,6 +39,14 @@ public function __invoke($binary)
         ];
         Log::debug('Processing binary data', $binaryInfo);
 
+        $socket = config('services.catalyst_decoder.socket');
+        if ($socket && file_exists($socket)) {
+            $decoded = $this->decodeWithServer($socket, $binary);
+            if ($decoded !== null) {
+                return $decoded;
+            }
+        }
+
         // Use Docker container paths (venv has required packages)
         $python = '/venv/bin/python3';
         $coseScript = '/scripts/decodeProposal.py';
@@ -121,12 +133,126 @@ public function __invoke($binary)
         throw $lastException ?: new \Exception('Failed to decode document after maximum retries');
     }
 
+    /**
+     * Decode through the resident decoder server in one "auto" request: the server reads the
+     * CBOR head and runs the COSE or the direct decoder, instead of trying one and then the other.
+     *
+     * SyncDocumentPage reads the direct decoder's output, payload[0] to [3] being the slots of a
+     * COSE_Sign array. "auto" runs the direct decoder for a COSE_Sign array, so the output is the
+     * one the scripts below produce, plus "format" and "decoder". Only a tagged COSE message is
+     * decoded differently: the COSE decoder returns its headers, body and signatures where the
+     * direct script returns the tag undecoded, and SyncDocumentPage finds no slots in either.
+     *
+     * Returns null when the server can't be reached, so the caller spawns the scripts instead;
+     * a server that stays busy throws, so the job is retried later rather than adding another
+     * decoder process to the load.
+     */
+    private function decodeWithServer(string $socket, $binary): ?array
+    {
+        $decoded = $this->requestWhenNotBusy($socket, 'auto', $binary);
+        if ($decoded !== null && isset($decoded['error'])) {
+            throw new \Exception('Decode failed on the decoder server: '.$decoded['error']);
+        }
+
+        return $decoded;
+    }
+
+    private function requestWhenNotBusy(string $socket, string $type, $binary): ?array
+    {
+        for ($retry = 1; $retry <= self::SERVER_BUSY_RETRIES; $retry++) {
+            $response = $this->requestFromServer($socket, $type, $binary);
+            if ($response === null || empty($response['busy'])) {
+                return $response;
+            }
+            $this->waitForServer($retry);
+        }
+
+        throw new \Exception('Decoder server busy after '.self::SERVER_BUSY_RETRIES.' retries');
+    }
+
+    protected function waitForServer(int $retry): void
+    {
+        usleep(self::SERVER_BUSY_DELAY * min($retry, 4));
+    }
+
+    /**
+     * @return resource|false
+     */
+    protected function connectToServer(string $socket)
+    {
+        $stream = @stream_socket_client('unix://'.$socket, $errno, $errstr, 5);
+        if ($stream === false) {
+            Log::warning("Decoder server unavailable at {$socket}: {$errstr}");
+        }
+
+        return $stream;
+    }
+
+    /**
+     * One request in the server's framing: a 4-byte big-endian length before the JSON header
+     * and before the document, and before the JSON response.
+     */
+    private function requestFromServer(string $socket, string $type, $binary): ?array
+    {
+        $stream = $this->connectToServer($socket);
+        if ($stream === false) {
+            return null;
+        }
+
+        try {
+            stream_set_timeout($stream, self::MAX_EXECUTION_TIME);
+            // --normalize resolves payload[0], [2] and [3], as for the scripts
+            $header = json_encode(['type' => $type, 'normalize' => true]);
+            $request = pack('N', strlen($header)).$header.pack('N', strlen($binary)).$binary;
+            $written = 0;
+            while ($written < strlen($request)) {
+                $sent = fwrite($stream, substr($request, $written));
+                if ($sent === false || $sent === 0) {
+                    Log::warning('Could not send the document to the decoder server');
+
+                    return null;
+                }
+                $written += $sent;
+            }
+
+            $length = $this->readFromServer($stream, 4);
+            $response = $length === null ? null : $this->readFromServer($stream, unpack('N', $length)[1]);
+            if ($response === null) {
+                Log::warning('Decoder server closed the connection or timed out');
+
+                return null;
+            }
+
+            $decoded = json_decode($response, true);
+
+            return is_array($decoded) ? $decoded : null;
+        } finally {
+            fclose($stream);
+        }
+    }
+
+    private function readFromServer($stream, int $length): ?string
+    {
+        $data = '';
+        while (strlen($data) < $length) {
+            $chunk = fread($stream, $length - strlen($data));
+            if ($chunk === false || $chunk === '') {
+                return null;
+            }
+            $data .= $chunk;
+        }
+
+        return $data;
+    }
+
     private function runDecoderWithTimeout($binary, $python, $script, $decoderType)
     {
         Log::debug("Running {$decoderType} decoder");
 
+        // --normalize resolves the hex / brotli / embedded documents in payload[0], [2] and [3]
+        // in the same process, so callers don't have to decode them again
         return Process::input($binary)
             ->timeout(self::MAX_EXECUTION_TIME)
-            ->run([$python, $script]);
+            ->run([$python, $script, '--normalize']);
     }
 }
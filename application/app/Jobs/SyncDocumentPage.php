@@ -69,12 +69,15 @@ public function handle(): void
                     continue;
                 }
 
+                // The decoder has already resolved payload[0], [2] and [3] when it reports "normalized"
+                $normalized = ! empty($decoded['normalized']);
+
                 // Check if we got actual proposal content or just metadata
                 $hasProposalContent = isset($decoded['payload'][1]) && ! empty($decoded['payload'][1]);
 
                 if (! $hasProposalContent) {
                     // Check if payload[2] contains hex-encoded brotli data directly
-                    if (isset($decoded['payload'][2]) && ! empty($decoded['payload'][2]) && is_string($decoded['payload'][2])) {
+                    if (! $normalized && isset($decoded['payload'][2]) && ! empty($decoded['payload'][2]) && is_string($decoded['payload'][2])) {
                         $proposalContent = $this->tryDecodeHexBrotliContent($decoded['payload'][2]);
 
                         if ($proposalContent) {
@@ -93,7 +96,7 @@ public function handle(): void
                     }
                 }
 
-                if (isset($decoded['payload'][0]) && is_string($decoded['payload'][0])) {
+                if (! $normalized && isset($decoded['payload'][0]) && is_string($decoded['payload'][0])) {
                     $decodedPayload0 = $this->tryDecodePayload0($decoded['payload'][0]);
                     if ($decodedPayload0) {
                         $decoded['payload'][0] = $decodedPayload0;
@@ -101,7 +104,7 @@ public function handle(): void
                     }
                 }
 
-                if (isset($decoded['payload'][3]) && is_array($decoded['payload'][3])) {
+                if (! $normalized && isset($decoded['payload'][3]) && is_array($decoded['payload'][3])) {
                     $decodedPayload3 = $this->tryDecodePayload3($decoded['payload'][3]);
                     if ($decodedPayload3) {
                         $decoded['payload'][3] = $decodedPayload3;
@@ -109,7 +112,7 @@ public function handle(): void
                 }
 
                 // Also try to decode payload[2] if it's still a hex string (even when payload[1] has content)
-                if (isset($decoded['payload'][2]) && is_string($decoded['payload'][2]) && ctype_xdigit($decoded['payload'][2])) {
+                if (! $normalized && isset($decoded['payload'][2]) && is_string($decoded['payload'][2]) && ctype_xdigit($decoded['payload'][2])) {
                     $decodedPayload2 = $this->tryDecodeHexString($decoded['payload'][2]);
                     if ($decodedPayload2) {
                         $decoded['payload'][2] = $decodedPayload2;
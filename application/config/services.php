@@ -66,4 +66,9 @@
     'catalystMilestone' => [
         'key' => env('CATALYST_MILESTONE_API_KEY'),
     ],
+
+    'catalyst_decoder' => [
+        // Unix socket of a running decoderServer.py --workers N; documents are decoded by spawning the scripts when unset
+        'socket' => env('DECODER_SOCKET'),
+    ],
 ];
@@ -75,8 +75,8 @@ public function it_retries_decoding_multiple_times_on_failure()
         // Mock PendingProcess to return our mock result
         $mockPendingProcess = Mockery::mock(PendingProcess::class);
         $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])->andReturn($mockResult);
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposal.py'])->andReturn($mockResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposal.py', '--normalize'])->andReturn($mockResult);
 
         Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->times(4); // 2 attempts × 2 methods each
 
@@ -110,7 +110,7 @@ public function it_successfully_decodes_valid_direct_cbor_data()
         // Mock PendingProcess
         $mockPendingProcess = Mockery::mock(PendingProcess::class);
         $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])->andReturn($mockResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockResult);
 
         Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->once();
 
@@ -145,8 +145,8 @@ public function it_falls_back_to_cose_decoder_when_direct_fails()
         // Mock PendingProcess
         $mockPendingProcess = Mockery::mock(PendingProcess::class);
         $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])->andReturn($mockDirectResult);
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposal.py'])->andReturn($mockCoseResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockDirectResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposal.py', '--normalize'])->andReturn($mockCoseResult);
 
         Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->twice();
 
@@ -176,7 +176,7 @@ public function it_handles_json_decode_errors_and_retries()
 
         $mockPendingProcess = Mockery::mock(PendingProcess::class);
         $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])->andReturn($mockResult1, $mockResult2);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockResult1, $mockResult2);
 
         Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->twice();
 
@@ -211,13 +211,13 @@ public function it_handles_process_signal_exceptions_and_retries()
         $mockPendingProcess1 = Mockery::mock(PendingProcess::class);
         $mockPendingProcess1->shouldReceive('timeout')->with(30)->andReturnSelf();
         $mockPendingProcess1->shouldReceive('run')
-            ->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])
+            ->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])
             ->andThrow($processException); // First call throws exception
 
         $mockPendingProcess2 = Mockery::mock(PendingProcess::class);
         $mockPendingProcess2->shouldReceive('timeout')->with(30)->andReturnSelf();
         $mockPendingProcess2->shouldReceive('run')
-            ->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])
+            ->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])
             ->andReturn($mockSuccessResult); // Second call succeeds
 
         Process::shouldReceive('input')->with($binaryData)
@@ -248,7 +248,7 @@ public function it_throws_exception_after_max_retries_with_signal_crashes()
         $mockPendingProcess = Mockery::mock(PendingProcess::class);
         $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
         $mockPendingProcess->shouldReceive('run')
-            ->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])
+            ->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])
             ->andThrow($processException);
 
         Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->times(2);
@@ -259,6 +259,129 @@ public function it_throws_exception_after_max_retries_with_signal_crashes()
         ($this->action)($binaryData);
     }
 
+    #[Test]
+    public function it_decodes_through_the_decoder_server_with_one_auto_request()
+    {
+        $binaryData = 'cose binary data';
+        $expectedDecoded = ['payload' => [['ver' => 'v1'], ['setup' => []]], 'format' => 'array', 'decoder' => 'direct'];
+
+        [$client, $server] = $this->serverConnection($this->serverReply($expectedDecoded));
+        $action = $this->actionWithServer([$client]);
+
+        Process::shouldReceive('input')->never();
+
+        $result = $action($binaryData);
+
+        expect($result)->toBe($expectedDecoded);
+
+        // One request: the auto header and the document, each after its length
+        $sent = stream_get_contents($server);
+        $headerLength = unpack('N', substr($sent, 0, 4))[1];
+        expect(json_decode(substr($sent, 4, $headerLength), true))->toBe(['type' => 'auto', 'normalize' => true]);
+        expect(substr($sent, 8 + $headerLength))->toBe($binaryData);
+    }
+
+    #[Test]
+    public function it_retries_a_busy_decoder_server()
+    {
+        $binaryData = 'cose binary data';
+        $busy = $this->serverReply(['error' => 'Decoder busy: 64 requests queued', 'busy' => true]);
+
+        $action = $this->actionWithServer([
+            $this->serverConnection($busy)[0],
+            $this->serverConnection($busy)[0],
+            $this->serverConnection($this->serverReply(['payload' => 'data']))[0],
+        ]);
+        $action->shouldReceive('waitForServer')->with(1)->once();
+        $action->shouldReceive('waitForServer')->with(2)->once();
+
+        Process::shouldReceive('input')->never();
+
+        expect($action($binaryData))->toBe(['payload' => 'data']);
+    }
+
+    #[Test]
+    public function it_throws_when_the_decoder_server_stays_busy()
+    {
+        $busy = $this->serverReply(['error' => 'Decoder busy: 64 requests queued', 'busy' => true]);
+        $clients = [];
+        for ($i = 0; $i < 20; $i++) {
+            $clients[] = $this->serverConnection($busy)[0];
+        }
+
+        $action = $this->actionWithServer($clients);
+        $action->shouldReceive('waitForServer')->times(20);
+
+        Process::shouldReceive('input')->never();
+
+        $this->expectException(Exception::class);
+        $this->expectExceptionMessage('Decoder server busy after 20 retries');
+
+        $action('cose binary data');
+    }
+
+    #[Test]
+    public function it_uses_the_decoder_scripts_when_the_socket_is_missing()
+    {
+        $binaryData = 'valid cbor binary data';
+        config(['services.catalyst_decoder.socket' => sys_get_temp_dir().'/missing-decoder.sock']);
+
+        Process::shouldReceive('input')->with($binaryData)->andReturn($this->directDecoderProcess(['payload' => 'data']))->once();
+
+        expect(($this->action)($binaryData))->toBe(['payload' => 'data']);
+
+        Log::shouldNotHaveReceived('warning');
+    }
+
+    #[Test]
+    public function it_uses_the_decoder_scripts_when_the_server_is_unreachable()
+    {
+        $binaryData = 'valid cbor binary data';
+        // A regular file: it exists, but nothing accepts connections on it
+        $socket = tempnam(sys_get_temp_dir(), 'decoder');
+        config(['services.catalyst_decoder.socket' => $socket]);
+
+        Process::shouldReceive('input')->with($binaryData)->andReturn($this->directDecoderProcess(['payload' => 'data']))->once();
+
+        try {
+            expect(($this->action)($binaryData))->toBe(['payload' => 'data']);
+        } finally {
+            unlink($socket);
+        }
+
+        Log::shouldHaveReceived('warning')->with(Mockery::pattern('/^Decoder server unavailable at /'));
+    }
+
+    #[Test]
+    public function it_uses_the_decoder_scripts_when_the_server_reply_is_truncated()
+    {
+        $binaryData = 'valid cbor binary data';
+        $reply = $this->serverReply(['payload' => 'data']);
+
+        $action = $this->actionWithServer([$this->serverConnection(substr($reply, 0, -4))[0]]);
+
+        Process::shouldReceive('input')->with($binaryData)->andReturn($this->directDecoderProcess(['payload' => 'data']))->once();
+
+        expect($action($binaryData))->toBe(['payload' => 'data']);
+
+        Log::shouldHaveReceived('warning')->with('Decoder server closed the connection or timed out');
+    }
+
+    #[Test]
+    public function it_throws_on_an_error_reply_from_the_decoder_server()
+    {
+        $action = $this->actionWithServer([
+            $this->serverConnection($this->serverReply(['error' => 'Data too short to be valid CBOR']))[0],
+        ]);
+
+        Process::shouldReceive('input')->never();
+
+        $this->expectException(Exception::class);
+        $this->expectExceptionMessage('Decode failed on the decoder server: Data too short to be valid CBOR');
+
+        $action('cose binary data');
+    }
+
     #[Test]
     public function it_logs_binary_data_characteristics_for_debugging()
     {
@@ -305,8 +428,8 @@ public function it_handles_successful_cose_output_with_error_field()
 
         $mockPendingProcess = Mockery::mock(PendingProcess::class);
         $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py'])->andReturn($mockDirectResult);
-        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposal.py'])->andReturn($mockCoseResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockDirectResult);
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposal.py', '--normalize'])->andReturn($mockCoseResult);
 
         Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->twice();
 
@@ -317,4 +440,52 @@ public function it_handles_successful_cose_output_with_error_field()
         // Should have tried COSE decoder after direct failed due to "error" in output
         Log::shouldHaveReceived('info')->with('Direct decode failed (attempt 1), trying COSE decoder');
     }
+
+    /**
+     * The action with its decoder server connections replaced by the given streams, in order
+     */
+    private function actionWithServer(array $clients)
+    {
+        $socket = tempnam(sys_get_temp_dir(), 'decoder');
+        $this->beforeApplicationDestroyed(fn () => @unlink($socket));
+        config(['services.catalyst_decoder.socket' => $socket]);
+
+        $action = Mockery::mock(DecodeCatalystDocument::class)->makePartial()->shouldAllowMockingProtectedMethods();
+        $action->shouldReceive('connectToServer')->with($socket)->times(count($clients))->andReturn(...$clients);
+
+        return $action;
+    }
+
+    /**
+     * A connected pair of streams: the client end for the action, and the server end, which has
+     * already written the reply and closed its side for writing
+     */
+    private function serverConnection(string $reply): array
+    {
+        [$client, $server] = stream_socket_pair(STREAM_PF_UNIX, STREAM_SOCK_STREAM, STREAM_IPPROTO_IP);
+        fwrite($server, $reply);
+        stream_socket_shutdown($server, STREAM_SHUT_WR);
+
+        return [$client, $server];
+    }
+
+    private function serverReply(array $response): string
+    {
+        $json = json_encode($response);
+
+        return pack('N', strlen($json)).$json;
+    }
+
+    private function directDecoderProcess(array $decoded)
+    {
+        $mockResult = Mockery::mock();
+        $mockResult->shouldReceive('successful')->andReturn(true);
+        $mockResult->shouldReceive('output')->andReturn(json_encode($decoded));
+
+        $mockPendingProcess = Mockery::mock(PendingProcess::class);
+        $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockResult);
+
+        return $mockPendingProcess;
+    }
 }
@@ -0,0 +1,82 @@
+<?php
+
+declare(strict_types=1);
+
+namespace Tests\Unit\Jobs;
+
+use App\Http\Integrations\CatalystGateway\Requests\GetDocumentRequest;
+use App\Jobs\SyncDocumentPage;
+use App\Jobs\SyncProposalJob;
+use Illuminate\Process\PendingProcess;
+use Illuminate\Support\Facades\Bus;
+use Illuminate\Support\Facades\Log;
+use Illuminate\Support\Facades\Process;
+use Mockery;
+use PHPUnit\Framework\Attributes\Test;
+use Saloon\Http\Faking\MockClient;
+use Saloon\Http\Faking\MockResponse;
+use Tests\TestCase;
+
+class SyncDocumentPageTest extends TestCase
+{
+    protected function setUp(): void
+    {
+        parent::setUp();
+        Log::spy();
+        Bus::fake([SyncProposalJob::class]);
+        // Decode through the process path, not a decoder server
+        config(['services.catalyst_decoder.socket' => null]);
+    }
+
+    protected function tearDown(): void
+    {
+        MockClient::destroyGlobal();
+        Mockery::close();
+        parent::tearDown();
+    }
+
+    #[Test]
+    public function it_skips_payload_decoding_when_the_decoder_normalized_the_document()
+    {
+        $binaryData = 'cose document bytes';
+        $hex = bin2hex('{"title": "not decoded again"}');
+        $decoded = [
+            'normalized' => true,
+            'payload' => [
+                $hex,
+                ['setup' => ['title' => 'Test Proposal', 'proposer' => ['applicant' => 'Test']], 'summary' => []],
+                $hex,
+                [['payload' => $hex], str_repeat('ab', 32)],
+            ],
+            'signatures' => [],
+        ];
+
+        MockClient::global([
+            GetDocumentRequest::class => MockResponse::make($binaryData, 200),
+        ]);
+
+        $mockResult = Mockery::mock();
+        $mockResult->shouldReceive('successful')->andReturn(true);
+        $mockResult->shouldReceive('output')->andReturn(json_encode($decoded));
+
+        $mockPendingProcess = Mockery::mock(PendingProcess::class);
+        $mockPendingProcess->shouldReceive('timeout')->with(30)->andReturnSelf();
+        $mockPendingProcess->shouldReceive('run')->with(['/venv/bin/python3', '/scripts/decodeProposalDirect.py', '--normalize'])->andReturn($mockResult);
+
+        // The document itself is the only decode: tryDecodePayload0 and tryDecodeHexString would decode the hex again
+        Process::shouldReceive('input')->with($binaryData)->andReturn($mockPendingProcess)->once();
+
+        (new SyncDocumentPage([['id' => 'doc-1']], 1, 10, 'fund-14'))->handle();
+
+        Log::shouldNotHaveReceived('debug', ['Attempting hex-brotli decode on payload[0]']);
+        Log::shouldNotHaveReceived('debug', ['Attempting CBOR decode on payload[0]']);
+        Log::shouldNotHaveReceived('debug', ['Found potential hex data in nested structure', Mockery::any()]);
+        Log::shouldNotHaveReceived('info', ['Successfully decoded payload[0] for doc-1']);
+        Log::shouldNotHaveReceived('info', ['Successfully decoded payload[2] for doc-1']);
+
+        Bus::assertDispatched(SyncProposalJob::class, function (SyncProposalJob $job) {
+            return $job->documentId === 'doc-1'
+                && $job->proposalDetail->setup->title === 'Test Proposal';
+        });
+    }
+}
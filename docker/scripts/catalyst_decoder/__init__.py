@@ -0,0 +1,9 @@
+"""
+Shared decoding logic for the Catalyst document and registration scripts.
+
+The scripts in /scripts are thin entry points around this package so the same
+code paths can be driven once per process (PHP spawning a script) or many
+times from a long-lived worker (see catalyst_decoder.server).
+"""
+
+DECODER_VERSION = '1'
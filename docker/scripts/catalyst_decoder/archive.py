@@ -0,0 +1,82 @@
+"""
+Whole-fund document archives.
+
+An archive is either a CBOR sequence (RFC 8742: documents back to back) or
+a tar of one document per member, optionally gzip/bz2/xz compressed. Both
+are read in one sequential pass and turned into batch records, so a fund
+import decodes every document with the existing COSE / direct logic and
+writes one JSONL index line per document:
+
+    {"index": 0, "id": "<tar member name>", "offset": 512, "length": 297, "result": {...}, "error": null}
+
+For CBOR sequences and plain tars "offset" is the document's byte offset in
+the archive file, and the documents are read through a memory mapping. A
+compressed tar can only be streamed, so its members are read as they go
+past and "offset" counts bytes of the uncompressed tar stream.
+"""
+import tarfile
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from catalyst_decoder.mapped import MalformedContainer, iter_item_spans, open_mapped
+from catalyst_decoder.proposals import MAX_INPUT_SIZE
+
+CBOR_SEQUENCE = 'cbor-seq'
+TAR = 'tar'
+COMPRESSED_TAR = 'tar-compressed'
+
+INDEX_FIELDS = ('offset', 'length')
+
+
+def archive_format(path: str) -> str:
+    if not tarfile.is_tarfile(path):
+        return CBOR_SEQUENCE
+    with open(path, 'rb') as f:
+        magic = f.read(6)
+    # gzip, bzip2, xz
+    if magic.startswith((b'\x1f\x8b', b'BZh', b'\xfd7zXZ')):
+        return COMPRESSED_TAR
+    return TAR
+
+
+def iter_members(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    One batch record per document, in archive order. Raises MalformedContainer
+    when a CBOR sequence stops in the middle of an item.
+    """
+    fmt = archive_format(path)
+
+    if fmt == CBOR_SEQUENCE:
+        for start, end in iter_item_spans(open_mapped(path)):
+            yield {'path': path, 'offset': start, 'length': end - start}
+        return
+
+    if fmt == TAR:
+        # Reading headers only; member data is sliced from the mapping by whoever decodes it
+        with tarfile.open(path, 'r:') as archive:
+            for member in archive:
+                if member.isfile():
+                    yield {'name': member.name, 'path': path, 'offset': member.offset_data, 'length': member.size}
+        return
+
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile():
+                record = {'name': member.name, 'offset': member.offset_data, 'length': member.size}
+                # Oversized members are skipped unread; archive_tasks reports them
+                if member.size <= MAX_INPUT_SIZE:
+                    record['data'] = archive.extractfile(member).read()
+                yield record
+
+
+def archive_tasks(path: str) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """Batch tasks for every document in an archive, ending with an error task if it is malformed."""
+    index = 0
+    try:
+        for record in iter_members(path):
+            if record['length'] > MAX_INPUT_SIZE:
+                yield index, record, f"Input too large: {record['length']} bytes"
+            else:
+                yield index, record, None
+            index += 1
+    except (MalformedContainer, tarfile.TarError) as e:
+        yield index, None, str(e)
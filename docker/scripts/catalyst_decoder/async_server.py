@@ -0,0 +1,263 @@
+"""
+Concurrent decoder server: any number of client connections, a bounded pool of decoders.
+
+    decoderServer.py --socket /run/decoder.sock --workers 4 [--max-in-flight 4] [--max-queue 64]
+
+The plain socket server (server.serve_socket) serves one connection until
+it closes, so concurrent queue workers either wait on each other or spawn
+an interpreter per document, and a burst of sync jobs ends up with dozens of
+decoder processes competing for the same cores and memory. Here an asyncio
+loop accepts every connection and reads requests as they arrive (the same
+framing as server.py, responses in request order on each connection), while
+the decoding itself, which is CPU-bound and holds the GIL, runs in a pool of
+--workers processes. Each worker has its own DecoderService, with its own
+connection to the --cache file and its own request timeout.
+
+Admission:
+
+    --max-in-flight  requests handed to the pool at once (default --workers;
+                     more only queues inside the executor, where it can't be
+                     counted or shed)
+    --max-queue      requests waiting for an in-flight slot. A request that
+                     finds the queue full is answered at once with
+                     {"error": "Decoder busy: ...", "busy": true}, so a burst
+                     is shed instead of growing memory and latency without
+                     bound. The caller should back off and retry.
+
+A connection reads its next request only after answering the one before, so
+a client that sends faster than it is answered is held back by the socket.
+
+"ping" and "stats" are answered by the loop without queueing; ping adds
+"pool" (workers, in-flight and queued requests, requests rejected so far).
+Metrics are collected in the workers and added up here (see metrics.py).
+
+Workers are spawned rather than forked, so they don't inherit the loop or
+its threads, and are all started (and preloaded) before the socket accepts
+anything. A worker that dies breaks the pool: the requests it held get an
+error and a new pool is started. SIGTERM stops accepting, finishes the
+requests already read, and exits.
+"""
+import os
+import sys
+import signal
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Set, Tuple
+
+from catalyst_decoder import DECODER_VERSION, metrics
+from catalyst_decoder.cache import DecodeCache
+from catalyst_decoder.encoding import dumps
+from catalyst_decoder.proposals import MAX_INPUT_SIZE
+from catalyst_decoder.server import FRAME_HEADER, MAX_HEADER_SIZE, DecoderService, ProtocolError, parse_header, preload
+from catalyst_decoder.signatures import SignatureDecoder
+
+DEFAULT_MAX_QUEUE = 64
+
+# The DecoderService of a pool worker, built once by _init_worker
+_worker_service: Optional[DecoderService] = None
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    global _worker_service
+    # Ctrl-C reaches the whole process group; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    preload()
+    cache = DecodeCache(options['cache'], options['cache_size']) if options.get('cache') else None
+    _worker_service = DecoderService(
+        request_timeout=options['request_timeout'],
+        cache=cache,
+        signatures=SignatureDecoder(options['replay_window']),
+        collect_metrics=options['collect_metrics'],
+    )
+
+
+def _worker_decode(request_type: str, raw_data: bytes, options: Dict[str, Any]) -> Tuple[bytes, Optional[metrics.Collector]]:
+    return _worker_service.decode_request(request_type, raw_data, options)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+async def read_frame_async(reader: asyncio.StreamReader, max_size: int) -> Optional[bytes]:
+    """server.read_frame for an asyncio stream."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ProtocolError(f"Unexpected end of stream ({len(e.partial)}/{FRAME_HEADER.size} bytes)")
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > max_size:
+        raise ProtocolError(f"Frame too large: {length} bytes")
+    if length == 0:
+        return b''
+    try:
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("Unexpected end of stream")
+
+
+async def write_frame_async(writer: asyncio.StreamWriter, data: bytes) -> None:
+    writer.write(FRAME_HEADER.pack(len(data)))
+    writer.write(data)
+    await writer.drain()
+
+
+class ConcurrentDecoderServer:
+    """Accepts connections on an event loop and decodes in a bounded process pool."""
+
+    def __init__(
+        self,
+        service: DecoderService,
+        worker_options: Dict[str, Any],
+        workers: int,
+        max_in_flight: int = 0,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+    ):
+        # Answers ping and stats, adds up metrics and counts requests against --max-requests
+        self.service = service
+        self.worker_options = worker_options
+        self.workers = workers
+        self.max_in_flight = max_in_flight or workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._connections: Set[asyncio.Task] = set()
+        # Connections waiting for their next request, closed right away on shutdown
+        self._idle: Set[asyncio.Task] = set()
+
+    def pool_stats(self) -> Dict[str, int]:
+        return {
+            'workers': self.workers,
+            'max_in_flight': self.max_in_flight,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'rejected': self.rejected,
+        }
+
+    def _start_pool(self) -> None:
+        self.executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.worker_options,),
+        )
+
+    async def respond(self, request_type: str, raw_data: bytes, options: Dict[str, Any]) -> bytes:
+        if request_type == 'ping':
+            return dumps({
+                'status': 'ok',
+                'version': DECODER_VERSION,
+                'pid': os.getpid(),
+                'pool': self.pool_stats(),
+            }).encode()
+        if request_type == 'stats':
+            return dumps(self.service.handle(request_type, raw_data, options)).encode()
+
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            return dumps({'error': f"Decoder busy: {self.queued} requests queued", 'busy': True}).encode()
+
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            encoded, collected = await self._decode(request_type, raw_data, options)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+        if collected is not None:
+            self.service.record_metrics(collected)
+        return encoded
+
+    async def _decode(self, request_type: str, raw_data: bytes, options: Dict[str, Any]) -> Tuple[bytes, Optional[metrics.Collector]]:
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, _worker_decode, request_type, raw_data, options)
+        except BrokenProcessPool:
+            # Every request the dead pool held ends up here; only the first replaces it
+            if self.executor is executor:
+                print("WARNING: Decoder worker died, starting a new pool", file=sys.stderr)
+                executor.shutdown(wait=False)
+                self._start_pool()
+            return dumps({'error': "Decoder worker crashed"}).encode(), None
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while not self._stopping.is_set():
+                self._idle.add(task)
+                try:
+                    header = await read_frame_async(reader, MAX_HEADER_SIZE)
+                    if header is None:
+                        return
+                    body = await read_frame_async(reader, MAX_INPUT_SIZE)
+                    if body is None:
+                        raise ProtocolError("Missing body frame")
+                except ProtocolError as e:
+                    # The stream can't be resynchronised after a bad frame
+                    await write_frame_async(writer, dumps({'error': str(e)}).encode())
+                    return
+                finally:
+                    self._idle.discard(task)
+
+                request = parse_header(header)
+                if request is None:
+                    response = dumps({'error': "Invalid request header"}).encode()
+                else:
+                    response = await self.respond(request['type'], body, request)
+
+                self.service.requests_served += 1
+                await write_frame_async(writer, response)
+                if self.service.exhausted:
+                    self._stopping.set()
+        except (asyncio.CancelledError, BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def serve(self, path: str, mode: int) -> None:
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._stopping = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self._stopping.set)
+
+        self._start_pool()
+        # Spawn and preload every worker before the first request is accepted
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _worker_ready) for _ in range(self.workers)))
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._serve_connection, path)
+        os.chmod(path, mode)
+        print(f"Decoder server listening on {path} with {self.workers} workers", file=sys.stderr)
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            for task in list(self._idle):
+                task.cancel()
+            # Connections with a request in progress answer it and then close
+            if self._connections:
+                await asyncio.gather(*self._connections, return_exceptions=True)
+            os.unlink(path)
+            self.executor.shutdown()
+
+    def run(self, path: str, mode: int) -> None:
+        asyncio.run(self.serve(path, mode))
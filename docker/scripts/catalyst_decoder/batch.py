@@ -0,0 +1,208 @@
+"""
+Line-oriented batch processing.
+
+Reads newline-delimited JSON records, runs each through a decode callable and
+writes one JSON line per record:
+
+    {"index": 0, "id": ..., "result": {...}, "error": null}
+
+"id" is copied from the input record when present, as are any meta_fields
+(e.g. an archive member's "offset" and "length"). A failing record gets
+"result": null and the error message, and the batch carries on.
+
+With workers > 1 records are fanned out to a process pool in chunks. Decoding
+and serialisation both happen in the workers, and output lines are still
+written in input order.
+"""
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional, TextIO, Tuple
+
+from catalyst_decoder import metrics
+from catalyst_decoder.batch_options import DEFAULT_BUFFER_SIZE, DEFAULT_CHUNKSIZE
+
+# Per-process state for pool workers, set once by _init_worker
+_worker_state = {}
+
+
+@dataclass
+class BatchStats:
+    records: int = 0
+    errors: int = 0
+
+
+def iter_jsonl(lines: Iterable[str]) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """Yield (index, record, parse error) for every non-blank line."""
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line), None
+        except ValueError as e:
+            yield index, None, f"Invalid JSON: {str(e)}"
+        index += 1
+
+
+def decode_record(decode: Callable[[Any], Any], record: Any, parse_error: Optional[str] = None) -> Tuple[Any, Optional[str]]:
+    if parse_error:
+        return None, parse_error
+    try:
+        # Each record gets its own "_metrics" when metrics are on (see metrics.py)
+        with metrics.record() as collected:
+            result = decode(record)
+        return metrics.attach(result, collected), None
+    except Exception as e:
+        return None, str(e)
+
+
+def format_result(
+    index: int,
+    record: Any,
+    result: Any,
+    error: Optional[str],
+    dumps: Callable[[Any], str],
+    id_field: str = 'id',
+    meta_fields: Tuple[str, ...] = (),
+) -> str:
+    line = {'index': index}
+    if isinstance(record, dict):
+        if id_field in record:
+            line['id'] = record[id_field]
+        for field in meta_fields:
+            if field in record:
+                line[field] = record[field]
+    line['result'] = result
+    line['error'] = error
+    try:
+        return dumps(line)
+    except Exception as e:
+        # A result we can't serialise is still a per-record error, not a batch failure
+        return dumps({'index': index, 'id': line.get('id'), 'result': None, 'error': f"Failed to serialize result: {str(e)}"})
+
+
+class BufferedLineWriter:
+    """Collects output lines and flushes once buffer_size characters are pending."""
+
+    def __init__(self, stream: TextIO, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = max(buffer_size, 1)
+        self.pending = []
+        self.pending_size = 0
+
+    def write_line(self, line: str) -> None:
+        self.pending.append(line)
+        self.pending.append('\n')
+        self.pending_size += len(line) + 1
+        if self.pending_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.stream.write(''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+        self.stream.flush()
+
+
+def process_task(
+    decode: Callable[[Any], Any],
+    dumps: Callable[[Any], str],
+    id_field: str,
+    meta_fields: Tuple[str, ...],
+    task: Tuple[int, Any, Optional[str]],
+) -> Tuple[str, bool]:
+    index, record, parse_error = task
+    result, error = decode_record(decode, record, parse_error)
+    return format_result(index, record, result, error, dumps, id_field, meta_fields), error is not None
+
+
+def _init_worker(decode: Callable[[Any], Any], dumps: Callable[[Any], str], id_field: str, meta_fields: Tuple[str, ...]) -> None:
+    _worker_state['args'] = (decode, dumps, id_field, meta_fields)
+
+
+def _run_worker_task(task: Tuple[int, Any, Optional[str]]) -> Tuple[str, bool]:
+    return process_task(*_worker_state['args'], task)
+
+
+def _pool_context():
+    # Imported here: only --workers > 1 needs it, and every script imports this module
+    import multiprocessing
+
+    # fork shares the already-imported decoder modules with the workers
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def parallel_results(
+    decode: Callable[[Any], Any],
+    tasks: Iterator[Tuple[int, Any, Optional[str]]],
+    dumps: Callable[[Any], str],
+    id_field: str,
+    meta_fields: Tuple[str, ...],
+    workers: int,
+    chunksize: int,
+) -> Iterator[Tuple[str, bool]]:
+    """Ordered results from a process pool, with at most a few chunks per worker in flight."""
+    chunksize = max(chunksize, 1)
+    # Pool.imap drains its input eagerly; the semaphore keeps stdin from being read
+    # far ahead of the output. Must stay >= 2 chunks or a partial chunk never dispatches.
+    in_flight = threading.BoundedSemaphore(max(workers * chunksize * 4, chunksize * 2))
+
+    def throttled():
+        for task in tasks:
+            in_flight.acquire()
+            yield task
+
+    with _pool_context().Pool(workers, initializer=_init_worker, initargs=(decode, dumps, id_field, meta_fields)) as pool:
+        for result in pool.imap(_run_worker_task, throttled(), chunksize):
+            in_flight.release()
+            yield result
+
+
+def run_batch(
+    decode: Callable[[Any], Any],
+    lines: Iterable[str],
+    out: TextIO,
+    dumps: Callable[[Any], str] = json.dumps,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    id_field: str = 'id',
+    workers: int = 1,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> BatchStats:
+    return run_tasks(decode, iter_jsonl(lines), out, dumps, buffer_size, id_field, workers, chunksize)
+
+
+def run_tasks(
+    decode: Callable[[Any], Any],
+    tasks: Iterator[Tuple[int, Any, Optional[str]]],
+    out: TextIO,
+    dumps: Callable[[Any], str] = json.dumps,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    id_field: str = 'id',
+    workers: int = 1,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    meta_fields: Tuple[str, ...] = (),
+) -> BatchStats:
+    """run_batch for records that don't come from JSONL, as (index, record, error) tasks."""
+    stats = BatchStats()
+    writer = BufferedLineWriter(out, buffer_size)
+
+    if workers > 1:
+        results = parallel_results(decode, tasks, dumps, id_field, meta_fields, workers, chunksize)
+    else:
+        results = (process_task(decode, dumps, id_field, meta_fields, task) for task in tasks)
+
+    try:
+        for line, failed in results:
+            stats.records += 1
+            if failed:
+                stats.errors += 1
+            writer.write_line(line)
+    finally:
+        writer.flush()
+
+    return stats
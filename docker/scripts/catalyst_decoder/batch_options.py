@@ -0,0 +1,17 @@
+"""
+The --batch options every script shares, without importing the batch runner.
+
+metadata_decoder.py builds its parser on every call but only runs a batch
+with --batch, so the runner (batch.py) is imported where it is used.
+"""
+import argparse
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_CHUNKSIZE = 16
+
+
+def add_batch_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--batch', action='store_true', help="Read newline-delimited records from stdin, one result line per record")
+    parser.add_argument('--workers', type=int, default=1, help="Decode batch records in a pool of this many processes")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Records handed to a worker at a time")
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE, help="Flush batch output once this many characters are pending")
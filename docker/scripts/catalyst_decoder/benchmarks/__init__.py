@@ -0,0 +1,9 @@
+"""
+Benchmarks for the decoder package, run from the scripts directory:
+
+    python3 -m catalyst_decoder.benchmarks.serialize docs/*.cbor
+    python3 -m catalyst_decoder.benchmarks.startup --baseline startup.json
+    python3 -m catalyst_decoder.benchmarks.decoders --output report.json
+    python3 -m catalyst_decoder.benchmarks.corpus --out corpus/
+    python3 -m catalyst_decoder.benchmarks.burst --clients 32 [--spawn]
+"""
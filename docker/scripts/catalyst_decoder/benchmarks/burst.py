@@ -0,0 +1,209 @@
+"""
+Throughput and memory under a burst of concurrent decode requests.
+
+    python3 -m catalyst_decoder.benchmarks.burst [--clients 32] [--requests 256] [--workers N]
+    python3 -m catalyst_decoder.benchmarks.burst --spawn [--clients 32] [--requests 256]
+
+--clients threads each take the next proposal from the corpus and decode it
+the way a sync job would (auto, --normalize), until --requests documents are
+done. By default they talk to a decoder server started with --workers
+processes (async_server.py); a "busy" answer is retried after
+--retry-delay and counted. With --spawn every request instead runs
+decodeProposal.py in a fresh interpreter, as DecodeCatalystDocument does
+without a decoder socket, so up to --clients interpreters run at once.
+
+Reported: documents per second, latency percentiles (a retried request's
+latency includes its waits), busy answers, and the peak combined RSS of
+every decoder process, sampled every 50 ms from /proc (Linux only).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from catalyst_decoder.benchmarks.corpus import build
+from catalyst_decoder.benchmarks.decoders import percentile
+from catalyst_decoder.client import DecoderClient
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SOCKET_PATH = '/tmp/decoder-burst.sock'
+
+
+def _children() -> Dict[int, List[int]]:
+    tree: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; the parent pid follows its closing paren
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        tree.setdefault(parent, []).append(int(entry))
+    return tree
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def descendant_rss_kb(root: int) -> int:
+    """Combined RSS of every process below root."""
+    tree = _children()
+    total = 0
+    stack = list(tree.get(root, []))
+    while stack:
+        pid = stack.pop()
+        total += _rss_kb(pid)
+        stack.extend(tree.get(pid, []))
+    return total
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            self.peak_kb = max(self.peak_kb, descendant_rss_kb(os.getpid()))
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak_kb
+
+
+def start_server(args) -> subprocess.Popen:
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+    command = [
+        sys.executable, 'decoderServer.py', '--socket', SOCKET_PATH,
+        '--workers', str(args.workers), '--max-queue', str(args.max_queue),
+    ]
+    server = subprocess.Popen(command, cwd=SCRIPTS_DIR, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while not os.path.exists(SOCKET_PATH):
+        if server.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Decoder server did not start")
+        time.sleep(0.1)
+    return server
+
+
+def run_burst(args, documents: List[bytes]) -> Dict[str, Any]:
+    lock = threading.Lock()
+    state = {'next': 0, 'busy': 0, 'errors': 0}
+    latencies: List[float] = []
+
+    def take() -> Any:
+        with lock:
+            if state['next'] >= args.requests:
+                return None
+            index = state['next']
+            state['next'] += 1
+        return documents[index % len(documents)]
+
+    def spawn_client() -> None:
+        while True:
+            raw = take()
+            if raw is None:
+                return
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, 'decodeProposal.py', '--normalize'],
+                cwd=SCRIPTS_DIR, input=raw, capture_output=True, check=False,
+            )
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                state['errors'] += result.returncode != 0 or b'"error"' in result.stdout[:200]
+
+    def socket_client() -> None:
+        with DecoderClient(SOCKET_PATH, timeout=120) as client:
+            while True:
+                raw = take()
+                if raw is None:
+                    return
+                start = time.perf_counter()
+                while True:
+                    response = client.decode('auto', raw, normalize=True)
+                    if not response.get('busy'):
+                        break
+                    with lock:
+                        state['busy'] += 1
+                    time.sleep(args.retry_delay)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    state['errors'] += 'error' in response
+
+    sampler = RssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        for future in [pool.submit(spawn_client if args.spawn else socket_client) for _ in range(args.clients)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    peak_kb = sampler.stop()
+
+    latencies.sort()
+    return {
+        'mode': 'spawn' if args.spawn else 'server',
+        'clients': args.clients,
+        'workers': None if args.spawn else args.workers,
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'docs_per_s': round(len(latencies) / elapsed, 2),
+        'latency_ms': {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 90, 99)},
+        'busy_retries': state['busy'],
+        'errors': state['errors'],
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Decode a burst of documents concurrently")
+    parser.add_argument('--clients', type=int, default=32, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=256, help="Documents to decode in total")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Decoder server processes")
+    parser.add_argument('--max-queue', type=int, default=64, help="Decoder server --max-queue")
+    parser.add_argument('--retry-delay', type=float, default=0.05, help="Seconds before retrying a busy answer")
+    parser.add_argument('--spawn', action='store_true', help="Spawn decodeProposal.py per document instead of using the server")
+    parser.add_argument('--seed', type=int, default=1, help="Corpus seed")
+    parser.add_argument('--output', help="Write the JSON result here")
+    args = parser.parse_args(argv)
+
+    documents = [raw for _, raw in build(args.seed)['proposals']]
+    server = None if args.spawn else start_server(args)
+    try:
+        result = run_burst(args, documents)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
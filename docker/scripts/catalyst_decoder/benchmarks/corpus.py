@@ -0,0 +1,331 @@
+"""
+Deterministic synthetic corpus for the decoder benchmarks.
+
+    python3 -m catalyst_decoder.benchmarks.corpus --out corpus/ [--seed 1] [--scale 1]
+
+Everything is derived from a seeded random.Random, so the same seed and scale
+give byte-identical documents on every machine and every commit, and a
+benchmark report can be diffed against one from an older tree. The corpus
+holds:
+
+- proposals: COSE_Sign (tag 98) documents shaped like the ones on the
+  Catalyst gateway (protected headers with type/id/ver UUIDs and
+  content-encoding br, one signer with a Catalyst ID kid), with a
+  brotli-compressed JSON or CBOR proposal body of one to a thousand
+  paragraphs (under a kilobyte to ~65 KB compressed, ~500 KB decompressed)
+- untagged_proposals: the same shape as a bare CBOR array, without the
+  COSE tag, which the direct and recursive decoders also handle
+- registrations: json_metadata of CIP-15 and CIP-36 (several weighted
+  delegations) registrations, and CIP-509 x509 envelopes carrying a DER
+  certificate with a web+cardano:// SAN, split into 64-byte chunks, raw,
+  brotli- and zstd-compressed (zstd only when zstandard is installed)
+- signatures: CIP-30 wallet login signatures, as DecodeWalletSignature.py
+  reads them
+
+Each proposal is signed by its own Ed25519 key, derived from the seed and
+named in its Catalyst ID kid, so --verify finds the signatures valid. The
+other keys and signatures are random bytes of the right length: nothing
+checks them, and the decoders only derive addresses from them.
+
+With --out the corpus is written as files the scripts read directly
+(proposals/*.cbor, registrations.jsonl, signatures.txt) plus corpus.json
+describing it.
+"""
+import os
+import sys
+import json
+import uuid
+import base64
+import random
+import hashlib
+import argparse
+from typing import Any, Dict, List, Tuple
+
+import brotli
+import cbor2
+from cbor2 import CBORTag
+from nacl.signing import SigningKey
+
+from catalyst_decoder.sniff import COSE_SIGN_TAG
+
+CORPUS_VERSION = 2
+
+USER_ROLE_PURPOSE = 'ca7a1457ef9f4c7f9c747f8c4a4cfa6c'
+PROPOSAL_TYPE = uuid.UUID('7808d2ba-d511-40af-84e8-c0d1625fdfdc')
+CHUNK_SIZE = 64
+
+# Paragraphs per proposal body; the body grows roughly 400 bytes per paragraph
+PROPOSAL_SIZES = (1, 4, 16, 64, 256, 1024)
+
+_WORDS = (
+    'cardano catalyst proposal community fund treasury milestone developer tooling '
+    'governance budget deliverable wallet adoption education open source audit '
+    'integration research network stake pool delegation voting outcome impact'
+).split()
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _random_bytes(rng: random.Random, size: int) -> bytes:
+    # random.randbytes is 3.9+
+    return rng.getrandbits(size * 8).to_bytes(size, 'big')
+
+
+def _uuid_tag(value: uuid.UUID) -> CBORTag:
+    return CBORTag(37, value.bytes)
+
+
+def _uuid7(rng: random.Random) -> uuid.UUID:
+    value = rng.getrandbits(128)
+    # version 7, RFC 4122 variant
+    value = (value & ~(0xf << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def proposal_body(rng: random.Random, paragraphs: int) -> Dict[str, Any]:
+    return {
+        'setup': {
+            'title': {'title': _text(rng, 6)},
+            'proposer': {'applicant': _text(rng, 2), 'type': 'Individual', 'coproposers': []},
+        },
+        'summary': {
+            'budget': {'requestedFunds': rng.randrange(10_000, 500_000)},
+            'time': {'duration': rng.randrange(1, 12)},
+            'problem': {'statement': _text(rng, 40)},
+            'solution': {'summary': _text(rng, 40)},
+        },
+        'details': {
+            'paragraphs': [_text(rng, 60) for _ in range(paragraphs)],
+        },
+        'milestones': [
+            {'title': _text(rng, 5), 'cost': rng.randrange(1_000, 50_000), 'outputs': _text(rng, 30)}
+            for _ in range(rng.randrange(2, 6))
+        ],
+    }
+
+
+def catalyst_id(public_key: bytes) -> str:
+    """A role 0, rotation 0 Catalyst ID: the key base64url-encoded without padding."""
+    return 'id.catalyst://cardano/' + base64.urlsafe_b64encode(public_key).rstrip(b'=').decode() + '/0/0'
+
+
+def proposal_document(rng: random.Random, paragraphs: int, cbor_body: bool = False, tagged: bool = True) -> bytes:
+    """A signed COSE_Sign proposal with a brotli-compressed body; untagged it is the bare array."""
+    body = proposal_body(rng, paragraphs)
+    raw = cbor2.dumps(body) if cbor_body else json.dumps(body).encode()
+    protected = cbor2.dumps({
+        # CoAP content formats: application/json, application/cbor
+        3: 60 if cbor_body else 50,
+        'content-encoding': 'br',
+        'type': _uuid_tag(PROPOSAL_TYPE),
+        'id': _uuid_tag(_uuid7(rng)),
+        'ver': _uuid_tag(_uuid7(rng)),
+    })
+    payload = brotli.compress(raw)
+    signing_key = SigningKey(_random_bytes(rng, 32))
+    sign_protected = cbor2.dumps({4: catalyst_id(bytes(signing_key.verify_key)).encode(), 1: -8})
+    # COSE Sig_structure, as verify.document_signatures rebuilds it
+    to_be_signed = cbor2.dumps(['Signature', protected, sign_protected, b'', payload])
+    signer = [sign_protected, {}, signing_key.sign(to_be_signed).signature]
+    message = [protected, {}, payload, [signer]]
+    return cbor2.dumps(CBORTag(COSE_SIGN_TAG, message) if tagged else message)
+
+
+def _hex(data: bytes) -> str:
+    return '0x' + data.hex()
+
+
+def _payment_address(rng: random.Random) -> bytes:
+    # Shelley base address, mainnet: key payment part, key stake part
+    return b'\x01' + _random_bytes(rng, 56)
+
+
+def cip15_metadata(rng: random.Random) -> Dict[str, Any]:
+    return {
+        '1': _hex(_random_bytes(rng, 32)),
+        '2': _hex(_random_bytes(rng, 32)),
+        '3': _hex(_payment_address(rng)),
+        '4': rng.randrange(10_000_000, 200_000_000),
+    }
+
+
+def cip36_metadata(rng: random.Random, delegations: int) -> Dict[str, Any]:
+    return {
+        '1': [[_hex(_random_bytes(rng, 32)), rng.randrange(1, 10)] for _ in range(delegations)],
+        '2': _hex(_random_bytes(rng, 32)),
+        '3': _hex(_payment_address(rng)),
+        '4': rng.randrange(10_000_000, 200_000_000),
+        '5': 0,
+    }
+
+
+def _der(tag: int, content: bytes) -> bytes:
+    size = len(content)
+    if size < 0x80:
+        return bytes([tag, size]) + content
+    length = size.to_bytes((size.bit_length() + 7) // 8, 'big')
+    return bytes([tag, 0x80 | len(length)]) + length + content
+
+
+def _der_name(common_name: str) -> bytes:
+    # Name -> RDN SET -> AttributeTypeAndValue (2.5.4.3 commonName, UTF8String)
+    attribute = _der(0x30, _der(0x06, b'\x55\x04\x03') + _der(0x0c, common_name.encode()))
+    return _der(0x30, _der(0x31, attribute))
+
+
+def der_certificate(rng: random.Random, stake_address: str) -> bytes:
+    """A structurally valid Ed25519 X.509 certificate with a web+cardano:// SAN (random signature)."""
+    ed25519 = _der(0x30, _der(0x06, b'\x2b\x65\x70'))
+    name = _der_name(f"user-{rng.getrandbits(32):08x}")
+    validity = _der(0x30, _der(0x17, b'250101000000Z') + _der(0x17, b'260101000000Z'))
+    public_key = _der(0x30, ed25519 + _der(0x03, b'\x00' + _random_bytes(rng, 32)))
+    names = _der(0x30, _der(0x82, b'example.org') + _der(0x86, f"web+cardano://addr/{stake_address}".encode()))
+    san = _der(0x30, _der(0x06, b'\x55\x1d\x11') + _der(0x04, names))
+    extensions = _der(0xa3, _der(0x30, san))
+    tbs = _der(0x30, (
+        _der(0xa0, _der(0x02, b'\x02'))
+        + _der(0x02, _random_bytes(rng, 8))
+        + ed25519 + name + validity + name + public_key + extensions
+    ))
+    return _der(0x30, tbs + ed25519 + _der(0x03, b'\x00' + _random_bytes(rng, 64)))
+
+
+def _stake_address(rng: random.Random) -> str:
+    from catalyst_decoder import keys
+    from pycardano import Network
+
+    return keys.stake_address(_random_bytes(rng, 32), Network.MAINNET)[1]
+
+
+def x509_metadata(rng: random.Random, compression: str, stake_address: str) -> Dict[str, Any]:
+    """A CIP-509 envelope: purpose, txn inputs hash, previous tx, chunked RBAC payload, validation signature."""
+    certificate = der_certificate(rng, stake_address)
+    rbac = cbor2.dumps({
+        10: [certificate],
+        30: [_random_bytes(rng, 32)],
+        100: [{0: 0, 1: [0, 0], 3: rng.randrange(0, 4)}],
+    })
+    if compression == 'brotli':
+        data, key = brotli.compress(rbac), '11'
+    elif compression == 'zstd':
+        data, key = zstandard.ZstdCompressor(level=3).compress(rbac), '12'
+    else:
+        data, key = rbac, '10'
+    return {
+        '0': _hex(bytes.fromhex(USER_ROLE_PURPOSE)),
+        '1': _hex(_random_bytes(rng, 16)),
+        '2': _hex(_random_bytes(rng, 32)),
+        key: [_hex(data[start:start + CHUNK_SIZE]) for start in range(0, len(data), CHUNK_SIZE)],
+        '99': _hex(_random_bytes(rng, 64)),
+    }
+
+
+def wallet_signature(rng: random.Random) -> str:
+    """A CIP-30 signData result as hex: [protected {alg, address}, {hashed}, message, signature]."""
+    protected = cbor2.dumps({1: -8, 'address': _payment_address(rng)})
+    message = f"Login to Catalyst Explorer {rng.getrandbits(64):016x}".encode()
+    return cbor2.dumps([protected, {'hashed': False}, message, _random_bytes(rng, 64)]).hex()
+
+
+def x509_compressions() -> Tuple[str, ...]:
+    return ('raw', 'brotli', 'zstd') if zstandard is not None else ('raw', 'brotli')
+
+
+def build(seed: int = 1, scale: int = 1) -> Dict[str, Any]:
+    """
+    The corpus for a seed: {"proposals": [(name, bytes)], "registrations":
+    [(name, json_metadata)], "signatures": [(name, hex)], "description": {...}}.
+    scale multiplies every count.
+    """
+    rng = random.Random(seed)
+
+    proposals: List[Tuple[str, bytes]] = []
+    for copy in range(4 * scale):
+        for paragraphs in PROPOSAL_SIZES:
+            for cbor_body in (False, True):
+                kind = 'cbor' if cbor_body else 'json'
+                proposals.append((f"proposal-{paragraphs}p-{kind}-{copy}", proposal_document(rng, paragraphs, cbor_body)))
+
+    registrations: List[Tuple[str, Dict[str, Any]]] = []
+    for number in range(25 * scale):
+        registrations.append((f"cip15-{number}", cip15_metadata(rng)))
+        registrations.append((f"cip36-{number}", cip36_metadata(rng, 1 + number % 4)))
+        stake_address = _stake_address(rng)
+        for compression in x509_compressions():
+            registrations.append((f"x509-{compression}-{number}", x509_metadata(rng, compression, stake_address)))
+
+    # The same shape without the COSE tag, as plain CBOR documents come from older sources
+    untagged: List[Tuple[str, bytes]] = []
+    for copy in range(2 * scale):
+        for paragraphs in PROPOSAL_SIZES:
+            untagged.append((f"untagged-{paragraphs}p-{copy}", proposal_document(rng, paragraphs, copy % 2 == 1, tagged=False)))
+
+    signatures = [(f"signature-{number}", wallet_signature(rng)) for number in range(100 * scale)]
+
+    fingerprint = hashlib.sha256()
+    for _, data in proposals + untagged:
+        fingerprint.update(data)
+    for _, metadata in registrations:
+        fingerprint.update(json.dumps(metadata, sort_keys=True).encode())
+    for _, signature in signatures:
+        fingerprint.update(signature.encode())
+
+    return {
+        'proposals': proposals,
+        'untagged_proposals': untagged,
+        'registrations': registrations,
+        'signatures': signatures,
+        'description': {
+            'version': CORPUS_VERSION,
+            'seed': seed,
+            'scale': scale,
+            'proposals': len(proposals),
+            'proposal_bytes': sum(len(data) for _, data in proposals),
+            'untagged_proposals': len(untagged),
+            'registrations': len(registrations),
+            'x509_compressions': list(x509_compressions()),
+            'signatures': len(signatures),
+            'sha256': fingerprint.hexdigest(),
+        },
+    }
+
+
+def write(corpus: Dict[str, Any], out: str) -> None:
+    os.makedirs(os.path.join(out, 'proposals'), exist_ok=True)
+    for name, data in corpus['proposals'] + corpus['untagged_proposals']:
+        with open(os.path.join(out, 'proposals', f"{name}.cbor"), 'wb') as f:
+            f.write(data)
+    # One transaction per line, as metadata_decoder.py --batch reads them
+    with open(os.path.join(out, 'registrations.jsonl'), 'w') as f:
+        for name, metadata in corpus['registrations']:
+            f.write(json.dumps({'id': name, 'json_metadata': metadata}) + '\n')
+    with open(os.path.join(out, 'signatures.txt'), 'w') as f:
+        for _, signature in corpus['signatures']:
+            f.write(signature + '\n')
+    with open(os.path.join(out, 'corpus.json'), 'w') as f:
+        json.dump(corpus['description'], f, indent=2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write the synthetic benchmark corpus")
+    parser.add_argument('--out', required=True, help="Directory to write the corpus to")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scale', type=int, default=1, help="Multiplies the number of documents of every kind")
+    args = parser.parse_args(argv)
+
+    corpus = build(args.seed, args.scale)
+    write(corpus, args.out)
+    print(json.dumps(corpus['description'], indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Throughput, latency and memory of every decoder on the synthetic corpus.
+
+    python3 -m catalyst_decoder.benchmarks.decoders [--repeat 5] [--output report.json]
+    python3 -m catalyst_decoder.benchmarks.decoders --compare before.json [--max-regression 0.2]
+
+Each benchmark runs what one of the entry points runs per input, in this
+process, over the corpus from corpus.py:
+
+    decodeProposal                    decode_with_options('cose', ...)        proposals
+    decodeProposalDirect              decode_with_options('direct', ...)      proposals
+    decodeProposalDirect:untagged     decode_with_options('direct', ...)      untagged_proposals
+    decodeProposalRecursive           decode_recursive(...)                   proposals
+    decodeProposalRecursive:untagged  decode_recursive(...)                   untagged_proposals
+    normalize_metadata                TransactionsService.normalize_metadata  registrations
+    decode_signature                  decode_signature(...)                   signatures
+
+Tagged and untagged documents take different paths through the direct and
+recursive decoders, so they are separate benchmarks rather than one mixed
+latency distribution.
+
+Interpreter start and imports are left out (benchmarks.startup measures
+those), and so is printing the result (benchmarks.serialize). One
+unrecorded pass warms up the lazy imports, then every --repeat pass times
+each input separately and each input keeps its fastest time, as
+serialize.py's best_time does, so a busy machine moves the numbers less.
+Percentiles and throughput are over those per-input times. The key
+derivation caches are cleared before each pass so registrations are
+measured the way one sync sees them. Memory is a
+separate pass under tracemalloc, which is too slow to time with: the peak
+Python allocation while decoding each input.
+
+The report is JSON with sorted keys, so two of them diff cleanly. With
+--compare the run is checked against an earlier report of the same corpus:
+it exits 1 when a benchmark's throughput fell, or its p90 latency or peak
+memory rose, by more than --max-regression. p99 is reported but not gated:
+on a corpus this size it is a handful of samples. On a shared or throttled
+host raise --scale and --repeat before trusting a small difference.
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tracemalloc
+from contextlib import redirect_stderr
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from catalyst_decoder import keys
+from catalyst_decoder.benchmarks.corpus import build
+from catalyst_decoder.proposals import decode_recursive, decode_with_options
+from catalyst_decoder.signatures import decode_signature
+
+REPORT_VERSION = 1
+
+PERCENTILES = (50, 90, 99)
+
+
+class _Null(io.TextIOBase):
+    def write(self, text: str) -> int:
+        return len(text)
+
+
+def _registration_decoder() -> Callable[[Dict[str, Any]], Any]:
+    # metadata_decoder lives next to the package, as the entry point scripts do
+    from metadata_decoder import TransactionsService
+
+    return TransactionsService().normalize_metadata
+
+
+def _decode_cose(raw: bytes) -> Any:
+    return decode_with_options('cose', raw)
+
+
+def _decode_direct(raw: bytes) -> Any:
+    return decode_with_options('direct', raw)
+
+
+# name -> (corpus section, decoder factory)
+BENCHMARKS: Dict[str, Tuple[str, Callable[[], Callable[[Any], Any]]]] = {
+    'decodeProposal': ('proposals', lambda: _decode_cose),
+    'decodeProposalDirect': ('proposals', lambda: _decode_direct),
+    'decodeProposalDirect:untagged': ('untagged_proposals', lambda: _decode_direct),
+    'decodeProposalRecursive': ('proposals', lambda: decode_recursive),
+    'decodeProposalRecursive:untagged': ('untagged_proposals', lambda: decode_recursive),
+    'normalize_metadata': ('registrations', _registration_decoder),
+    'decode_signature': ('signatures', lambda: decode_signature),
+}
+
+
+def input_size(item: Any) -> int:
+    if isinstance(item, (bytes, bytearray)):
+        return len(item)
+    if isinstance(item, str):
+        # Hex signatures
+        return len(item) // 2
+    return len(json.dumps(item))
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _failed(result: Any) -> bool:
+    return isinstance(result, dict) and ('error' in result or 'payload_error' in result)
+
+
+def run_pass(decode: Callable[[Any], Any], items: List[Any]) -> Tuple[List[float], int]:
+    """Seconds per item and the number of items that failed to decode."""
+    keys.clear_caches()
+    timings = []
+    errors = 0
+    for item in items:
+        start = time.perf_counter()
+        try:
+            failed = _failed(decode(item))
+        except Exception:
+            failed = True
+        timings.append(time.perf_counter() - start)
+        errors += failed
+    return timings, errors
+
+
+def memory_pass(decode: Callable[[Any], Any], items: List[Any]) -> List[int]:
+    """Peak traced allocation in bytes while decoding each item."""
+    keys.clear_caches()
+    peaks = []
+    for item in items:
+        tracemalloc.start()
+        try:
+            decode(item)
+        except Exception:
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return peaks
+
+
+def benchmark(decode: Callable[[Any], Any], items: List[Any], repeat: int) -> Dict[str, Any]:
+    total_bytes = sum(input_size(item) for item in items)
+
+    run_pass(decode, items)
+    timings = [float('inf')] * len(items)
+    errors = 0
+    for _ in range(repeat):
+        pass_timings, errors = run_pass(decode, items)
+        timings = [min(best, timing) for best, timing in zip(timings, pass_timings)]
+    peaks = memory_pass(decode, items)
+
+    elapsed = sum(timings)
+    timings.sort()
+    latency = {f"p{p}": round(percentile(timings, p) * 1000, 4) for p in PERCENTILES}
+    latency['max'] = round(timings[-1] * 1000, 4)
+    latency['mean'] = round(elapsed / len(timings) * 1000, 4)
+    return {
+        'items': len(items),
+        'bytes': total_bytes,
+        'passes': repeat,
+        'errors': errors,
+        'items_per_s': round(len(timings) / elapsed, 2) if elapsed else None,
+        'mb_per_s': round(total_bytes / elapsed / 1e6, 3) if elapsed else None,
+        'latency_ms': latency,
+        'peak_memory_kb': {
+            'max': round(max(peaks) / 1024, 1),
+            'mean': round(sum(peaks) / len(peaks) / 1024, 1),
+        },
+    }
+
+
+def compare(report: Dict[str, Any], previous: Dict[str, Any], max_regression: float) -> List[str]:
+    """Regressions of report against previous, also printing the change of every metric."""
+    if previous.get('corpus', {}).get('sha256') != report['corpus']['sha256']:
+        return ["Baseline was measured on a different corpus (seed, scale, corpus version or zstd availability differ)"]
+
+    regressions = []
+    print(f"\n{'benchmark':<33} {'items/s':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'peak KB':>8}   (change vs baseline)")
+    for name, result in report['benchmarks'].items():
+        before = previous.get('benchmarks', {}).get(name)
+        if before is None:
+            continue
+        changes = {
+            'items/s': _change(result['items_per_s'], before['items_per_s']),
+            'p50': _change(result['latency_ms']['p50'], before['latency_ms']['p50']),
+            'p90': _change(result['latency_ms']['p90'], before['latency_ms']['p90']),
+            'p99': _change(result['latency_ms']['p99'], before['latency_ms']['p99']),
+            'peak KB': _change(result['peak_memory_kb']['max'], before['peak_memory_kb']['max']),
+        }
+        print(f"{name:<33} " + ' '.join(f"{changes[c]:>+8.1%}" if changes[c] is not None else f"{'-':>8}" for c in changes))
+
+        if changes['items/s'] is not None and changes['items/s'] < -max_regression:
+            regressions.append(f"{name}: throughput {changes['items/s']:+.1%}")
+        for metric in ('p90', 'peak KB'):
+            if changes[metric] is not None and changes[metric] > max_regression:
+                regressions.append(f"{name}: {metric} {changes[metric]:+.1%}")
+    return regressions
+
+
+def _change(after: Optional[float], before: Optional[float]) -> Optional[float]:
+    if not after or not before:
+        return None
+    return after / before - 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the decoders on the synthetic corpus")
+    parser.add_argument('--seed', type=int, default=1, help="Corpus seed")
+    parser.add_argument('--scale', type=int, default=1, help="Corpus size multiplier")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed passes over the corpus per benchmark")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS), help="Run only these benchmarks (repeatable)")
+    parser.add_argument('--output', help="Write the JSON report here")
+    parser.add_argument('--compare', help="Earlier report to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="Allowed change against --compare, as a fraction")
+    args = parser.parse_args(argv)
+
+    corpus = build(args.seed, args.scale)
+    report = {
+        'version': REPORT_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus': corpus['description'],
+        'repeat': args.repeat,
+        'benchmarks': {},
+    }
+
+    print(f"{'benchmark':<33} {'items':>6} {'items/s':>10} {'MB/s':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KB':>9} {'errors':>6}")
+    for name, (section, factory) in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+        items = [item for _, item in corpus[section]]
+        # The decoders' debug output goes to stderr; it is part of the cost, not of the report
+        with redirect_stderr(_Null()):
+            result = benchmark(factory(), items, args.repeat)
+        report['benchmarks'][name] = result
+        latency = result['latency_ms']
+        print(
+            f"{name:<33} {result['items']:>6} {result['items_per_s']:>10.1f} {result['mb_per_s']:>8.2f} "
+            f"{latency['p50']:>9.3f} {latency['p90']:>9.3f} {latency['p99']:>9.3f} "
+            f"{result['peak_memory_kb']['max']:>9.1f} {result['errors']:>6}"
+        )
+
+    report['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(report, previous, args.max_regression)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
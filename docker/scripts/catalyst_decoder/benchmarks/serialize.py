@@ -0,0 +1,83 @@
+"""
+Compare the JSON output paths on real documents.
+
+    python3 -m catalyst_decoder.benchmarks.serialize [--decoder auto] [--repeat 20] FILE...
+
+Each document is decoded once, then serialised repeatedly with the old
+json.dumps(cls=CustomEncoder) call and with every available Serializer
+backend. Times are per document, best of --repeat, next to the decode time
+so the share of serialisation is visible. Every backend's output is parsed
+back and checked against the old encoder's.
+"""
+import sys
+import json
+import time
+import argparse
+from typing import Callable, List
+
+from catalyst_decoder.encoding import JSON, ORJSON, CustomEncoder, Serializer, load_orjson
+from catalyst_decoder.proposals import DECODERS, DecodeError, read_input
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark decoder JSON serialisation")
+    parser.add_argument('files', nargs='+', help="Document files (raw COSE / CBOR)")
+    parser.add_argument('--decoder', default='auto', choices=sorted(DECODERS), help="Decoder producing the results to serialise")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per measurement, the fastest is reported")
+    args = parser.parse_args(argv)
+
+    backends = [JSON] + ([ORJSON] if load_orjson() is not None else [])
+    serializers = {backend: Serializer(backend=backend) for backend in backends}
+    decode = DECODERS[args.decoder]
+
+    columns = ['decode', 'CustomEncoder'] + backends
+    print(f"{'document':<40} {'bytes':>9} " + ' '.join(f"{c + ' ms':>16}" for c in columns))
+
+    totals = {column: 0.0 for column in columns}
+    mismatches: List[str] = []
+    for path in args.files:
+        try:
+            raw_data = read_input(path)
+        except DecodeError as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            continue
+
+        result = decode(raw_data)
+        reference = json.dumps(result, cls=CustomEncoder)
+        for backend, serializer in serializers.items():
+            if json.loads(serializer.dumps(result)) != json.loads(reference):
+                mismatches.append(f"{path} ({backend})")
+
+        timings = {
+            'decode': best_time(lambda: decode(raw_data), args.repeat),
+            'CustomEncoder': best_time(lambda: json.dumps(result, cls=CustomEncoder), args.repeat),
+        }
+        for backend, serializer in serializers.items():
+            timings[backend] = best_time(lambda: serializer.dumps(result), args.repeat)
+
+        for column in columns:
+            totals[column] += timings[column]
+        print(f"{path[-40:]:<40} {len(raw_data):>9} " + ' '.join(f"{timings[c] * 1000:>16.3f}" for c in columns))
+
+    print(f"{'total':<40} {'':>9} " + ' '.join(f"{totals[c] * 1000:>16.3f}" for c in columns))
+    for backend in backends:
+        if totals[backend]:
+            print(f"{backend}: {totals['CustomEncoder'] / totals[backend]:.2f}x the CustomEncoder throughput")
+
+    if mismatches:
+        print("Output differs from CustomEncoder for: " + ', '.join(mismatches), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
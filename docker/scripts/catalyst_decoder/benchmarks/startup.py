@@ -0,0 +1,159 @@
+"""
+Cold-start cost of each decoder entry point.
+
+    python3 -m catalyst_decoder.benchmarks.startup [--repeat 5] [--output startup.json]
+    python3 -m catalyst_decoder.benchmarks.startup --baseline startup.json [--tolerance 0.25]
+
+PHP spawns a fresh interpreter per document, and a scaled-up container
+starts every worker from cold, so the time and memory an entry point spends
+importing before it reads its input is paid on every call. Each script's
+top-level imports are run in a fresh interpreter (the scripts themselves
+read stdin and exit as soon as they run), recording wall time, peak RSS and
+which of the heavy libraries got loaded. An empty interpreter is measured
+the same way for reference.
+
+The run fails (exit 1) when an entry point imports a library it must only
+load on demand (pycardano, pycose, numpy, nacl, orjson, multiprocessing;
+see LAZY_MODULES), when its best import time or peak RSS exceeds
+--max-import-ms / --max-rss-mb, or when either grew more than --tolerance
+over the --baseline report.
+"""
+import os
+import sys
+import ast
+import json
+import argparse
+import subprocess
+from typing import Any, Dict, List, Optional
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENTRY_POINTS = [
+    'decodeProposal.py',
+    'decodeProposalDirect.py',
+    'decodeProposalRecursive.py',
+    'decodeDocument.py',
+    'metadata_decoder.py',
+    'DecodeWalletSignature.py',
+    'decoderServer.py',
+    'indexRegistrations.py',
+]
+
+# Imported only by the code paths that use them
+LAZY_MODULES = ['pycardano', 'pycose', 'numpy', 'nacl', 'orjson', 'multiprocessing']
+
+DEFAULT_MAX_IMPORT_MS = 500
+DEFAULT_MAX_RSS_MB = 80
+
+# Runs in the child: time the imports, then report peak RSS and what got loaded
+_PROBE = '''
+import sys, time, json, resource
+start = time.perf_counter()
+exec(compile(sys.argv[1], sys.argv[2], 'exec'), {'__name__': '__startup__'})
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'import_ms': elapsed * 1000,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'loaded': [name for name in json.loads(sys.argv[3]) if name in sys.modules],
+}))
+'''
+
+
+def entry_imports(path: str) -> str:
+    """The module-level import statements of a script, as source."""
+    with open(path) as f:
+        source = f.read()
+    imports = [
+        ast.get_source_segment(source, node)
+        for node in ast.parse(source, path).body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+    return '\n'.join(imports) or 'pass'
+
+
+def measure(source: str, name: str, python: str) -> Dict[str, Any]:
+    result = subprocess.run(
+        [python, '-c', _PROBE, source, name, json.dumps(LAZY_MODULES)],
+        cwd=SCRIPTS_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{name}: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}")
+    return json.loads(result.stdout)
+
+
+def profile(source: str, name: str, python: str, repeat: int) -> Dict[str, Any]:
+    """Best import time and peak RSS over repeat cold starts."""
+    runs = [measure(source, name, python) for _ in range(repeat)]
+    times = sorted(run['import_ms'] for run in runs)
+    return {
+        'import_ms': round(times[0], 2),
+        'import_ms_median': round(times[len(times) // 2], 2),
+        'rss_mb': round(min(run['rss_kb'] for run in runs) / 1024, 2),
+        'loaded': runs[0]['loaded'],
+    }
+
+
+def check(report: Dict[str, Any], args, baseline: Optional[Dict[str, Any]]) -> List[str]:
+    failures = []
+    for name, entry in report['entry_points'].items():
+        for module in entry['loaded']:
+            failures.append(f"{name} imports {module} at startup")
+        if entry['import_ms'] > args.max_import_ms:
+            failures.append(f"{name} imports in {entry['import_ms']:.1f} ms (budget {args.max_import_ms} ms)")
+        if entry['rss_mb'] > args.max_rss_mb:
+            failures.append(f"{name} peaks at {entry['rss_mb']:.1f} MB RSS (budget {args.max_rss_mb} MB)")
+
+        previous = (baseline or {}).get('entry_points', {}).get(name)
+        if previous is None:
+            continue
+        for metric in ('import_ms', 'rss_mb'):
+            limit = previous[metric] * (1 + args.tolerance)
+            if entry[metric] > limit:
+                failures.append(f"{name} {metric} {entry[metric]} over baseline {previous[metric]} (+{args.tolerance:.0%})")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import time and memory of the decoder entry points")
+    parser.add_argument('scripts', nargs='*', default=ENTRY_POINTS, help="Entry point scripts (default: all)")
+    parser.add_argument('--python', default=sys.executable, help="Interpreter to measure with")
+    parser.add_argument('--repeat', type=int, default=5, help="Cold starts per entry point, the fastest is compared")
+    parser.add_argument('--max-import-ms', type=float, default=DEFAULT_MAX_IMPORT_MS, help="Import time budget per entry point")
+    parser.add_argument('--max-rss-mb', type=float, default=DEFAULT_MAX_RSS_MB, help="Peak RSS budget per entry point")
+    parser.add_argument('--baseline', help="Earlier --output report to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed growth over the baseline, as a fraction")
+    parser.add_argument('--output', help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    interpreter = profile('pass', '<interpreter>', args.python, args.repeat)
+    report = {'python': args.python, 'repeat': args.repeat, 'interpreter': interpreter, 'entry_points': {}}
+
+    print(f"{'entry point':<28} {'import ms':>10} {'median ms':>10} {'RSS MB':>8}  loaded")
+    print(f"{'(empty interpreter)':<28} {interpreter['import_ms']:>10.2f} {interpreter['import_ms_median']:>10.2f} {interpreter['rss_mb']:>8.1f}")
+    for script in args.scripts:
+        name = os.path.basename(script)
+        path = script if os.path.isabs(script) else os.path.join(SCRIPTS_DIR, script)
+        entry = profile(entry_imports(path), name, args.python, args.repeat)
+        report['entry_points'][name] = entry
+        print(f"{name:<28} {entry['import_ms']:>10.2f} {entry['import_ms_median']:>10.2f} {entry['rss_mb']:>8.1f}  {', '.join(entry['loaded']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = check(report, args, baseline)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
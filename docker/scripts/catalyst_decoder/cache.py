@@ -0,0 +1,138 @@
+"""
+On-disk cache of decoder output, keyed by what was decoded.
+
+Most documents don't change between sync runs, so the same bytes get
+decoded again on every sync and every retry. Entries are keyed by
+sha256(DECODER_VERSION, request type, input bytes) and hold the serialised
+JSON response, so a hit skips both decoding and serialisation. Bumping
+DECODER_VERSION invalidates everything.
+
+Storage is a single SQLite file. When the stored values outgrow max_bytes
+the least recently used entries are evicted down to EVICT_TO of the limit.
+The total size is a row in the same file, updated in the transaction that
+writes or deletes an entry, so the server's workers, each with its own
+connection, count each other's writes and the file as a whole stays under
+max_bytes.
+"""
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from catalyst_decoder import DECODER_VERSION
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TO = 0.9
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS decode_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decode_cache_last_used ON decode_cache (last_used);
+CREATE TABLE IF NOT EXISTS decode_cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO decode_cache_size (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM decode_cache;
+'''
+
+
+def cache_key(request_type: str, raw_data: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(DECODER_VERSION.encode())
+    digest.update(b'\0')
+    digest.update(request_type.encode())
+    digest.update(b'\0')
+    digest.update(raw_data)
+    return digest.hexdigest()
+
+
+class DecodeCache:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # IMMEDIATE takes the write lock up front, so the size read inside is the one written back
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _stored_size(self) -> int:
+        return self._conn.execute('SELECT bytes FROM decode_cache_size WHERE id = 0').fetchone()[0]
+
+    def _add_size(self, delta: int) -> None:
+        self._conn.execute('UPDATE decode_cache_size SET bytes = bytes + ? WHERE id = 0', (delta,))
+
+    def get(self, request_type: str, raw_data: bytes) -> Optional[bytes]:
+        key = cache_key(request_type, raw_data)
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM decode_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute('UPDATE decode_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+            return bytes(row[0])
+
+    def put(self, request_type: str, raw_data: bytes, value: bytes) -> None:
+        if self.max_bytes and len(value) > self.max_bytes:
+            return
+        key = cache_key(request_type, raw_data)
+        with self._lock, self._transaction():
+            row = self._conn.execute('SELECT size FROM decode_cache WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO decode_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+                (key, value, len(value), time.time()),
+            )
+            # A replaced entry's bytes are no longer stored
+            self._add_size(len(value) - (row[0] if row else 0))
+            if self.max_bytes and self._stored_size() > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        excess = self._stored_size() - int(self.max_bytes * EVICT_TO)
+        rows = self._conn.execute('SELECT key, size FROM decode_cache ORDER BY last_used ASC')
+        victims = []
+        freed = 0
+        for key, size in rows:
+            if freed >= excess:
+                break
+            victims.append((key,))
+            freed += size
+
+        self._conn.executemany('DELETE FROM decode_cache WHERE key = ?', victims)
+        self._add_size(-freed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM decode_cache').fetchone()[0]
+            size = self._stored_size()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
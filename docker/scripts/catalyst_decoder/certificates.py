@@ -0,0 +1,187 @@
+"""
+Subject alternative names from RBAC registration certificates.
+
+CIP-509 registrations carry X.509 certificates (key 10, DER) and C509
+certificates (key 20, CBOR), and the user's stake address is a
+web+cardano://addr/<stake address> URI in the SubjectAltName extension.
+
+For DER the walk only reads tag/length headers: Certificate ->
+tbsCertificate -> [3] extensions -> the SubjectAltName extension, skipping
+every other field by its length, then lists the URI entries of its
+GeneralNames. Nothing else in the certificate is decoded. C509
+certificates are CBOR arrays and small, so they are decoded and the
+SubjectAltName extension (id 3) read from the extensions field.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import cbor2
+
+CARDANO_ADDRESS_URI = 'web+cardano://addr/'
+
+# 2.5.29.17, without the OID tag and length
+SUBJECT_ALT_NAME_OID = b'\x55\x1d\x11'
+
+_SEQUENCE = 0x30
+_OID = 0x06
+_BOOLEAN = 0x01
+_OCTET_STRING = 0x04
+_EXTENSIONS = 0xa3  # [3] EXPLICIT, constructed
+_URI = 0x86  # GeneralName uniformResourceIdentifier, [6] IMPLICIT IA5String
+
+# C509 extension id of subjectAltName, GeneralName type of a URI
+C509_SUBJECT_ALT_NAME = 3
+C509_URI = 6
+
+
+class DerError(ValueError):
+    pass
+
+
+def read_header(data: bytes, offset: int, end: int) -> Tuple[int, int, int]:
+    """(tag, start of contents, end of contents) of the DER element at offset."""
+    if offset + 2 > end:
+        raise DerError(f"Truncated DER header at offset {offset}")
+    tag = data[offset]
+    offset += 1
+    if tag & 0x1f == 0x1f:
+        # High tag numbers continue while the top bit is set; none of the tags we look for use them
+        while offset < end and data[offset] & 0x80:
+            offset += 1
+        offset += 1
+        if offset >= end:
+            raise DerError("Truncated DER tag")
+
+    length = data[offset]
+    offset += 1
+    if length & 0x80:
+        size = length & 0x7f
+        if size == 0 or size > 4:
+            raise DerError(f"Unsupported DER length encoding at offset {offset - 1}")
+        if offset + size > end:
+            raise DerError("Truncated DER length")
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+
+    if offset + length > end:
+        raise DerError(f"DER element at offset {offset} runs past its parent")
+    return tag, offset, offset + length
+
+
+def children(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(tag, start, end) of each element directly inside start..end."""
+    offset = start
+    while offset < end:
+        tag, content_start, content_end = read_header(data, offset, end)
+        yield tag, content_start, content_end
+        offset = content_end
+
+
+def _expect(data: bytes, start: int, end: int, tag: int) -> Tuple[int, int]:
+    found, content_start, content_end = read_header(data, start, end)
+    if found != tag:
+        raise DerError(f"Expected tag 0x{tag:02x} at offset {start}, found 0x{found:02x}")
+    return content_start, content_end
+
+
+def extension_value(cert: bytes, oid: bytes) -> Optional[Tuple[int, int]]:
+    """Span of the extnValue contents of the extension oid, None when the certificate has none."""
+    cert_start, cert_end = _expect(cert, 0, len(cert), _SEQUENCE)
+    tbs_start, tbs_end = _expect(cert, cert_start, cert_end, _SEQUENCE)
+
+    for tag, start, end in children(cert, tbs_start, tbs_end):
+        if tag != _EXTENSIONS:
+            continue
+        extensions_start, extensions_end = _expect(cert, start, end, _SEQUENCE)
+        for ext_tag, ext_start, ext_end in children(cert, extensions_start, extensions_end):
+            if ext_tag != _SEQUENCE:
+                raise DerError(f"Malformed extension at offset {ext_start}")
+            fields = children(cert, ext_start, ext_end)
+            field_tag, oid_start, oid_end = next(fields, (None, 0, 0))
+            if field_tag != _OID or cert[oid_start:oid_end] != oid:
+                continue
+            for field_tag, value_start, value_end in fields:
+                if field_tag == _OCTET_STRING:
+                    return value_start, value_end
+                if field_tag != _BOOLEAN:
+                    break
+            raise DerError("Extension without a value")
+    return None
+
+
+def der_san_uris(cert: bytes) -> List[str]:
+    """Every URI in the SubjectAltName extension of a DER certificate."""
+    span = extension_value(cert, SUBJECT_ALT_NAME_OID)
+    if span is None:
+        return []
+    names_start, names_end = _expect(cert, span[0], span[1], _SEQUENCE)
+    return [
+        cert[start:end].decode('ascii', errors='replace')
+        for tag, start, end in children(cert, names_start, names_end)
+        if tag == _URI
+    ]
+
+
+def c509_san_uris(cert: Any) -> List[str]:
+    """Every URI in the subjectAltName extension of a C509 certificate (CBOR bytes or the decoded array)."""
+    if isinstance(cert, (bytes, bytearray)):
+        cert = cbor2.loads(cert)
+    if not isinstance(cert, list):
+        raise ValueError("C509 certificate is not a CBOR array")
+
+    for extensions in _c509_extension_candidates(cert):
+        # Extensions are a flat list of (id, value) pairs; a negative id marks it critical
+        for index in range(0, len(extensions) - 1, 2):
+            if extensions[index] in (C509_SUBJECT_ALT_NAME, -C509_SUBJECT_ALT_NAME):
+                return _c509_general_name_uris(extensions[index + 1])
+    return []
+
+
+def _c509_extension_candidates(cert: List[Any]) -> Iterator[List[Any]]:
+    # Drafts disagree on the field order: extensions are field 9 once issuerSignatureAlgorithm
+    # moved into the TBS part, field 8 before that. Try both, newest first
+    for index in (9, 8):
+        if len(cert) > index and isinstance(cert[index], list) and len(cert[index]) % 2 == 0:
+            yield cert[index]
+
+
+def _c509_general_name_uris(names: Any) -> List[str]:
+    if not isinstance(names, list):
+        # A lone dNSName may be given as just the text string
+        return []
+    return [
+        names[index + 1]
+        for index in range(0, len(names) - 1, 2)
+        if names[index] == C509_URI and isinstance(names[index + 1], str)
+    ]
+
+
+def stake_address_from_uris(uris: List[str]) -> Optional[str]:
+    for uri in uris:
+        if uri.startswith(CARDANO_ADDRESS_URI):
+            address = uri[len(CARDANO_ADDRESS_URI):]
+            if address.startswith('stake'):
+                return address
+    return None
+
+
+def certificate_info(cert: Any, c509: bool = False) -> Dict[str, Any]:
+    """Summary of one registration certificate: its size, SAN URIs and the stake address among them."""
+    if c509:
+        uris = c509_san_uris(cert)
+        length = len(cert) if isinstance(cert, (bytes, bytearray)) else None
+        has_asn1 = False
+    else:
+        if not isinstance(cert, (bytes, bytearray, memoryview)):
+            raise ValueError(f"Expected DER certificate bytes, got {type(cert).__name__}")
+        cert = bytes(cert)
+        has_asn1 = cert[:3].hex().startswith('30820')
+        uris = der_san_uris(cert)
+        length = len(cert)
+    stake_address = stake_address_from_uris(uris)
+    return {
+        'length': length,
+        'has_asn1_structure': has_asn1,
+        'cardano_uri_found': stake_address is not None,
+        'stake_address': stake_address,
+        'uris': uris,
+    }
@@ -0,0 +1,68 @@
+"""
+Command-line handling shared by the document decoder scripts.
+
+    script.py [FILE] [--verify] [--fields a,b.c] [--normalize] [--metrics]   decode one document from FILE or stdin
+    script.py --schema                             print the JSON Schema of --normalize output
+    script.py --batch [--workers N] ...            decode JSONL records from stdin
+    script.py --container FILE [--workers N] ...   decode every document in a CBOR sequence or tar archive
+"""
+import os
+import sys
+import argparse
+import functools
+import itertools
+
+from catalyst_decoder import metrics
+from catalyst_decoder.batch import run_batch, run_tasks
+from catalyst_decoder.batch_options import add_batch_arguments
+from catalyst_decoder.encoding import dumps, print_json
+from catalyst_decoder.normalize import OUTPUT_SCHEMA
+from catalyst_decoder.projection import parse_fields
+from catalyst_decoder.proposals import decode_record
+
+
+def parse_args(description: str, argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('file', nargs='?', help="Document file; read from stdin when omitted")
+    parser.add_argument('--verify', action='store_true', help="Check the Ed25519 signatures against their KIDs and add \"verification\" to the output")
+    parser.add_argument('--fields', type=parse_fields, help="Comma-separated output paths to keep, e.g. protected_headers,signatures.kid; the payload is only decoded when a path needs it")
+    parser.add_argument('--normalize', action='store_true', help="Also decode hex / brotli / embedded documents in payload[0], [2] and [3], and fill an empty payload[1] from payload[2]")
+    parser.add_argument('--schema', action='store_true', help="Print the JSON Schema of --normalize output and exit")
+    parser.add_argument('--metrics', action='store_true', help="Add per-stage timings and counters as \"_metrics\" (per record with --batch); see catalyst_decoder/metrics.py")
+    parser.add_argument('--container', action='store_true', help="FILE is a CBOR sequence or tar of documents; decode each one, one index line per document with its offset")
+    add_batch_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.schema:
+        print_json(OUTPUT_SCHEMA)
+        sys.exit(0)
+    if args.container and not args.file:
+        parser.error("--container needs a FILE")
+    # A container is decoded like a batch, one output line per document
+    args.batch = args.batch or args.container
+    metrics.start(os.path.splitext(os.path.basename(sys.argv[0]))[0], embed=args.metrics)
+    return args
+
+
+def run_document_batch(decoder: str, args: argparse.Namespace) -> int:
+    """Batch records are {"id": ..., "path": ...} or {"id": ..., "hex": ...}; --container reads them from the archive instead."""
+    decode = functools.partial(decode_record, decoder=decoder, verify=args.verify, fields=args.fields, normalize=args.normalize)
+    options = dict(dumps=dumps, buffer_size=args.buffer_size, workers=args.workers, chunksize=args.chunksize)
+
+    if args.container:
+        # tarfile and the container reader are only needed here
+        from catalyst_decoder.archive import INDEX_FIELDS, archive_tasks
+
+        try:
+            tasks = archive_tasks(args.file)
+            # Fail on an unreadable archive before any output is written
+            first = next(tasks, None)
+        except OSError as e:
+            print(dumps({"error": f"Could not read input: {str(e)}"}))
+            return 1
+        if first is not None:
+            tasks = itertools.chain([first], tasks)
+        stats = run_tasks(decode, tasks, sys.stdout, id_field='name', meta_fields=INDEX_FIELDS, **options)
+    else:
+        stats = run_batch(decode, sys.stdin, sys.stdout, **options)
+    print(f"Decoded {stats.records} documents, {stats.errors} errors", file=sys.stderr)
+    return 0
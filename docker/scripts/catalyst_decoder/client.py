@@ -0,0 +1,40 @@
+import json
+import socket
+from typing import Any, Dict, Optional
+
+from catalyst_decoder.server import read_frame, write_frame
+
+
+class DecoderClient:
+    """Minimal client for a decoder server listening on a Unix socket."""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile('rb')
+        self.writer = self.sock.makefile('wb')
+
+    def decode(self, request_type: str, raw_data: bytes = b'', **options: Any) -> Dict[str, Any]:
+        """options go into the request header, e.g. verify=True."""
+        write_frame(self.writer, json.dumps({'type': request_type, **options}).encode())
+        write_frame(self.writer, raw_data)
+        response = read_frame(self.reader, 1 << 31)
+        if response is None:
+            raise ConnectionError("Decoder server closed the connection")
+        return json.loads(response)
+
+    def decode_signature(self, signature_hex: str, key_hex: Optional[str] = None) -> Dict[str, Any]:
+        options = {'key': key_hex} if key_hex else {}
+        return self.decode('wallet_signature', signature_hex.encode(), **options)
+
+    def close(self) -> None:
+        self.reader.close()
+        self.writer.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,149 @@
+"""
+Incremental brotli / zstd decompression with a decompressed-size budget.
+
+One-shot brotli.decompress / ZstdDecompressor().decompress materialise the
+whole output before anyone can look at its size, so a small decompression
+bomb allocates its full expansion before it is rejected. The readers here
+produce output in bounded pieces and raise DecompressionLimitExceeded as
+soon as the budget is crossed. They can be handed straight to cbor2.load so
+the payload never exists as one decompressed buffer.
+"""
+import io
+import os
+import brotli
+import cbor2
+from typing import Any, BinaryIO, Iterator, Optional
+
+from catalyst_decoder import metrics
+from catalyst_decoder.sniff import plausible_item
+
+DEFAULT_MAX_DECOMPRESSED_SIZE = int(os.environ.get('DECODER_MAX_DECOMPRESSED_SIZE', 20 * 1024 * 1024))
+
+INPUT_CHUNK_SIZE = 64 * 1024
+OUTPUT_CHUNK_SIZE = 256 * 1024
+
+BROTLI = 'brotli'
+ZSTD = 'zstd'
+
+
+class DecompressionLimitExceeded(ValueError):
+    pass
+
+
+def _iter_brotli(data: bytes) -> Iterator[bytes]:
+    decompressor = brotli.Decompressor()
+    view = memoryview(data)
+    position = 0
+    bounded_output = hasattr(decompressor, 'can_accept_more_data')
+
+    while not decompressor.is_finished():
+        piece = b''
+        if position < len(view) and (not bounded_output or decompressor.can_accept_more_data()):
+            piece = view[position:position + INPUT_CHUNK_SIZE]
+            position += len(piece)
+
+        if bounded_output:
+            out = decompressor.process(piece, output_buffer_limit=OUTPUT_CHUNK_SIZE)
+        else:
+            # Older brotli bindings can't cap a single call; small input slices keep it close
+            out = decompressor.process(piece)
+
+        if out:
+            yield out
+        elif not piece and not decompressor.is_finished():
+            raise brotli.error("Unexpected end of brotli stream")
+
+    if position < len(view):
+        raise brotli.error("Trailing data after brotli stream")
+
+
+def _iter_zstd(data: bytes) -> Iterator[bytes]:
+    import zstandard as zstd
+
+    with zstd.ZstdDecompressor().stream_reader(data, read_size=INPUT_CHUNK_SIZE) as reader:
+        while True:
+            out = reader.read(OUTPUT_CHUNK_SIZE)
+            if not out:
+                return
+            yield out
+
+
+_CODECS = {
+    BROTLI: _iter_brotli,
+    ZSTD: _iter_zstd,
+}
+
+
+def iter_decompressed(data: bytes, codec: str, max_output: Optional[int] = None) -> Iterator[bytes]:
+    """Decompressed output in bounded pieces, stopping once more than max_output bytes were produced."""
+    if codec not in _CODECS:
+        raise ValueError(f"Unknown compression type: {codec}")
+    limit = DEFAULT_MAX_DECOMPRESSED_SIZE if max_output is None else max_output
+    metrics.count('compressed_bytes', len(data))
+
+    produced = 0
+    for chunk in _CODECS[codec](data):
+        produced += len(chunk)
+        # Counted per piece: a reader may stop early once it has its CBOR item
+        metrics.count('decompressed_bytes', len(chunk))
+        if limit and produced > limit:
+            raise DecompressionLimitExceeded(f"Decompressed size exceeds limit of {limit} bytes")
+        yield chunk
+
+
+class DecompressingReader(io.RawIOBase):
+    """Read-only file object over the decompressed form of an in-memory buffer."""
+
+    def __init__(self, data: bytes, codec: str, max_output: Optional[int] = None):
+        self._chunks = iter_decompressed(data, codec, max_output)
+        self._pending = memoryview(b'')
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._pending:
+            # Timed here rather than in iter_decompressed, whose consumer runs between pieces
+            with metrics.stage('decompress'):
+                chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def open_decompressed(data: bytes, codec: str, max_output: Optional[int] = None) -> BinaryIO:
+    return io.BufferedReader(DecompressingReader(data, codec, max_output), buffer_size=OUTPUT_CHUNK_SIZE)
+
+
+def decompress(data: bytes, codec: str, max_output: Optional[int] = None) -> bytes:
+    """Bounded equivalent of brotli.decompress / ZstdDecompressor().decompress."""
+    output = bytearray()
+    with metrics.stage('decompress'):
+        for chunk in iter_decompressed(data, codec, max_output):
+            output += chunk
+    return bytes(output)
+
+
+def loads_cbor(data: bytes) -> Any:
+    """cbor2.loads, refusing data whose first item head claims more than the buffer holds (see sniff.plausible_item)."""
+    if not plausible_item(data):
+        raise ValueError("Not a complete CBOR item")
+    with metrics.stage('cbor'):
+        return cbor2.loads(data)
+
+
+def load_cbor(data: bytes, codec: str, max_output: Optional[int] = None) -> Any:
+    """Decode the first CBOR item of a compressed buffer without materialising the decompressed bytes."""
+    stream = open_decompressed(data, codec, max_output)
+    limit = DEFAULT_MAX_DECOMPRESSED_SIZE if max_output is None else max_output
+    # The total size isn't known yet, but nothing longer than the cap can be complete
+    if limit and not plausible_item(stream.peek(9)[:9], available=limit):
+        raise ValueError("Not a complete CBOR item")
+    # Decompression pulled in by the parser is timed as "decompress" (see DecompressingReader)
+    with metrics.stage('cbor'):
+        return cbor2.load(stream)
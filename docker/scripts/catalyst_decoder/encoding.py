@@ -0,0 +1,111 @@
+"""
+JSON output for decoder results.
+
+Serializer converts the values json can't encode natively (bytes, UUID,
+CBORTag, arbitrary objects) with a default hook, in the same pass as the
+encoder walks the result, and hands the tree to one of two backends:
+
+    json    the default: the standard library, byte-for-byte what
+            CustomEncoder produced
+    orjson  native encoder, with DECODER_JSON_BACKEND=orjson when it is
+            installed; the same JSON value, but not the same bytes
+
+orjson's output is compact and UTF-8 instead of ASCII-escaped, and NaN and
+Infinity, which aren't JSON, come out as null instead of NaN / Infinity, so
+it is opt-in for consumers that parse the JSON rather than compare it.
+Integers wider than 64 bits, which orjson can't represent, fall back to the
+standard library for that document.
+"""
+import os
+import json
+import uuid
+from typing import Any, Callable, Optional
+from cbor2 import CBORTag
+
+from catalyst_decoder import metrics
+
+JSON = 'json'
+ORJSON = 'orjson'
+
+
+def load_orjson():
+    """orjson, imported only once a Serializer selects it (None when it isn't installed)."""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def encode_default(obj: Any) -> Any:
+    """Conversion for values json can't encode natively."""
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.hex()
+    # Handle CBOR tags specifically
+    if isinstance(obj, CBORTag):
+        return {
+            '_cbor_tag': obj.tag,
+            'value': obj.value
+        }
+    # Handle other non-serializable objects
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return str(obj)  # Fallback to string representation
+
+
+class CustomEncoder(json.JSONEncoder):
+    def default(self, obj):
+        return encode_default(obj)
+
+
+def default_backend() -> str:
+    backend = os.environ.get('DECODER_JSON_BACKEND') or JSON
+    if backend not in (JSON, ORJSON):
+        raise ValueError(f"Unknown JSON backend: {backend}")
+    return backend
+
+
+class Serializer:
+    """json.dumps(obj, default=default) with a pluggable backend."""
+
+    def __init__(self, default: Callable[[Any], Any] = encode_default, backend: Optional[str] = None):
+        backend = backend or default_backend()
+        self._orjson = load_orjson() if backend == ORJSON else None
+        if self._orjson is None:
+            backend = JSON
+        else:
+            # Datetimes and dataclasses go through the default hook like they do with json
+            self._orjson_options = (
+                self._orjson.OPT_NON_STR_KEYS | self._orjson.OPT_PASSTHROUGH_DATETIME | self._orjson.OPT_PASSTHROUGH_DATACLASS
+            )
+        self.default = default
+        self.backend = backend
+
+    def dumps(self, obj: Any) -> str:
+        with metrics.stage('serialize'):
+            text = self._dumps(obj)
+        if metrics.current() is not None:
+            metrics.count('bytes_out', len(text) if text.isascii() else len(text.encode()))
+        return text
+
+    def _dumps(self, obj: Any) -> str:
+        if self.backend == ORJSON:
+            try:
+                return self._orjson.dumps(obj, default=self.default, option=self._orjson_options).decode()
+            except self._orjson.JSONEncodeError:
+                # Wide integers, deep nesting and cycles get json's handling and errors
+                pass
+        return json.dumps(obj, default=self.default)
+
+
+serializer = Serializer()
+
+
+def dumps(obj) -> str:
+    return serializer.dumps(obj)
+
+
+def print_json(obj):
+    print(dumps(obj))
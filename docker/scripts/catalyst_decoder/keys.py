@@ -0,0 +1,76 @@
+"""
+Memoised key and address derivations for registration decoding.
+
+Voting keys and stake keys recur across thousands of re-registrations, and
+each derivation means building pycardano key objects, a blake2b hash and a
+bech32 encoding. Results are cached per (key bytes, network) in bounded LRU
+caches. Only immutable values (str, tuples) are cached so callers can't
+corrupt an entry.
+
+pycardano takes over a second to import and most decodes never derive an
+address (proposal documents only use KEY_CACHE_SIZE from here), so it is
+imported on the first cache miss rather than with this module.
+"""
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Tuple
+
+from catalyst_decoder import metrics
+
+if TYPE_CHECKING:
+    from pycardano import Network
+
+KEY_CACHE_SIZE = int(os.environ.get('DECODER_KEY_CACHE_SIZE', 65536))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def public_key_bech32(key_bytes: bytes) -> str:
+    """bech32 of an Ed25519 verification key, as str(PaymentVerificationKey)."""
+    from pycardano import PaymentVerificationKey
+
+    with metrics.stage('keys'):
+        return str(PaymentVerificationKey.from_primitive(key_bytes))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def stake_address(key_bytes: bytes, network: 'Network') -> Tuple[str, str]:
+    """(stake address hex, stake address bech32) for a stake verification key."""
+    from pycardano import Address, StakeVerificationKey
+
+    with metrics.stage('keys'):
+        stake_vk = StakeVerificationKey.from_primitive(key_bytes)
+        address = Address(staking_part=stake_vk.hash(), network=network)
+        return address.to_primitive().hex(), str(address)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def stake_address_hex(stake_bech: str) -> str:
+    from pycardano import Address
+
+    with metrics.stage('keys'):
+        return Address.from_primitive(stake_bech).to_primitive().hex()
+
+
+_CACHES = {
+    'public_key_bech32': public_key_bech32,
+    'stake_address': stake_address,
+    'stake_address_hex': stake_address_hex,
+}
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    stats = {}
+    for name, fn in _CACHES.items():
+        info = fn.cache_info()
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+        }
+    return stats
+
+
+def clear_caches() -> None:
+    for fn in _CACHES.values():
+        fn.cache_clear()
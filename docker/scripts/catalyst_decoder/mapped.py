@@ -0,0 +1,45 @@
+"""
+Memory-mapped document files.
+
+A container file holds many CBOR documents back to back (a CBOR sequence,
+e.g. a dump of the Catalyst document store). Item boundaries are found by
+walking the CBOR heads over the mapping, which touches the pages but never
+copies the file; each document is then sliced out on its own, so only one
+document at a time is materialised as bytes.
+"""
+import os
+import mmap
+from functools import lru_cache
+from typing import Iterator, Tuple
+
+from catalyst_decoder.sniff import skip_item
+
+
+class MalformedContainer(ValueError):
+    pass
+
+
+@lru_cache(maxsize=8)
+def open_mapped(path: str):
+    """Read-only mapping of path, shared by every lookup in this process."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_item_spans(data, offset: int = 0) -> Iterator[Tuple[int, int]]:
+    """(start, end) of every top-level CBOR item from offset to the end of data."""
+    while offset < len(data):
+        end = skip_item(data, offset)
+        if end is None:
+            raise MalformedContainer(f"Malformed or truncated CBOR item at offset {offset}")
+        yield offset, end
+        offset = end
+
+
+def read_span(path: str, offset: int, length: int) -> bytes:
+    data = open_mapped(path)
+    if offset < 0 or length < 0 or offset + length > len(data):
+        raise ValueError(f"Span {offset}+{length} is outside {path} ({len(data)} bytes)")
+    return data[offset:offset + length]
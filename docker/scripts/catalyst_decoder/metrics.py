@@ -0,0 +1,286 @@
+"""
+Opt-in per-stage timings and counters for the decoders.
+
+    DECODER_METRICS=1 (or --metrics)   add "_metrics" to the output: per document
+                                       for the scripts, per record in --batch
+    DECODER_METRICS_TEXTFILE=path      add this run's totals to a Prometheus
+                                       textfile (node_exporter's textfile collector)
+
+The decoder server answers a "stats" request with its totals and adds
+"_metrics" to a response when the request header has "metrics": true.
+
+Stages are named where the work happens: "read" (input), "cose" (COSE
+parsing), "decompress", "cbor" (parsing decompressed or raw CBOR),
+"recursive" (the recursive decoder's speculative hex / bytes decodes),
+"keys" (address and key derivation) and "serialize". Their times are
+exclusive: a decompression run inside the recursive decoder counts as
+"decompress", not also as "recursive", so the stage times add up to at most
+"seconds" and "unstaged_seconds" is the rest (mostly the first-use imports
+of pycose and pycardano in a fresh process). "_metrics" is built before the
+output is serialised, so its own "serialize" time and "bytes_out" only show
+up in the textfile and the server totals.
+
+Counters: bytes_in, bytes_out, compressed_bytes, decompressed_bytes (their
+ratio is "decompression_ratio"), nodes_visited and speculative_bytes (what
+the recursive decoder walked and tried to decode).
+
+The collector for the current run lives in a ContextVar, so instrumented
+code calls stage() and count() without threading it through. With none set
+(the default) stage() returns a shared no-op and count() returns at once.
+"""
+import os
+import re
+import sys
+import time
+import atexit
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+EMBED = bool(os.environ.get('DECODER_METRICS'))
+TEXTFILE = os.environ.get('DECODER_METRICS_TEXTFILE') or None
+
+_current: ContextVar[Optional['Collector']] = ContextVar('decoder_metrics', default=None)
+
+# name{labels} value, as written by write_textfile
+_SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+class Collector:
+    """Stage times, stage calls and counters of one run (a document, a record, a request or a whole script)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        self.runs = 1
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        # [stage, start of its current uninterrupted stretch] for each open stage
+        self._open: List[list] = []
+
+    @classmethod
+    def totals(cls) -> 'Collector':
+        """An empty collector for adding up runs with merge(..., as_run=True)."""
+        collector = cls()
+        collector.runs = 0
+        collector.elapsed = 0.0
+        return collector
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._open:
+            # The enclosing stage stops counting while this one runs
+            parent = self._open[-1]
+            self.seconds[parent[0]] = self.seconds.get(parent[0], 0.0) + now - parent[1]
+        self._open.append([name, now])
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def exit(self) -> None:
+        now = time.perf_counter()
+        name, start = self._open.pop()
+        self.seconds[name] = self.seconds.get(name, 0.0) + now - start
+        if self._open:
+            self._open[-1][1] = now
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def close(self) -> None:
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+
+    def total_seconds(self) -> float:
+        return self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+
+    def merge(self, other: 'Collector', as_run: bool = False) -> None:
+        """Add other's stages and counters; as_run also counts it as one more run with its own elapsed time."""
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        for name, calls in other.calls.items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+        for name, amount in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + amount
+        if as_run:
+            self.runs += other.runs
+            self.elapsed = (self.elapsed or 0.0) + other.total_seconds()
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.total_seconds()
+        staged = sum(self.seconds.values())
+        result = {
+            'seconds': round(total, 6),
+            'stages': {
+                name: {'seconds': round(self.seconds[name], 6), 'calls': self.calls.get(name, 0)}
+                for name in sorted(self.seconds)
+            },
+            'unstaged_seconds': round(max(total - staged, 0.0), 6),
+            'counters': dict(sorted(self.counters.items())),
+        }
+        compressed = self.counters.get('compressed_bytes')
+        if compressed:
+            result['decompression_ratio'] = round(self.counters.get('decompressed_bytes', 0) / compressed, 3)
+        return result
+
+
+class _Stage:
+    __slots__ = ('collector', 'name')
+
+    def __init__(self, collector: Collector, name: str):
+        self.collector = collector
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.collector.enter(self.name)
+
+    def __exit__(self, *exc) -> None:
+        self.collector.exit()
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+
+def current() -> Optional[Collector]:
+    return _current.get()
+
+
+def stage(name: str):
+    """Context manager timing its block as stage name, a no-op when nothing is being collected."""
+    collector = _current.get()
+    if collector is None:
+        return _NO_STAGE
+    return _Stage(collector, name)
+
+
+def count(name: str, amount: int = 1) -> None:
+    collector = _current.get()
+    if collector is not None:
+        collector.count(name, amount)
+
+
+@contextmanager
+def collecting(enabled: bool = True) -> Iterator[Optional[Collector]]:
+    """
+    Collect into a fresh Collector for the duration of the block, then add
+    its stages and counters to the enclosing one (if any). Yields None, and
+    collects nothing, when not enabled.
+    """
+    if not enabled:
+        yield None
+        return
+    parent = _current.get()
+    collector = Collector()
+    token = _current.set(collector)
+    try:
+        yield collector
+    finally:
+        _current.reset(token)
+        collector.close()
+        if parent is not None:
+            parent.merge(collector)
+
+
+def record():
+    """collecting() for one batch record or document, when metrics are on at all."""
+    return collecting(_current.get() is not None)
+
+
+def attach(output: Any, collector: Optional[Collector] = None) -> Any:
+    """output with "_metrics" from collector (default: the current one) when DECODER_METRICS / --metrics asked for it."""
+    collector = collector or _current.get()
+    if EMBED and collector is not None and isinstance(output, dict):
+        output['_metrics'] = collector.to_dict()
+    return output
+
+
+def start(script: str, embed: bool = False) -> Optional[Collector]:
+    """
+    Begin collecting for this process when DECODER_METRICS, --metrics (embed)
+    or DECODER_METRICS_TEXTFILE asks for it. The totals are added to the
+    textfile when the process exits.
+    """
+    global EMBED
+    EMBED = EMBED or embed
+    if not EMBED and TEXTFILE is None:
+        return None
+    collector = Collector()
+    _current.set(collector)
+    if TEXTFILE is not None:
+        atexit.register(_write_at_exit, TEXTFILE, script, collector)
+    return collector
+
+
+def _write_at_exit(path: str, script: str, collector: Collector) -> None:
+    collector.close()
+    try:
+        write_textfile(path, script, collector)
+    except OSError as e:
+        # Metrics never fail a decode that already printed its result
+        print(f"WARNING: Could not write metrics textfile: {str(e)}", file=sys.stderr)
+
+
+def prometheus_samples(script: str, collector: Collector) -> Dict[Tuple[str, str], float]:
+    """(metric name, label string) -> value for the collector's totals."""
+    labels = f'script="{script}"'
+    samples = {
+        ('decoder_runs_total', '{' + labels + '}'): float(collector.runs),
+        ('decoder_run_seconds_total', '{' + labels + '}'): collector.total_seconds(),
+    }
+    for name, seconds in collector.seconds.items():
+        stage_labels = '{' + f'{labels},stage="{name}"' + '}'
+        samples[('decoder_stage_seconds_total', stage_labels)] = seconds
+        samples[('decoder_stage_calls_total', stage_labels)] = float(collector.calls.get(name, 0))
+    for name, amount in collector.counters.items():
+        samples[(f'decoder_{name}_total', '{' + labels + '}')] = float(amount)
+    return samples
+
+
+def read_textfile(path: str) -> Dict[Tuple[str, str], float]:
+    samples = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                match = _SAMPLE_RE.match(line.strip())
+                if match:
+                    samples[(match.group(1), match.group(2) or '')] = float(match.group(3))
+    except FileNotFoundError:
+        pass
+    return samples
+
+
+def write_textfile(path: str, script: str, collector: Collector) -> None:
+    """
+    Add the collector's totals to the counters already in the textfile.
+    Concurrent writers are serialised with a lock file, and the new file is
+    renamed into place so the exporter never reads half of it.
+    """
+    import fcntl
+
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        samples = read_textfile(path)
+        for key, value in prometheus_samples(script, collector).items():
+            samples[key] = samples.get(key, 0.0) + value
+
+        lines = []
+        family = None
+        for name, labels in sorted(samples):
+            if name != family:
+                lines.append(f'# TYPE {name} counter')
+                family = name
+            lines.append(f'{name}{labels} {samples[(name, labels)]!r}')
+
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temporary, path)
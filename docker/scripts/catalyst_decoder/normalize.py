@@ -0,0 +1,208 @@
+"""
+One-call payload normalisation for synced documents.
+
+SyncDocumentPage used to finish every decode itself: brotli-decompress a hex
+payload[2] into payload[1], try payload[0] as hex-brotli or as another
+document, walk payload[3] for hex strings, and decode payload[2] again,
+spawning a fresh interpreter (sometimes from a temporary .py file) for each
+attempt. normalize_output runs the same steps on the decoder's output in
+the same process, before it is serialised, so one decode call returns the
+finished document and says so with "normalized": true.
+
+A step whose decode fails leaves the value exactly as the decoder returned
+it. A nested document only counts as decoded when its decoder reports no
+payload_error.
+"""
+import re
+import json
+from typing import Any, Dict, Optional
+
+from catalyst_decoder.decompress import BROTLI, decompress
+from catalyst_decoder.recursive import is_hex
+
+# Shortest nested hex string worth a decode attempt (16 bytes)
+MIN_NESTED_HEX = 32
+
+_HEX_RUN_RE = re.compile(r'[a-f0-9]{32,}')
+
+_ANY = {}
+_HEADERS = {'type': 'object', 'additionalProperties': True}
+
+OUTPUT_SCHEMA: Dict[str, Any] = {
+    '$schema': 'http://json-schema.org/draft-07/schema#',
+    'title': 'Normalized Catalyst document',
+    'type': 'object',
+    'properties': {
+        'protected_headers': _HEADERS,
+        'signatures': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'kid': {'type': ['string', 'null']},
+                    'protected': _HEADERS,
+                    'signature': {'type': 'string', 'description': 'hex'},
+                },
+            },
+        },
+        'payload': {
+            'description': (
+                'Decoded payload. For the array form: [0] document reference or header data, decoded '
+                'when it was hex-brotli or an embedded document; [1] proposal content (an object with '
+                '"setup" for proposals), filled from a hex-brotli [2] when the decoder left it empty; '
+                '[2] decoded when it was hex; [3] nested structures with every decodable hex string '
+                'of 32+ characters replaced by its decoded value. Values that could not be decoded '
+                'are left as hex strings.'
+            ),
+            'oneOf': [
+                {'type': 'array', 'items': _ANY},
+                {'type': 'object'},
+                {'type': 'string'},
+                {'type': 'null'},
+            ],
+        },
+        'payload_error': {'type': 'string'},
+        'format': {'type': 'string'},
+        'decoder': {'type': 'string'},
+        'verification': {'type': 'object'},
+        'normalized': {'const': True},
+    },
+    'required': ['payload', 'normalized'],
+}
+
+
+def _as_bytes(value: Any) -> Optional[bytes]:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str) and is_hex(value):
+        return bytes.fromhex(value)
+    return None
+
+
+def decode_brotli_content(data: bytes) -> Optional[Any]:
+    """Brotli-compressed JSON (an object or array), or {"text_content": ...} for other UTF-8 text."""
+    try:
+        decompressed = decompress(data, BROTLI)
+        text = decompressed.decode('utf-8')
+    except Exception:
+        return None
+    try:
+        content = json.loads(text)
+    except json.JSONDecodeError:
+        return {'text_content': text}
+    return content if isinstance(content, (dict, list)) else None
+
+
+def decode_embedded_document(data: bytes) -> Optional[Dict[str, Any]]:
+    # Imported here: proposals imports this module for decode_with_options
+    from catalyst_decoder.proposals import decode_document
+
+    try:
+        output = decode_document(data)
+    except Exception:
+        return None
+    if 'payload_error' in output or not isinstance(output.get('payload'), (dict, list)) or not output['payload']:
+        return None
+    return output
+
+
+def decode_hex_value(value: Any) -> Optional[Any]:
+    """A hex string (or bytes) as brotli content, an embedded document, JSON or readable text; None if none fit."""
+    data = _as_bytes(value)
+    if data is None:
+        return None
+
+    for decode in (decode_brotli_content, decode_embedded_document):
+        decoded = decode(data)
+        if decoded:
+            return decoded
+
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    try:
+        decoded = json.loads(text)
+        if decoded:
+            return decoded
+    except json.JSONDecodeError:
+        pass
+    if len(text.strip()) > 10:
+        return {'decoded_text': text}
+    return None
+
+
+def _decode_reference(value: Any) -> Optional[Any]:
+    """payload[0]: hex-brotli, an embedded document, or a hex run inside brotli header text."""
+    data = _as_bytes(value)
+    if data is not None:
+        decoded = decode_brotli_content(data) or decode_embedded_document(data)
+        if decoded:
+            return decoded
+    if isinstance(value, str) and ('Content-Encoding' in value or 'br' in value):
+        match = _HEX_RUN_RE.search(value)
+        data = _as_bytes(match.group(0)) if match else None
+        if data is not None:
+            return decode_brotli_content(data)
+    return None
+
+
+def _is_nested_hex(value: Any) -> bool:
+    if isinstance(value, str):
+        return len(value) >= MIN_NESTED_HEX and is_hex(value)
+    return isinstance(value, (bytes, bytearray)) and len(value) * 2 >= MIN_NESTED_HEX
+
+
+def _decode_nested(value: Any, depth: int = 0) -> Any:
+    """payload[3]: every long hex string inside lists and objects, and every object's hex "payload"."""
+    if depth > 10:
+        return value
+    if _is_nested_hex(value):
+        decoded = decode_hex_value(value)
+        return value if decoded is None else decoded
+    if isinstance(value, list):
+        return [_decode_nested(item, depth + 1) for item in value]
+    if isinstance(value, dict):
+        value = dict(value)
+        inner = value.get('payload')
+        if isinstance(inner, (str, bytes, bytearray)) and _as_bytes(inner) is not None:
+            decoded = decode_hex_value(inner)
+            if decoded is not None:
+                value['payload'] = decoded
+        return {key: _decode_nested(item, depth + 1) for key, item in value.items()}
+    return value
+
+
+def normalize_payload(payload: Any) -> Any:
+    """The array-form payload with slots 0-3 resolved; other payloads are returned as they are."""
+    if not isinstance(payload, list):
+        return payload
+    payload = list(payload)
+
+    if len(payload) > 2 and not payload[1] and payload[2]:
+        data = _as_bytes(payload[2])
+        content = decode_brotli_content(data) if data is not None else None
+        if content:
+            payload[1] = content
+
+    if len(payload) > 0 and isinstance(payload[0], (str, bytes, bytearray)):
+        decoded = _decode_reference(payload[0])
+        if decoded:
+            payload[0] = decoded
+
+    if len(payload) > 3 and isinstance(payload[3], (list, dict)):
+        payload[3] = _decode_nested(payload[3])
+
+    if len(payload) > 2 and _as_bytes(payload[2]) is not None:
+        decoded = decode_hex_value(payload[2])
+        if decoded:
+            payload[2] = decoded
+
+    return payload
+
+
+def normalize_output(output: Dict[str, Any]) -> Dict[str, Any]:
+    if 'payload' in output:
+        output['payload'] = normalize_payload(output['payload'])
+    output['normalized'] = True
+    return output
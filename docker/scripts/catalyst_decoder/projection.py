@@ -0,0 +1,63 @@
+"""
+Field projection for decoder output.
+
+    --fields protected_headers,signatures.kid,payload.setup.title
+
+Each field is a dot-separated path into the output. A path ending on a
+value keeps it whole, a path into a list applies to every element, and
+paths that don't exist in a document are left out. The payload is only
+decompressed and decoded when some path starts with "payload"; header-only
+projections never touch brotli.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+Field = Tuple[str, ...]
+
+PAYLOAD_FIELDS = ('payload', 'payload_error')
+
+_MISSING = object()
+
+
+def parse_fields(spec: str) -> List[Field]:
+    fields = []
+    for item in spec.split(','):
+        path = tuple(part for part in item.strip().split('.') if part)
+        if path:
+            fields.append(path)
+    if not fields:
+        raise ValueError("No fields given")
+    return fields
+
+
+def needs_payload(fields: Optional[List[Field]]) -> bool:
+    return fields is None or any(path[0] in PAYLOAD_FIELDS for path in fields)
+
+
+def project(output: Dict[str, Any], fields: List[Field]) -> Dict[str, Any]:
+    """The parts of output selected by fields, keeping the original nesting."""
+    result = _select(output, fields)
+    return {} if result is _MISSING else result
+
+
+def _select(value: Any, fields: List[Field]) -> Any:
+    if any(not path for path in fields):
+        return value
+    if isinstance(value, list):
+        selected = [_select(item, fields) for item in value]
+        return [None if item is _MISSING else item for item in selected]
+    if not isinstance(value, dict):
+        return _MISSING
+
+    children: Dict[str, List[Field]] = {}
+    for path in fields:
+        children.setdefault(path[0], []).append(path[1:])
+
+    result = {}
+    # Output keeps the document's key order, not the order fields were listed in
+    for key, item in value.items():
+        subpaths = children.get(str(key))
+        if subpaths is not None:
+            selected = _select(item, subpaths)
+            if selected is not _MISSING:
+                result[key] = selected
+    return result if result else _MISSING
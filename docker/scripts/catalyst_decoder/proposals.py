@@ -0,0 +1,369 @@
+import os
+import sys
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from catalyst_decoder import metrics
+from catalyst_decoder.decompress import BROTLI, decompress, load_cbor, loads_cbor
+from catalyst_decoder.recursive import RecursiveDecoder, handle_catalyst_payload
+from catalyst_decoder.mapped import read_span
+from catalyst_decoder.normalize import normalize_output
+from catalyst_decoder.projection import Field, needs_payload, project
+from catalyst_decoder.sniff import cose_payload_span, is_cose, sniff_format
+
+MAX_INPUT_SIZE = 10 * 1024 * 1024  # 10MB limit
+MAX_COMPRESSED_ITEM_SIZE = 5 * 1024 * 1024  # 5MB limit for compressed data
+# Decompressed output is capped by DECODER_MAX_DECOMPRESSED_SIZE (20MB default), see decompress.py
+
+
+class DecodeError(Exception):
+    """Raised when a document cannot be decoded at all; the message is what the scripts print as "error"."""
+    pass
+
+
+def truncate_error(error: Exception, limit: int = 200) -> str:
+    error_msg = str(error)
+    # Truncate very long error messages
+    if len(error_msg) > limit:
+        error_msg = error_msg[:limit] + "..."
+    return error_msg
+
+
+def hex_preview(raw_data: bytes, limit: int = 1000) -> str:
+    return raw_data[:limit].hex() + ("..." if len(raw_data) > limit else "")
+
+
+def read_input(path: Optional[str] = None) -> bytes:
+    """Read the document from path, or from stdin when no path is given."""
+    try:
+        with metrics.stage('read'):
+            if path:
+                with open(path, "rb") as f:
+                    # Refuse oversized files before reading them into memory
+                    size = os.fstat(f.fileno()).st_size
+                    if size > MAX_INPUT_SIZE:
+                        raise DecodeError(f"Input too large: {size} bytes")
+                    raw_data = f.read()
+            else:
+                raw_data = sys.stdin.buffer.read()
+    except DecodeError:
+        raise
+    except Exception as e:
+        raise DecodeError(f"Could not read input: {str(e)}")
+
+    validate_input(raw_data)
+    return raw_data
+
+
+def validate_input(raw_data: bytes) -> None:
+    if len(raw_data) == 0:
+        raise DecodeError("Empty input data")
+
+    if len(raw_data) > MAX_INPUT_SIZE:
+        raise DecodeError(f"Input too large: {len(raw_data)} bytes")
+    metrics.count('bytes_in', len(raw_data))
+
+
+def parse_cose(raw_data: bytes):
+    # pycose is imported on the first COSE message: the direct decoder and the
+    # modules importing this one for its helpers never need it
+    from pycose.messages import CoseMessage
+
+    with metrics.stage('cose'):
+        return CoseMessage.decode(raw_data)
+
+
+def extract_cose_headers(cose_msg) -> Dict[str, Any]:
+    from pycose.headers import KID
+
+    protected_headers = {str(k): v for k, v in cose_msg.phdr.items()}
+    signatures = []
+
+    if hasattr(cose_msg, 'signers'):
+        for signer in cose_msg.signers:
+            kid = signer.phdr.get(KID)
+            signatures.append({
+                "kid": kid.decode() if kid else None,
+                "protected": {str(k): v for k, v in signer.phdr.items()},
+                "signature": signer.signature.hex(),
+            })
+
+    return {
+        "protected_headers": protected_headers,
+        "signatures": signatures,
+    }
+
+
+def without_payload(raw_data: bytes) -> bytes:
+    """The COSE message with its payload swapped for an empty bstr, so parsing it never copies the payload."""
+    span = cose_payload_span(raw_data)
+    if span is None:
+        return raw_data
+    start, end = span
+    return raw_data[:start] + b'\x40' + raw_data[end:]
+
+
+def decode_cose(raw_data: bytes, include_payload: bool = True) -> Dict[str, Any]:
+    """COSE decoder (decodeProposal.py): headers, signatures and the brotli/CBOR payload."""
+    try:
+        # Basic sanity check for COSE format
+        if len(raw_data) < 10:
+            raise ValueError("Data too short to be valid COSE")
+
+        cose_msg = parse_cose(raw_data if include_payload else without_payload(raw_data))
+
+        # Validate the decoded message structure
+        if not hasattr(cose_msg, 'payload'):
+            raise ValueError("Invalid COSE message: missing payload")
+
+    except Exception as e:
+        raise DecodeError(f"Failed to decode COSE: {truncate_error(e)}")
+
+    headers = extract_cose_headers(cose_msg)
+
+    if not include_payload:
+        return {
+            "protected_headers": headers["protected_headers"],
+            "signatures": headers["signatures"],
+        }
+
+    payload = None
+    payload_error = None
+
+    try:
+        decompressed = decompress(cose_msg.payload, BROTLI)
+        try:
+            payload = loads_cbor(decompressed)
+            if isinstance(payload, str):
+                try:
+                    payload = json.loads(payload)
+                except json.JSONDecodeError:
+                    pass
+        except Exception:
+            try:
+                payload = decompressed.decode()
+                payload = json.loads(payload)
+            except Exception as e2:
+                payload_error = f"Failed to parse payload JSON: {str(e2)}"
+                payload = decompressed.decode(errors="replace")
+    except Exception as e:
+        payload_error = f"Failed to decompress or decode payload: {str(e)}"
+        payload = cose_msg.payload.hex()
+
+    output = {
+        "protected_headers": headers["protected_headers"],
+        "payload": payload,
+        "signatures": headers["signatures"],
+    }
+
+    if payload_error:
+        output["payload_error"] = payload_error
+
+    return output
+
+
+def decode_direct(raw_data: bytes, include_payload: bool = True) -> Dict[str, Any]:
+    """Direct CBOR decoder (decodeProposalDirect.py): no COSE parsing, first brotli item wins."""
+    if not include_payload:
+        # There are no headers outside the payload to return
+        return {}
+
+    payload = None
+    payload_error = None
+
+    try:
+        # Basic sanity check for CBOR format
+        if len(raw_data) < 2:
+            raise ValueError("Data too short to be valid CBOR")
+
+        cbor_data = loads_cbor(raw_data)
+
+        if isinstance(cbor_data, list):
+            # Limit array size to prevent excessive processing
+            if len(cbor_data) > 1000:
+                raise ValueError(f"CBOR array too large: {len(cbor_data)} items")
+
+            if len(cbor_data) > 0:
+                # Try to find compressed data in the array (limit iterations)
+                for i, item in enumerate(cbor_data[:100]):  # Limit to first 100 items
+                    if isinstance(item, bytes):
+                        if len(item) > MAX_COMPRESSED_ITEM_SIZE:
+                            continue
+                        try:
+                            # Decompression feeds the CBOR decoder directly and stops at the size cap
+                            payload = load_cbor(item, BROTLI)
+                            break
+                        except Exception:
+                            continue
+
+                # If no brotli-compressed data found, use the cbor_data as-is
+                if payload is None:
+                    payload = cbor_data
+        else:
+            payload = cbor_data
+
+    except Exception as e:
+        payload_error = f"Failed to decode CBOR: {truncate_error(e)}"
+        payload = hex_preview(raw_data)
+
+    output = {
+        "payload": payload,
+    }
+
+    if payload_error:
+        output["payload_error"] = payload_error
+
+    return output
+
+
+def decode_recursive(raw_data: bytes, include_payload: bool = True) -> Dict[str, Any]:
+    """Recursive decoder (decodeProposalRecursive.py): COSE first, then direct CBOR, nested blobs unpacked."""
+    # === Try COSE decode first, only when the leading tag says it is one
+    try:
+        # Basic sanity check for COSE format
+        if len(raw_data) >= 10 and is_cose(sniff_format(raw_data)):
+            cose_msg = parse_cose(raw_data if include_payload else without_payload(raw_data))
+
+            if hasattr(cose_msg, 'payload'):
+                headers = extract_cose_headers(cose_msg)
+
+                if not include_payload:
+                    return {
+                        "protected_headers": headers["protected_headers"],
+                        "signatures": headers["signatures"],
+                    }
+
+                # Decompress and recursively decode payload
+                try:
+                    decompressed = decompress(cose_msg.payload, BROTLI)
+                    payload = loads_cbor(decompressed)
+                    # Use special Catalyst payload handler
+                    payload = handle_catalyst_payload(payload, decoder=RecursiveDecoder())
+                except Exception:
+                    payload = cose_msg.payload.hex()
+
+                return {
+                    "protected_headers": headers["protected_headers"],
+                    "payload": payload,
+                    "signatures": headers["signatures"],
+                }
+
+    except Exception:
+        # Fall through to direct CBOR decode
+        pass
+
+    if not include_payload:
+        return {}
+
+    # === Try direct CBOR decode with recursive processing
+    try:
+        if len(raw_data) >= 2:
+            cbor_data = loads_cbor(raw_data)
+
+            # Use special Catalyst payload handler
+            payload = handle_catalyst_payload(cbor_data, decoder=RecursiveDecoder())
+
+            return {
+                "payload": payload,
+            }
+
+    except Exception as e:
+        return {
+            "payload": hex_preview(raw_data),
+            "payload_error": f"Failed to decode: {truncate_error(e)}"
+        }
+
+    return {}
+
+
+def decode_document(raw_data: bytes, include_payload: bool = True) -> Dict[str, Any]:
+    """
+    Single-pass entry point: pick the COSE or direct decoder from the leading
+    CBOR head instead of running one and retrying with the other.
+
+    The output is the chosen decoder's output plus "format" (what was sniffed)
+    and "decoder" (which path ran).
+    """
+    fmt = sniff_format(raw_data)
+    decoder = 'cose' if is_cose(fmt) else 'direct'
+
+    output = DECODERS[decoder](raw_data, include_payload)
+    output['format'] = fmt
+    output['decoder'] = decoder
+    return output
+
+
+DECODERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'auto': decode_document,
+    'cose': decode_cose,
+    'direct': decode_direct,
+    'recursive': decode_recursive,
+}
+
+
+def get_decoder(name: str) -> Optional[Callable[..., Dict[str, Any]]]:
+    return DECODERS.get(name)
+
+
+def decode_with_options(decoder: str, raw_data: bytes, verify: bool = False, fields: Optional[List[Field]] = None,
+                        normalize: bool = False) -> Dict[str, Any]:
+    """
+    Run a decoder, resolving the nested payload slots when asked for (see
+    normalize.py), keeping only the requested fields (the payload is skipped
+    when none of them need it) and adding "verification" when asked for.
+    """
+    output = DECODERS[decoder](raw_data, needs_payload(fields))
+    if normalize:
+        output = normalize_output(output)
+    if fields is not None:
+        output = project(output, fields)
+    if verify:
+        # nacl is only loaded when a signature is checked
+        from catalyst_decoder.verify import verify_document
+
+        output["verification"] = verify_document(raw_data)
+    return output
+
+
+def load_record(record: Dict[str, Any]) -> bytes:
+    """
+    Document bytes for a batch record: {"path": "/file.cbor"}, {"hex": "d862..."},
+    or {"path": "/container.cbor", "offset": 1024, "length": 512} for one
+    document inside a container file, read through a memory mapping.
+    """
+    if not isinstance(record, dict):
+        raise DecodeError("Record must be a JSON object")
+
+    if isinstance(record.get('data'), bytes):
+        # Archive members already read from a stream (see archive.py)
+        validate_input(record['data'])
+        return record['data']
+
+    if record.get('path') and 'offset' in record:
+        try:
+            with metrics.stage('read'):
+                raw_data = read_span(record['path'], int(record['offset']), int(record['length']))
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            raise DecodeError(f"Could not read input: {str(e)}")
+        validate_input(raw_data)
+        return raw_data
+
+    if record.get('path'):
+        return read_input(record['path'])
+
+    if record.get('hex'):
+        try:
+            with metrics.stage('read'):
+                raw_data = bytes.fromhex(record['hex'])
+        except (TypeError, ValueError) as e:
+            raise DecodeError(f"Invalid hex: {str(e)}")
+        validate_input(raw_data)
+        return raw_data
+
+    raise DecodeError("Record needs a \"path\" or \"hex\" field")
+
+
+def decode_record(record: Dict[str, Any], decoder: str, verify: bool = False, fields: Optional[List[Field]] = None,
+                  normalize: bool = False) -> Dict[str, Any]:
+    """Batch entry point; module level so it can be sent to pool workers."""
+    return decode_with_options(decoder, load_record(record), verify, fields, normalize)
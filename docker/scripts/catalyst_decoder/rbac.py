@@ -0,0 +1,203 @@
+"""
+CIP-509 RBAC registration chains.
+
+Every x509 envelope after the first names the transaction it extends in
+previous_transaction_id, so a user's registrations form a chain from a root
+envelope to the current head. Role data in a later envelope replaces the
+same role number from earlier ones; the stake key comes from the most
+recent certificate on the chain.
+
+ChainIndex keeps one small Envelope per transaction id in memory and
+memoises the effective state of every envelope it has resolved, so adding
+the next link of a known chain costs one merge, and a cold lookup walks the
+previous_transaction_id links once.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _tx_key(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    value = str(value).lower()
+    return value[2:] if value.startswith('0x') else value
+
+
+class Envelope:
+    """The parts of a normalised x509 envelope that chain resolution needs."""
+
+    __slots__ = ('tx_id', 'slot', 'previous_tx_id', 'purpose_uuid', 'stake_key', 'roles')
+
+    def __init__(self, tx_id: str, slot: Optional[int], previous_tx_id: Optional[str],
+                 purpose_uuid: Optional[str], stake_key: Optional[str], roles: Dict[int, Dict[str, Any]]):
+        self.tx_id = _tx_key(tx_id)
+        self.slot = slot
+        self.previous_tx_id = _tx_key(previous_tx_id)
+        self.purpose_uuid = purpose_uuid
+        self.stake_key = stake_key
+        self.roles = roles
+
+    @classmethod
+    def from_registration(cls, tx_id: str, slot: Optional[int], registration: Dict[str, Any]) -> Optional['Envelope']:
+        """Summary of TransactionsService.normalize_metadata output, None for anything but an x509 envelope."""
+        if not registration or registration.get('txType') != 'x509_envelope':
+            return None
+        rbac = (registration.get('x509_data') or {}).get('parsed_rbac') or {}
+        role_data = (rbac.get('extracted_data') or {}).get('role_data')
+        return cls(
+            tx_id=tx_id,
+            slot=slot,
+            previous_tx_id=registration.get('previous_transaction_id'),
+            purpose_uuid=(registration.get('purpose_info') or {}).get('uuid') or registration.get('purpose_uuid'),
+            stake_key=rbac.get('stake_key') or None,
+            roles=roles_from_role_data(role_data),
+        )
+
+
+def roles_from_role_data(role_data: Any) -> Dict[int, Dict[str, Any]]:
+    """parse_role_map output keyed by role number (key 0 of the role map)."""
+    if not isinstance(role_data, dict) or 'error' in role_data:
+        return {}
+    role = (role_data.get('role_assignments') or {}).get(0)
+    if not isinstance(role, int):
+        return {}
+    return {role: {
+        'signing_key_ref': role_data.get('signing_key_ref'),
+        'payment_key_ref': role_data.get('payment_key_ref'),
+    }}
+
+
+class Resolved:
+    """Effective state at one envelope: everything its chain has registered up to and including it."""
+
+    __slots__ = ('root', 'length', 'stake_key', 'roles', 'missing')
+
+    def __init__(self, root: str, length: int, stake_key: Optional[str], roles: Dict[int, Dict[str, Any]], missing: Optional[str]):
+        self.root = root
+        self.length = length
+        self.stake_key = stake_key
+        # role number -> role data plus the tx_id / slot that last set it
+        self.roles = roles
+        # previous_transaction_id on the way to the root that isn't known (yet)
+        self.missing = missing
+
+    @property
+    def complete(self) -> bool:
+        return self.missing is None
+
+    def extend(self, envelope: Envelope) -> 'Resolved':
+        roles = dict(self.roles)
+        for number, data in envelope.roles.items():
+            roles[number] = dict(data, tx_id=envelope.tx_id, slot=envelope.slot)
+        return Resolved(self.root, self.length + 1, envelope.stake_key or self.stake_key, roles, self.missing)
+
+
+class ChainIndex:
+    def __init__(self):
+        self._envelopes: Dict[str, Envelope] = {}
+        self._resolved: Dict[str, Resolved] = {}
+        # stake key -> tx_id of the newest envelope whose chain carries that stake key
+        self._heads: Dict[str, str] = {}
+        # root tx_id -> newest envelope of that chain
+        self._root_heads: Dict[str, str] = {}
+        # missing tx_id -> envelopes resolved without it, re-resolved once it arrives
+        self._waiting: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._envelopes)
+
+    def add(self, envelope: Envelope) -> None:
+        with self._lock:
+            if envelope.tx_id in self._envelopes:
+                return
+            self._envelopes[envelope.tx_id] = envelope
+            # This envelope may be the missing link of chains resolved before it arrived
+            stale = self._waiting.pop(envelope.tx_id, [])
+            for tx_id in stale:
+                self._resolved.pop(tx_id, None)
+            for tx_id in stale + [envelope.tx_id]:
+                self._set_head(self._resolve(tx_id), self._envelopes[tx_id])
+
+    def extend(self, envelopes: Iterable[Envelope]) -> 'ChainIndex':
+        for envelope in envelopes:
+            self.add(envelope)
+        return self
+
+    def _set_head(self, state: Resolved, envelope: Envelope) -> None:
+        for heads, key in ((self._heads, state.stake_key), (self._root_heads, state.root)):
+            if not key:
+                continue
+            current = self._envelopes.get(heads.get(key, ''))
+            # Envelopes normally arrive in slot order; the later slot wins if they don't
+            if current is None or (envelope.slot or 0) >= (current.slot or 0):
+                heads[key] = envelope.tx_id
+
+    def _resolve(self, tx_id: str) -> Resolved:
+        # Walk back to the nearest resolved ancestor (or the root), then fold forward
+        path: List[Envelope] = []
+        seen = set()
+        base = None
+        current = tx_id
+        while current is not None:
+            if current in self._resolved:
+                base = self._resolved[current]
+                break
+            envelope = self._envelopes.get(current)
+            if envelope is None or current in seen:
+                # Unknown previous transaction, or a cycle: resolve what we have as incomplete
+                base = Resolved(path[-1].tx_id if path else current, 0, None, {}, current)
+                break
+            seen.add(current)
+            path.append(envelope)
+            current = envelope.previous_tx_id
+
+        if base is None:
+            base = Resolved(path[-1].tx_id, 0, None, {}, None)
+        for envelope in reversed(path):
+            base = base.extend(envelope)
+            self._resolved[envelope.tx_id] = base
+            if base.missing is not None:
+                self._waiting.setdefault(base.missing, []).append(envelope.tx_id)
+        return base
+
+    def resolve(self, tx_id: str) -> Optional[Resolved]:
+        tx_id = _tx_key(tx_id)
+        with self._lock:
+            if tx_id not in self._envelopes:
+                return None
+            return self._resolve(tx_id)
+
+    def chain(self, tx_id: str) -> List[Envelope]:
+        """Envelopes from the root to tx_id, as far back as they are known."""
+        result = []
+        seen = set()
+        current = _tx_key(tx_id)
+        while current in self._envelopes and current not in seen:
+            seen.add(current)
+            result.append(self._envelopes[current])
+            current = self._envelopes[current].previous_tx_id
+        result.reverse()
+        return result
+
+    def head(self, stake_key: str) -> Optional[str]:
+        return self._heads.get(stake_key)
+
+    def roles_for_stake(self, stake_key: str) -> Optional[Dict[str, Any]]:
+        """Current effective roles of the chain registered to stake_key."""
+        head = self._heads.get(stake_key)
+        if head is None:
+            return None
+        head = self._root_heads.get(self.resolve(head).root, head)
+        state = self.resolve(head)
+        if state.stake_key != stake_key:
+            # A later certificate on the chain moved it to another stake key
+            return None
+        return {
+            'stake_key': stake_key,
+            'root_tx_id': state.root,
+            'head_tx_id': head,
+            'chain_length': state.length,
+            'complete': state.complete,
+            'roles': {number: state.roles[number] for number in sorted(state.roles)},
+        }
@@ -0,0 +1,177 @@
+"""
+Compact in-memory registrations.
+
+normalize_metadata returns one dict per registration with a nested dict per
+delegation, a bech32 key string repeated in every delegation, an
+x509_envelope that copies half of the outer dict, and optionally the whole
+decompressed x509 payload as hex. That is fine for printing one
+transaction, but a snapshot of every registration on chain held that way
+runs into gigabytes.
+
+Registration keeps the same content in slots: strings that recur across
+registrations (stake keys, voting keys, addresses) are interned, delegations
+are a tuple of voting keys plus an array of weights, and everything that can
+be derived (votePublicKey, purpose_info, x509_envelope) is dropped and
+rebuilt by to_dict(), which returns exactly what normalize_metadata did.
+The raw x509 payload is only kept when asked for, as bytes.
+"""
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from catalyst_decoder import keys
+
+# Fields rebuilt by to_dict rather than stored
+_DERIVED = ('purpose_info', 'x509_envelope')
+
+KNOWN_PURPOSES = {
+    'ca7a1457-ef9f-4c7f-9c74-7f8c4a4cfa6c': 'Project Catalyst User Role Registrations',
+    'ca7ad312-a19b-4412-ad53-2a36fb14e2e5': 'Project Catalyst Admin Role Registrations',
+}
+
+_field_orders: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _share(fields: Tuple[str, ...]) -> Tuple[str, ...]:
+    """One copy of each distinct field order across all records."""
+    return _field_orders.setdefault(fields, fields)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def hex_to_uuid(hex_str: str) -> str:
+    if len(hex_str) == 32:
+        return f"{hex_str[0:8]}-{hex_str[8:12]}-{hex_str[12:16]}-{hex_str[16:20]}-{hex_str[20:32]}"
+    return hex_str
+
+
+def purpose_info(purpose_uuid: str) -> Dict[str, Any]:
+    uuid_str = hex_to_uuid(purpose_uuid)
+    return {
+        'uuid': uuid_str,
+        'description': KNOWN_PURPOSES.get(uuid_str, 'Unknown purpose'),
+        'is_catalyst': uuid_str.startswith('ca7a'),
+        'is_known': uuid_str in KNOWN_PURPOSES,
+    }
+
+
+class Delegations:
+    """voter_delegations as parallel columns: interned voting key hex and weights."""
+
+    __slots__ = ('voting_keys', 'weights')
+
+    def __init__(self, voting_keys: Tuple[str, ...], weights):
+        self.voting_keys = voting_keys
+        self.weights = weights
+
+    @classmethod
+    def from_list(cls, delegations: List[Dict[str, Any]]) -> 'Delegations':
+        voting_keys = tuple(sys.intern(d['voting_key']) for d in delegations)
+        weights = [d['weight'] for d in delegations]
+        try:
+            weights = array('q', weights)
+        except (TypeError, OverflowError):
+            # Not all int64s (malformed metadata); keep them as they came
+            weights = tuple(weights)
+        return cls(voting_keys, weights)
+
+    def __len__(self) -> int:
+        return len(self.voting_keys)
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self.voting_keys, self.weights)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'voting_key': voting_key,
+                'votePublicKey': keys.public_key_bech32(bytes.fromhex(voting_key)),
+                'weight': weight,
+            }
+            for voting_key, weight in self
+        ]
+
+
+class Registration:
+    """One normalised CIP-15 / CIP-36 / x509 registration; to_dict() gives the normalize_metadata shape."""
+
+    __slots__ = (
+        'fields', 'txType', 'stake_pub', 'stake_hex', 'stake_key', 'payment_address', 'nonce',
+        'voting_purpose', 'voter_delegations', 'purpose_uuid', 'txn_inputs_hash',
+        'previous_transaction_id', 'compression_type', 'validation_signature',
+        'parsed_rbac', 'x509_error', 'raw_data', 'extra',
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, None)
+
+    @classmethod
+    def from_normalized(cls, normalized: Dict[str, Any], keep_raw: bool = False) -> 'Registration':
+        record = cls()
+        extra = {}
+        for name, value in normalized.items():
+            if name == 'voter_delegations' and isinstance(value, list):
+                record.voter_delegations = Delegations.from_list(value)
+            elif name == 'x509_data':
+                record._set_x509_data(value, keep_raw)
+            elif name in _DERIVED:
+                continue
+            elif name in cls.__slots__ and name not in ('fields', 'extra'):
+                setattr(record, name, _intern(value))
+            else:
+                extra[name] = value
+        record.fields = _share(tuple(normalized))
+        record.extra = extra or None
+        return record
+
+    def _set_x509_data(self, x509_data: Dict[str, Any], keep_raw: bool) -> None:
+        if 'error' in x509_data:
+            self.x509_error = x509_data
+            return
+        self.parsed_rbac = x509_data.get('parsed_rbac')
+        if keep_raw and 'data' in x509_data:
+            self.raw_data = bytes.fromhex(x509_data['data'])
+
+    @property
+    def purpose_info(self) -> Optional[Dict[str, Any]]:
+        return purpose_info(self.purpose_uuid) if self.purpose_uuid is not None else None
+
+    def x509_data(self) -> Dict[str, Any]:
+        if self.x509_error is not None:
+            return dict(self.x509_error)
+        result = {}
+        if self.raw_data is not None:
+            result['data'] = self.raw_data.hex()
+        result['parsed_rbac'] = self.parsed_rbac
+        return result
+
+    def x509_envelope(self) -> Dict[str, Any]:
+        return {
+            'purpose_uuid': self.purpose_uuid,
+            'purpose_info': self.purpose_info,
+            'txn_inputs_hash': self.txn_inputs_hash,
+            'previous_transaction_id': self.previous_transaction_id,
+            'validation_signature': self.validation_signature,
+            'compression_type': self.compression_type,
+            'roles': (self.parsed_rbac or {}).get('roles', []),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {}
+        for name in self.fields:
+            if name == 'voter_delegations' and isinstance(self.voter_delegations, Delegations):
+                result[name] = self.voter_delegations.to_list()
+            elif name == 'x509_data':
+                result[name] = self.x509_data()
+            elif name == 'purpose_info':
+                result[name] = self.purpose_info
+            elif name == 'x509_envelope':
+                result[name] = self.x509_envelope()
+            elif self.extra is not None and name in self.extra:
+                result[name] = self.extra[name]
+            else:
+                result[name] = getattr(self, name)
+        return result
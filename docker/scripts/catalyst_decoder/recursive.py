@@ -0,0 +1,258 @@
+"""
+Recursive unpacking of nested hex / CBOR / brotli values in Catalyst payloads.
+
+RecursiveDecoder walks the value with an explicit stack instead of Python
+recursion, and charges every visited node and every speculatively decoded
+or decompressed byte to per-document budgets. Once a budget is spent the
+remaining values are returned as they are.
+
+A blob is only treated as embedded CBOR when it is exactly one well-formed
+CBOR item. The item head is checked first, which rejects most non-CBOR
+blobs without running the decoder; a blob that merely starts with a valid
+head (e.g. brotli data whose first byte reads as an integer) is left for
+the brotli attempt instead of being misread.
+"""
+import io
+import re
+import sys
+import json
+import cbor2
+from typing import Any, List, Optional
+
+from catalyst_decoder import metrics
+from catalyst_decoder.decompress import BROTLI, DEFAULT_MAX_DECOMPRESSED_SIZE, DecompressionLimitExceeded, decompress
+from catalyst_decoder.sniff import MAJOR_ARRAY, MAJOR_MAP, read_head
+
+DEFAULT_MAX_DEPTH = 10
+DEFAULT_MAX_NODES = 200_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_HEX_RE = re.compile(r'(?:[0-9a-fA-F]{2})+')
+
+_VISIT = 0
+_BUILD_DICT = 1
+
+
+class _NotDecoded:
+    pass
+
+
+NOT_DECODED = _NotDecoded()
+
+
+def is_hex(value: str) -> bool:
+    """Non-empty, even-length, hex digits only."""
+    return _HEX_RE.fullmatch(value) is not None
+
+
+class RecursiveDecoder:
+    def __init__(self, max_depth: int = DEFAULT_MAX_DEPTH, max_nodes: int = DEFAULT_MAX_NODES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_bytes = max_bytes
+        self.nodes_visited = 0
+        self.bytes_examined = 0
+        self.budget_exhausted = False
+
+    def _charge_bytes(self, size: int) -> bool:
+        if self.bytes_examined + size > self.max_bytes:
+            self._exhaust(f"Byte budget ({self.max_bytes}) reached, returning remaining values undecoded")
+            return False
+        self.bytes_examined += size
+        metrics.count('speculative_bytes', size)
+        return True
+
+    def _exhaust(self, message: str) -> None:
+        if not self.budget_exhausted:
+            print(f"WARNING: {message}", file=sys.stderr)
+        self.budget_exhausted = True
+
+    def load_complete_cbor(self, data: bytes) -> Any:
+        """The decoded item if data is exactly one well-formed CBOR item, else NOT_DECODED."""
+        head = read_head(data)
+        if head is None:
+            return NOT_DECODED
+
+        major, argument, offset = head
+        if major in (0, 1, 7):
+            # Integers and simple values are the head itself; a lone break code is not an item
+            if offset != len(data) or (major == 7 and argument == -1):
+                return NOT_DECODED
+        elif major in (2, 3) and argument != -1:
+            if offset + argument != len(data):
+                return NOT_DECODED
+        elif major in (MAJOR_ARRAY, MAJOR_MAP) and argument != -1:
+            # Every element takes at least one byte
+            if argument * (2 if major == MAJOR_MAP else 1) > len(data) - offset:
+                return NOT_DECODED
+
+        if not self._charge_bytes(len(data)):
+            return NOT_DECODED
+
+        fp = io.BytesIO(data)
+        try:
+            with metrics.stage('recursive'):
+                decoded = cbor2.CBORDecoder(fp).decode()
+        except Exception:
+            return NOT_DECODED
+        if fp.tell() != len(data):
+            return NOT_DECODED
+        return decoded
+
+    def decompress_brotli(self, data: bytes) -> Optional[bytes]:
+        remaining = self.max_bytes - self.bytes_examined
+        if remaining <= 0:
+            self._exhaust(f"Byte budget ({self.max_bytes}) reached, returning remaining values undecoded")
+            return None
+        limit = min(remaining, DEFAULT_MAX_DECOMPRESSED_SIZE or remaining)
+        try:
+            decompressed = decompress(data, BROTLI, limit)
+        except DecompressionLimitExceeded:
+            if limit == remaining:
+                self._exhaust(f"Byte budget ({self.max_bytes}) reached, returning remaining values undecoded")
+            return None
+        except Exception:
+            return None
+        self.bytes_examined += len(decompressed)
+        metrics.count('speculative_bytes', len(decompressed))
+        return decompressed
+
+    def decode(self, data: Any, depth: int = 0) -> Any:
+        """Iterative equivalent of the old recursive_decode_cbor."""
+        root: List[Any] = [None]
+        stack = [(_VISIT, data, depth, root, 0)]
+        with metrics.stage('recursive'):
+            nodes_before = self.nodes_visited
+            while stack:
+                task = stack.pop()
+                if task[0] == _BUILD_DICT:
+                    _, pairs, target, index = task
+                    result = {}
+                    for key, original_key, value in pairs:
+                        try:
+                            result[key] = value
+                        except TypeError:
+                            # A key that decoded to a list/dict can't be a key any more
+                            result[original_key] = value
+                    target[index] = result
+                    continue
+
+                _, value, depth, target, index = task
+                target[index] = self._visit(value, depth, stack, target, index)
+            metrics.count('nodes_visited', self.nodes_visited - nodes_before)
+
+        return root[0]
+
+    def _visit(self, data: Any, depth: int, stack: list, target: list, index: int) -> Any:
+        if depth > self.max_depth:
+            return data  # Prevent infinite nesting
+
+        self.nodes_visited += 1
+        if self.nodes_visited > self.max_nodes:
+            self._exhaust(f"Maximum nodes ({self.max_nodes}) reached, returning remaining values undecoded")
+            return data
+
+        if isinstance(data, str):
+            # Try to decode hex strings as CBOR
+            if self.budget_exhausted or not is_hex(data):
+                return data
+            decoded = self.load_complete_cbor(bytes.fromhex(data))
+            if decoded is NOT_DECODED:
+                return data
+            stack.append((_VISIT, decoded, depth + 1, target, index))
+            return None
+
+        if isinstance(data, bytes):
+            if self.budget_exhausted:
+                return data.hex()
+
+            decoded = self.load_complete_cbor(data)
+            if decoded is not NOT_DECODED:
+                stack.append((_VISIT, decoded, depth + 1, target, index))
+                return None
+
+            decompressed = self.decompress_brotli(data)
+            if decompressed is not None:
+                decoded = self.load_complete_cbor(decompressed)
+                if decoded is not NOT_DECODED:
+                    stack.append((_VISIT, decoded, depth + 1, target, index))
+                    return None
+                # If not CBOR, try as text/JSON
+                try:
+                    text = decompressed.decode('utf-8')
+                    try:
+                        return json.loads(text)
+                    except json.JSONDecodeError:
+                        return text
+                except UnicodeDecodeError:
+                    pass
+
+            # Return as hex string if can't decode
+            return data.hex()
+
+        if isinstance(data, list):
+            result = [None] * len(data)
+            for i in range(len(data) - 1, -1, -1):
+                stack.append((_VISIT, data[i], depth + 1, result, i))
+            return result
+
+        if isinstance(data, dict):
+            pairs = [[key, key, None] for key in data]
+            stack.append((_BUILD_DICT, pairs, target, index))
+            # Pushed in reverse so entries are decoded in order when a budget cuts in
+            for slot, value in zip(reversed(pairs), reversed(list(data.values()))):
+                stack.append((_VISIT, value, depth + 1, slot, 2))
+                # Also try to decode keys if they're bytes/strings
+                if isinstance(slot[0], (bytes, str)):
+                    stack.append((_VISIT, slot[0], depth + 1, slot, 0))
+            return None
+
+        # Return primitive types as-is
+        return data
+
+
+def recursive_decode_cbor(data, depth=0, max_depth=DEFAULT_MAX_DEPTH):
+    """Recursively decode CBOR data at any nesting level"""
+    return RecursiveDecoder(max_depth=max_depth).decode(data, depth)
+
+
+def handle_catalyst_payload(payload_array, depth=0, max_depth=DEFAULT_MAX_DEPTH, decoder: Optional[RecursiveDecoder] = None):
+    """Specifically handle Catalyst document payload structure"""
+    if decoder is None:
+        decoder = RecursiveDecoder(max_depth=max_depth)
+
+    if not isinstance(payload_array, list):
+        return decoder.decode(payload_array, depth)
+
+    # Process each element of the payload array
+    result = []
+    for i, item in enumerate(payload_array):
+        if i == 1 and isinstance(item, (bytes, str)):
+            # payload[1] typically contains brotli-compressed proposal data
+            if isinstance(item, str) and is_hex(item):
+                item = bytes.fromhex(item)
+
+            if isinstance(item, bytes) and len(item) > 0:
+                decompressed = decoder.decompress_brotli(item)
+                if decompressed is not None:
+                    # Try CBOR decode of decompressed data
+                    proposal_data = decoder.load_complete_cbor(decompressed)
+                    if proposal_data is not NOT_DECODED:
+                        result.append(decoder.decode(proposal_data, depth + 1))
+                        continue
+
+                    try:
+                        # Try as JSON, then as plain text
+                        text = decompressed.decode('utf-8')
+                        try:
+                            result.append(json.loads(text))
+                        except json.JSONDecodeError:
+                            result.append(text)
+                        continue
+                    except UnicodeDecodeError:
+                        pass
+
+        # Default recursive processing for all other items
+        result.append(decoder.decode(item, depth))
+
+    return result
@@ -0,0 +1,344 @@
+"""
+Incremental index of voter registrations.
+
+Transactions carrying CIP-15 / CIP-36 / x509 registration metadata are fed
+in slot order, normalised by the caller (TransactionsService.normalize_metadata),
+and kept in a SQLite file:
+
+    stake key    -> latest CIP-15 / CIP-36 registration (highest nonce, later slot on a tie)
+    voting key   -> stake keys currently delegating to it, with their weights
+    purpose UUID -> x509 envelopes registered under it
+
+Every transaction id is stored, so feeding the same transaction twice is a
+no-op. A checkpoint (last slot and transaction id) is committed together
+with the rows it covers every commit_every transactions; after a crash the
+feed is restarted from the checkpoint slot and nothing is lost or counted
+twice.
+"""
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from catalyst_decoder.rbac import Envelope
+
+DEFAULT_COMMIT_EVERY = 1000
+
+# Registration types that carry a nonce and replace earlier ones for the same stake key
+VOTER_REGISTRATIONS = ('cip15', 'cip36')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS registrations (
+    tx_id TEXT PRIMARY KEY,
+    slot INTEGER,
+    tx_type TEXT NOT NULL,
+    stake_key TEXT,
+    stake_hex TEXT,
+    nonce INTEGER,
+    voting_purpose INTEGER,
+    payment_address TEXT,
+    purpose_uuid TEXT,
+    delegations TEXT,
+    previous_tx_id TEXT,
+    roles TEXT
+);
+CREATE INDEX IF NOT EXISTS registrations_purpose ON registrations (purpose_uuid, slot);
+CREATE TABLE IF NOT EXISTS latest_registration (
+    stake_key TEXT PRIMARY KEY,
+    stake_hex TEXT,
+    tx_id TEXT NOT NULL,
+    nonce INTEGER,
+    slot INTEGER
+);
+CREATE INDEX IF NOT EXISTS latest_registration_hex ON latest_registration (stake_hex);
+CREATE TABLE IF NOT EXISTS delegations (
+    voting_key TEXT NOT NULL,
+    stake_key TEXT NOT NULL,
+    weight INTEGER NOT NULL,
+    tx_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS delegations_voting_key ON delegations (voting_key);
+CREATE INDEX IF NOT EXISTS delegations_stake_key ON delegations (stake_key);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    slot INTEGER,
+    tx_id TEXT,
+    transactions INTEGER NOT NULL
+);
+'''
+
+
+@dataclass
+class IndexStats:
+    transactions: int = 0
+    indexed: int = 0
+    skipped: int = 0
+    errors: int = 0
+
+
+def _hex_key(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).lower()
+    return value[2:] if value.startswith('0x') else value
+
+
+def _uuid_key(value: Optional[str]) -> Optional[str]:
+    """Purpose UUIDs are stored dashed; hex with or without dashes is accepted."""
+    if not value:
+        return None
+    digits = _hex_key(value).replace('-', '')
+    if len(digits) != 32:
+        return value
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def _order(nonce: Optional[int], slot: Optional[int]) -> tuple:
+    # CIP-36: the highest nonce wins; the slot only breaks ties
+    return (nonce if isinstance(nonce, int) else -1, slot if slot is not None else -1)
+
+
+class RegistrationIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute('SELECT slot, tx_id, transactions FROM checkpoint WHERE id = 0').fetchone()
+        if row is None:
+            return None
+        return {'slot': row[0], 'tx_id': row[1], 'transactions': row[2]}
+
+    def add(self, tx_id: str, slot: Optional[int], registration: Dict[str, Any]) -> bool:
+        """
+        Index one normalised registration. Returns False when tx_id is already
+        indexed or the metadata isn't a registration. Rows are only durable
+        once commit() has run.
+        """
+        tx_type = registration.get('txType') if registration else None
+        if not tx_type:
+            return False
+
+        stake_key = registration.get('stake_key') or None
+        stake_hex = _hex_key(registration.get('stake_hex')) or None
+        nonce = registration.get('nonce')
+        delegations = [
+            {'voting_key': _hex_key(d.get('voting_key')), 'weight': d.get('weight', 1)}
+            for d in registration.get('voter_delegations') or []
+            if isinstance(d, dict) and d.get('voting_key')
+        ]
+        purpose_uuid = previous_tx_id = roles = None
+        envelope = Envelope.from_registration(tx_id, slot, registration)
+        if envelope is not None:
+            purpose_uuid = _uuid_key(envelope.purpose_uuid)
+            previous_tx_id = envelope.previous_tx_id
+            roles = json.dumps(envelope.roles)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO registrations '
+                '(tx_id, slot, tx_type, stake_key, stake_hex, nonce, voting_purpose, payment_address, purpose_uuid, delegations, previous_tx_id, roles) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    tx_id, slot, tx_type, stake_key, stake_hex,
+                    nonce if isinstance(nonce, int) else None,
+                    registration.get('voting_purpose'),
+                    registration.get('payment_address'),
+                    purpose_uuid,
+                    json.dumps(delegations),
+                    previous_tx_id,
+                    roles,
+                ),
+            )
+            if cursor.rowcount == 0:
+                return False
+
+            if tx_type in VOTER_REGISTRATIONS and stake_key:
+                self._update_latest(tx_id, slot, stake_key, stake_hex, nonce, delegations)
+            return True
+
+    def _update_latest(self, tx_id, slot, stake_key, stake_hex, nonce, delegations) -> None:
+        current = self._conn.execute(
+            'SELECT nonce, slot FROM latest_registration WHERE stake_key = ?', (stake_key,)
+        ).fetchone()
+        # Transactions arrive in slot order, so a tie on (nonce, slot) goes to the later one
+        if current is not None and _order(nonce, slot) < _order(*current):
+            return
+
+        self._conn.execute(
+            'INSERT OR REPLACE INTO latest_registration (stake_key, stake_hex, tx_id, nonce, slot) VALUES (?, ?, ?, ?, ?)',
+            (stake_key, stake_hex, tx_id, nonce if isinstance(nonce, int) else None, slot),
+        )
+        # A new registration replaces every earlier delegation of the stake key
+        self._conn.execute('DELETE FROM delegations WHERE stake_key = ?', (stake_key,))
+        self._conn.executemany(
+            'INSERT INTO delegations (voting_key, stake_key, weight, tx_id) VALUES (?, ?, ?, ?)',
+            [(d['voting_key'], stake_key, d['weight'], tx_id) for d in delegations],
+        )
+
+    def commit(self, slot: Optional[int], tx_id: Optional[str], transactions: int) -> None:
+        """Make everything added so far durable, together with the checkpoint that covers it."""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO checkpoint (id, slot, tx_id, transactions) VALUES (0, ?, ?, ?)',
+                (slot, tx_id, transactions),
+            )
+            self._conn.commit()
+
+    def latest_registration(self, stake: str) -> Optional[Dict[str, Any]]:
+        """Latest registration of a stake address (bech32) or stake address hex."""
+        row = self._conn.execute(
+            'SELECT tx_id FROM latest_registration WHERE stake_key = ? OR stake_hex = ?',
+            (stake, _hex_key(stake)),
+        ).fetchone()
+        if row is None:
+            return None
+        return self.registration(row[0])
+
+    def delegators(self, voting_key: str) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            'SELECT d.stake_key, d.weight, d.tx_id, l.nonce, l.slot FROM delegations d '
+            'JOIN latest_registration l ON l.stake_key = d.stake_key '
+            'WHERE d.voting_key = ? ORDER BY d.stake_key',
+            (_hex_key(voting_key),),
+        )
+        return [
+            {'stake_key': stake_key, 'weight': weight, 'tx_id': tx_id, 'nonce': nonce, 'slot': slot}
+            for stake_key, weight, tx_id, nonce, slot in rows
+        ]
+
+    def purpose_registrations(self, purpose_uuid: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = 'SELECT tx_id FROM registrations WHERE purpose_uuid = ? ORDER BY slot, tx_id'
+        params: tuple = (_uuid_key(purpose_uuid),)
+        if limit:
+            query += ' LIMIT ?'
+            params += (limit,)
+        return [self.registration(tx_id) for (tx_id,) in self._conn.execute(query, params).fetchall()]
+
+    def registration(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        cursor = self._conn.execute('SELECT * FROM registrations WHERE tx_id = ?', (tx_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        result = dict(zip((column[0] for column in cursor.description), row))
+        result['delegations'] = json.loads(result['delegations'] or '[]')
+        result['roles'] = json.loads(result['roles']) if result['roles'] else None
+        return result
+
+    def voter_registrations(self) -> Iterator[Dict[str, Any]]:
+        """Every indexed CIP-15 / CIP-36 registration in slot order, shaped for DelegationTable."""
+        rows = self._conn.execute(
+            "SELECT stake_key, stake_hex, nonce, voting_purpose, delegations FROM registrations "
+            "WHERE tx_type IN ('cip15', 'cip36') ORDER BY slot, rowid"
+        )
+        for stake_key, stake_hex, nonce, voting_purpose, delegations in rows:
+            yield {
+                'stake_key': stake_key,
+                'stake_hex': stake_hex,
+                'nonce': nonce,
+                'voting_purpose': voting_purpose,
+                'voter_delegations': json.loads(delegations or '[]'),
+            }
+
+    def envelopes(self) -> Iterator[Envelope]:
+        """Every indexed x509 envelope in slot order, for building a ChainIndex in one query."""
+        rows = self._conn.execute(
+            "SELECT tx_id, slot, previous_tx_id, purpose_uuid, stake_key, roles FROM registrations "
+            "WHERE tx_type = 'x509_envelope' ORDER BY slot, rowid"
+        )
+        for tx_id, slot, previous_tx_id, purpose_uuid, stake_key, roles in rows:
+            # JSON turned the role numbers into strings
+            roles = {int(number): data for number, data in json.loads(roles or '{}').items()}
+            yield Envelope(tx_id, slot, previous_tx_id, purpose_uuid, stake_key, roles)
+
+    def stats(self) -> Dict[str, Any]:
+        count = lambda table: self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        return {
+            'registrations': count('registrations'),
+            'stake_keys': count('latest_registration'),
+            'delegations': count('delegations'),
+            'checkpoint': self.checkpoint(),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def _tx_id(record: Dict[str, Any]) -> Optional[str]:
+    for field in ('tx_hash', 'id'):
+        if record.get(field) is not None:
+            return str(record[field])
+    return None
+
+
+def _slot(record: Dict[str, Any]) -> Optional[int]:
+    for field in ('slot', 'block_slot', 'absolute_slot'):
+        value = record.get(field)
+        if value is not None:
+            return int(value)
+    return None
+
+
+def index_transactions(
+    index: RegistrationIndex,
+    normalize: Callable[[Dict[str, Any]], Dict[str, Any]],
+    records: Iterable[Dict[str, Any]],
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+    on_error: Optional[Callable[[Optional[str], Exception], None]] = None,
+) -> IndexStats:
+    """
+    Feed transactions ({"tx_hash" or "id", "slot", "json_metadata"}) in slot
+    order into index. Anything before the stored checkpoint slot is skipped
+    unread; transactions in the checkpoint slot itself are deduplicated by id.
+    """
+    stats = IndexStats()
+    checkpoint = index.checkpoint() or {}
+    resume_slot = checkpoint.get('slot')
+    total = checkpoint.get('transactions') or 0
+    last_slot, last_tx = resume_slot, checkpoint.get('tx_id')
+    uncommitted = 0
+
+    for record in records:
+        stats.transactions += 1
+        slot = _slot(record)
+        if resume_slot is not None and slot is not None and slot < resume_slot:
+            stats.skipped += 1
+            continue
+
+        tx_id = _tx_id(record)
+        if tx_id is None:
+            stats.errors += 1
+            if on_error:
+                on_error(None, ValueError("Transaction has no tx_hash or id"))
+            continue
+
+        try:
+            registration = normalize(record.get('json_metadata'))
+        except Exception as e:
+            stats.errors += 1
+            if on_error:
+                on_error(tx_id, e)
+            continue
+
+        if index.add(tx_id, slot, registration):
+            stats.indexed += 1
+            total += 1
+        else:
+            stats.skipped += 1
+
+        if slot is not None:
+            last_slot, last_tx = slot, tx_id
+        uncommitted += 1
+        if uncommitted >= commit_every:
+            index.commit(last_slot, last_tx, total)
+            uncommitted = 0
+
+    index.commit(last_slot, last_tx, total)
+    return stats
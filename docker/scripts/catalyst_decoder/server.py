@@ -0,0 +1,409 @@
+"""
+Long-lived decoder worker.
+
+Spawning /venv/bin/python3 per document pays the import cost of cbor2, brotli
+and pycose every time. This worker imports them once and then serves decode
+requests either over stdin/stdout or over a Unix socket. pycose and pycardano
+are imported lazily by the decoders (see keys.py), so main() preloads them
+before serving rather than charging the first request for it.
+
+Wire format (both transports), every frame is a 4-byte big-endian length
+followed by that many bytes:
+
+    request:  <header frame: JSON {"type": "auto" | "cose" | "direct" | "recursive" | "wallet_signature" | "ping" | "stats",
+                                   "verify": true, "fields": "a,b.c", "normalize": true (optional, documents),
+                                   "key": "<hex>" (optional, signatures),
+                                   "metrics": true (optional, adds "_metrics" to the response)}>
+              <body frame: raw document bytes, the hex signature for "wallet_signature",
+                           may be empty for "ping">
+    response: <frame: JSON, same shape the matching script prints>
+
+Responses are written in request order on each connection. The socket
+server below takes one connection at a time; with --workers N it is
+replaced by the asyncio server in async_server.py, which takes any number
+of connections, decodes in a pool of N processes, and answers requests
+beyond its queue limit with "busy" instead of queueing them.
+
+"wallet_signature" answers what DecodeWalletSignature.py prints, with
+pycardano already loaded. Logins shouldn't queue behind document decodes, so
+run a separate instance on its own socket for them. Signatures seen within
+--replay-window seconds are answered from memory.
+
+With --cache the serialised responses are also kept in an on-disk store
+keyed by the document hash (see cache.py), so documents that haven't changed
+since the last sync are answered without decoding them again. Errors are
+never cached.
+
+With --metrics (or DECODER_METRICS / DECODER_METRICS_TEXTFILE set) the
+per-stage timings and counters of every request are added up (see
+metrics.py): "stats" returns the totals since the worker started, and
+DECODER_METRICS_TEXTFILE gets them at most every METRICS_FLUSH_INTERVAL
+seconds and on exit. A request with "metrics": true gets its own in
+"_metrics" either way, and bypasses the cache.
+"""
+import os
+import sys
+import json
+import signal
+import struct
+import argparse
+import functools
+import time
+import threading
+import socketserver
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from catalyst_decoder import DECODER_VERSION, metrics
+from catalyst_decoder.cache import DEFAULT_MAX_BYTES, DecodeCache
+from catalyst_decoder.encoding import dumps
+from catalyst_decoder.projection import parse_fields
+from catalyst_decoder.proposals import MAX_INPUT_SIZE, DecodeError, decode_with_options, get_decoder, validate_input
+from catalyst_decoder.signatures import DEFAULT_REPLAY_WINDOW, SignatureDecoder
+
+FRAME_HEADER = struct.Struct('>I')
+MAX_HEADER_SIZE = 64 * 1024
+DEFAULT_REQUEST_TIMEOUT = 25  # seconds, less than PHP's 30 second timeout
+SIGNATURE_REQUEST = 'wallet_signature'
+METRICS_FLUSH_INTERVAL = 60  # seconds between textfile writes
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class DecodeTimeout(BaseException):
+    # BaseException so the decoders' broad "except Exception" fallbacks can't swallow it
+    pass
+
+
+def _timeout_handler(signum, frame):
+    raise DecodeTimeout("Decoder timed out")
+
+
+def read_exact(stream: BinaryIO, size: int) -> Optional[bytes]:
+    """Read exactly size bytes, None on a clean EOF before the first byte."""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ProtocolError(f"Unexpected end of stream ({size - remaining}/{size} bytes)")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def read_frame(stream: BinaryIO, max_size: int) -> Optional[bytes]:
+    header = read_exact(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > max_size:
+        raise ProtocolError(f"Frame too large: {length} bytes")
+    if length == 0:
+        return b''
+    data = read_exact(stream, length)
+    if data is None:
+        raise ProtocolError("Unexpected end of stream")
+    return data
+
+
+def write_frame(stream: BinaryIO, data: bytes) -> None:
+    stream.write(FRAME_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def parse_header(header: bytes) -> Optional[Dict[str, Any]]:
+    """The request header as a dict with a "type", None when it isn't one."""
+    try:
+        request = json.loads(header)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(request, dict) or not isinstance(request.get('type'), str) or not request['type']:
+        return None
+    return request
+
+
+class DecoderService:
+    """Dispatches framed requests to the decode functions, one at a time."""
+
+    def __init__(
+        self,
+        request_timeout: int = DEFAULT_REQUEST_TIMEOUT,
+        max_requests: int = 0,
+        cache: Optional[DecodeCache] = None,
+        signatures: Optional[SignatureDecoder] = None,
+        collect_metrics: bool = False,
+    ):
+        self.request_timeout = request_timeout
+        self.max_requests = max_requests
+        self.requests_served = 0
+        self.cache = cache
+        self.signatures = signatures or SignatureDecoder()
+        # Totals for "stats", and what the textfile hasn't been given yet
+        self.metrics = metrics.Collector.totals() if collect_metrics else None
+        self.unflushed = metrics.Collector.totals() if collect_metrics else None
+        self.flushed_at = time.monotonic()
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.max_requests) and self.requests_served >= self.max_requests
+
+    def handle(self, request_type: str, raw_data: bytes, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        options = options or {}
+        if request_type == 'ping':
+            status = {'status': 'ok', 'version': DECODER_VERSION, 'pid': os.getpid()}
+            if self.cache is not None:
+                status['cache'] = self.cache.stats()
+            if self.signatures.replay is not None:
+                status['replay'] = self.signatures.replay.stats()
+            return status
+
+        if request_type == 'stats':
+            if self.metrics is None:
+                return {'error': "Metrics are off; start the server with --metrics"}
+            return {'requests': self.metrics.runs, **self.metrics.to_dict()}
+
+        if request_type == SIGNATURE_REQUEST:
+            key = options.get('key')
+            return self.signatures.decode(raw_data.decode('ascii', errors='replace'), key if isinstance(key, str) else None)
+
+        if get_decoder(request_type) is None:
+            return {'error': f"Unknown request type: {request_type}"}
+
+        try:
+            fields = parse_fields(options['fields']) if options.get('fields') else None
+        except (AttributeError, ValueError) as e:
+            return {'error': f"Invalid fields: {str(e)}"}
+        decode = functools.partial(
+            decode_with_options, request_type,
+            verify=bool(options.get('verify')), fields=fields, normalize=bool(options.get('normalize')),
+        )
+
+        try:
+            validate_input(raw_data)
+            return self._with_timeout(decode, raw_data)
+        except DecodeError as e:
+            return {'error': str(e)}
+        except DecodeTimeout as e:
+            return {'error': str(e)}
+        except Exception as e:
+            return {'error': f"Decoder failed: {str(e)[:200]}"}
+
+    def respond(self, request_type: str, raw_data: bytes, options: Optional[Dict[str, Any]] = None) -> bytes:
+        """Serialised response for one request, from the cache when the document was seen before."""
+        options = options or {}
+        if request_type in ('ping', 'stats'):
+            return dumps(self.handle(request_type, raw_data, options)).encode()
+
+        encoded, collected = self.decode_request(request_type, raw_data, options)
+        if collected is not None:
+            self.record_metrics(collected)
+        return encoded
+
+    def decode_request(self, request_type: str, raw_data: bytes, options: Dict[str, Any]) -> Tuple[bytes, Optional[metrics.Collector]]:
+        """respond() for a decode request, also returning its metrics when they are being collected."""
+        with_metrics = bool(options.get('metrics'))
+        with metrics.collecting(self.metrics is not None or with_metrics) as collected:
+            encoded = self._respond(request_type, raw_data, options, with_metrics)
+        return encoded, collected
+
+    def record_metrics(self, collected: metrics.Collector) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.merge(collected, as_run=True)
+        self.unflushed.merge(collected, as_run=True)
+        if time.monotonic() - self.flushed_at >= METRICS_FLUSH_INTERVAL:
+            self.flush_metrics()
+
+    def _respond(self, request_type: str, raw_data: bytes, options: Dict[str, Any], with_metrics: bool) -> bytes:
+        # A response carrying its own timings is never served from or stored in the cache
+        cacheable = self.cache is not None and not with_metrics and get_decoder(request_type) is not None
+        # Verified, projected and plain responses differ, so they are cached separately
+        cache_type = request_type + ('+verify' if options.get('verify') else '') + ('+normalize' if options.get('normalize') else '')
+        if options.get('fields'):
+            cache_type += f"+fields={options['fields']}"
+        if cacheable:
+            cached = self.cache.get(cache_type, raw_data)
+            if cached is not None:
+                return cached
+
+        response = self.handle(request_type, raw_data, options)
+        if with_metrics:
+            response['_metrics'] = metrics.current().to_dict()
+        encoded = dumps(response).encode()
+
+        if cacheable and 'error' not in response:
+            try:
+                self.cache.put(cache_type, raw_data, encoded)
+            except Exception as e:
+                # A full disk or locked database shouldn't fail the request
+                print(f"WARNING: Could not write decode cache: {str(e)}", file=sys.stderr)
+        return encoded
+
+    def flush_metrics(self) -> None:
+        """Add what was collected since the last flush to DECODER_METRICS_TEXTFILE."""
+        self.flushed_at = time.monotonic()
+        if self.unflushed is None or metrics.TEXTFILE is None or not self.unflushed.runs:
+            return
+        try:
+            metrics.write_textfile(metrics.TEXTFILE, 'decoderServer', self.unflushed)
+        except OSError as e:
+            print(f"WARNING: Could not write metrics textfile: {str(e)}", file=sys.stderr)
+            return
+        self.unflushed = metrics.Collector.totals()
+
+    def _with_timeout(self, decoder, raw_data: bytes) -> Dict[str, Any]:
+        # SIGALRM only works on the main thread; elsewhere the caller's timeout applies
+        use_alarm = (
+            self.request_timeout > 0
+            and hasattr(signal, 'SIGALRM')
+            and threading.current_thread() is threading.main_thread()
+        )
+        if not use_alarm:
+            return decoder(raw_data)
+
+        previous = signal.signal(signal.SIGALRM, _timeout_handler)
+        signal.alarm(self.request_timeout)
+        try:
+            return decoder(raw_data)
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
+
+    def serve_stream(self, reader: BinaryIO, writer: BinaryIO) -> None:
+        """Serve requests from one stream until EOF or the request budget is spent."""
+        while not self.exhausted:
+            try:
+                header = read_frame(reader, MAX_HEADER_SIZE)
+                if header is None:
+                    return
+                body = read_frame(reader, MAX_INPUT_SIZE)
+                if body is None:
+                    raise ProtocolError("Missing body frame")
+            except ProtocolError as e:
+                # The stream can't be resynchronised after a bad frame
+                write_frame(writer, dumps({'error': str(e)}).encode())
+                return
+
+            request = parse_header(header)
+            if request is None:
+                response = dumps({'error': "Invalid request header"}).encode()
+            else:
+                response = self.respond(request['type'], body, request)
+
+            self.requests_served += 1
+            write_frame(writer, response)
+
+
+def serve_stdio(service: DecoderService) -> None:
+    reader = sys.stdin.buffer
+    writer = sys.stdout.buffer
+    # Anything printed by the decoders must not corrupt the framed stdout
+    sys.stdout = sys.stderr
+    service.serve_stream(reader, writer)
+
+
+def serve_socket(service: DecoderService, path: str, mode: int) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                service.serve_stream(self.rfile, self.wfile)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        os.chmod(path, mode)
+        print(f"Decoder server listening on {path}", file=sys.stderr)
+        try:
+            while not service.exhausted:
+                server.handle_request()
+        finally:
+            os.unlink(path)
+
+
+def preload() -> None:
+    """Import what the decoders otherwise import on first use."""
+    import pycardano
+    import pycose.headers
+    import pycose.messages
+
+
+def serve_concurrent(args: argparse.Namespace, collect_metrics: bool) -> int:
+    # Imported here: the stdio and one-connection servers don't need asyncio
+    from catalyst_decoder.async_server import DEFAULT_MAX_QUEUE, ConcurrentDecoderServer
+
+    # Decoding, the cache and the replay window live in the workers; this one counts and adds up
+    service = DecoderService(max_requests=args.max_requests, collect_metrics=collect_metrics)
+    worker_options = {
+        'request_timeout': args.timeout,
+        'cache': args.cache,
+        'cache_size': args.cache_size * 1024 * 1024,
+        'replay_window': args.replay_window,
+        'collect_metrics': collect_metrics,
+    }
+    server = ConcurrentDecoderServer(
+        service,
+        worker_options,
+        args.workers,
+        max_in_flight=args.max_in_flight,
+        max_queue=DEFAULT_MAX_QUEUE if args.max_queue is None else args.max_queue,
+    )
+    try:
+        server.run(args.socket, int(args.socket_mode, 8))
+    finally:
+        service.flush_metrics()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Persistent Catalyst document decoder")
+    parser.add_argument('--socket', help="Unix socket path; serves stdin/stdout when omitted")
+    parser.add_argument('--socket-mode', default='660', help="Octal permissions for the socket file")
+    parser.add_argument('--timeout', type=int, default=DEFAULT_REQUEST_TIMEOUT, help="Per-request timeout in seconds, 0 disables")
+    parser.add_argument('--max-requests', type=int, default=0, help="Exit after this many requests so a supervisor can recycle the worker")
+    parser.add_argument('--cache', default=os.environ.get('DECODER_CACHE_PATH'), help="SQLite file for cached decode results (default: $DECODER_CACHE_PATH, none when unset)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Cache size limit in MB before least recently used entries are evicted, 0 for no limit")
+    parser.add_argument('--replay-window', type=float, default=DEFAULT_REPLAY_WINDOW, help="Seconds a decoded wallet signature is answered from memory, 0 disables")
+    parser.add_argument('--workers', type=int, default=0, help="Serve connections concurrently and decode in this many processes (needs --socket; see async_server.py)")
+    parser.add_argument('--max-in-flight', type=int, default=0, help="With --workers: requests decoding at once (default: --workers)")
+    parser.add_argument('--max-queue', type=int, default=None, help="With --workers: requests waiting for a decoder before new ones are answered \"busy\"")
+    parser.add_argument('--metrics', action='store_true', help="Add up per-stage timings and counters for \"stats\" requests (on when DECODER_METRICS or DECODER_METRICS_TEXTFILE is set)")
+    args = parser.parse_args(argv)
+    collect_metrics = args.metrics or metrics.EMBED or metrics.TEXTFILE is not None
+
+    if args.workers > 0:
+        if not args.socket:
+            parser.error("--workers needs --socket")
+        return serve_concurrent(args, collect_metrics)
+
+    preload()
+    cache = DecodeCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    service = DecoderService(
+        request_timeout=args.timeout,
+        max_requests=args.max_requests,
+        cache=cache,
+        signatures=SignatureDecoder(args.replay_window),
+        collect_metrics=collect_metrics,
+    )
+
+    try:
+        if args.socket:
+            serve_socket(service, args.socket, int(args.socket_mode, 8))
+        else:
+            serve_stdio(service)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.flush_metrics()
+        if cache is not None:
+            cache.close()
+
+    return 0
+
@@ -0,0 +1,156 @@
+"""
+Wallet login signature decoding.
+
+decode_signature is what DecodeWalletSignature.py prints. SignatureDecoder
+wraps it for the resident decoder server: the worker keeps pycardano
+imported between logins, and a short replay window answers a signature that
+was decoded a moment ago (a retried or double-submitted login) from memory.
+"""
+import time
+import binascii
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import cbor2
+
+from catalyst_decoder import metrics
+
+DEFAULT_REPLAY_WINDOW = 30  # seconds
+DEFAULT_REPLAY_ENTRIES = 10_000
+
+
+def decode_signature(signature_hex: str) -> dict:
+    # Imported on first use so the server and other importers don't pay for it up front
+    from pycardano import Address
+
+    result = {}
+    try:
+        # Convert hex → bytes
+        sig_bytes = binascii.unhexlify(signature_hex.strip())
+
+        # Decode outer CBOR
+        decoded = cbor2.loads(sig_bytes)
+
+        # Extract inner CBOR for gaddress
+        address_blob = decoded[0]
+        inner = cbor2.loads(address_blob)
+        addr_bytes = inner.get("address")
+
+        with metrics.stage('keys'):
+            # Parse Cardano base address
+            addr = Address.from_primitive(addr_bytes)
+
+            result["bech32_address"] = addr.encode()
+            result["network"] = str(addr.network)
+            result["address_type"] = str(addr.address_type)
+
+            if addr.payment_part is not None:
+                result["payment_key_hash"] = addr.payment_part.to_primitive().hex()
+
+            if addr.staking_part is not None:
+                # Construct a stake address from staking part
+                stake_addr = Address(
+                    payment_part=None,
+                    staking_part=addr.staking_part,
+                    network=addr.network
+                )
+                result["stake_address"] = stake_addr.encode()
+                result["stake_key_hash"] = addr.staking_part.to_primitive().hex()
+
+        # Signature message (UTF-8 string in CBOR)
+        if isinstance(decoded[2], (bytes, bytearray)):
+            try:
+                result["signature_message"] = decoded[2].decode("utf-8")
+            except Exception:
+                result["signature_message"] = decoded[2].hex()
+        else:
+            result["signature_message"] = str(decoded[2])
+
+        # Signature itself (raw bytes at index 3)
+        if isinstance(decoded[3], (bytes, bytearray)):
+            result["signature_hex"] = decoded[3].hex()
+
+    except Exception as e:
+        return {"error": str(e)}
+
+    return result
+
+
+class ReplayCache:
+    """Results by key for ttl seconds, oldest dropped first beyond max_entries."""
+
+    def __init__(self, ttl: float = DEFAULT_REPLAY_WINDOW, max_entries: int = DEFAULT_REPLAY_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            # Re-inserting keeps the entries ordered by expiry
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl, dict(value))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            expires, _ = next(iter(self._entries.values()))
+            if expires > now:
+                return
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+def decode_and_verify(signature_hex: str, key_hex: Optional[str] = None) -> dict:
+    """decode_signature plus "signature_verified" (and "verification_error") against key_hex."""
+    from catalyst_decoder.verify import verify_wallet_signature
+
+    result = decode_signature(signature_hex)
+    if "error" not in result:
+        result.update(verify_wallet_signature(signature_hex, key_hex, result))
+    return result
+
+
+class SignatureDecoder:
+    """decode_signature behind a replay window; a window of 0 disables it."""
+
+    def __init__(self, replay_window: float = DEFAULT_REPLAY_WINDOW, max_entries: int = DEFAULT_REPLAY_ENTRIES):
+        self.replay = ReplayCache(replay_window, max_entries) if replay_window > 0 else None
+
+    def decode(self, signature_hex: str, key_hex: Optional[str] = None) -> Dict[str, Any]:
+        """decode_signature's output; verified against key_hex when one is given."""
+        signature_hex = signature_hex.strip()
+        if not signature_hex:
+            return {"error": "No signature provided"}
+
+        def run() -> Dict[str, Any]:
+            return decode_and_verify(signature_hex, key_hex) if key_hex else decode_signature(signature_hex)
+
+        if self.replay is None:
+            return run()
+
+        replay_key = f"{signature_hex}:{key_hex or ''}"
+        cached = self.replay.get(replay_key)
+        if cached is not None:
+            return cached
+        result = run()
+        self.replay.put(replay_key, result)
+        return result
@@ -0,0 +1,167 @@
+"""
+Cheap format detection from the leading CBOR data item head.
+
+Only the initial byte(s) are inspected, so choosing a decode path costs
+nothing compared to attempting a full parse and falling back.
+"""
+from typing import Optional, Tuple
+
+MAJOR_ARRAY = 4
+MAJOR_MAP = 5
+MAJOR_TAG = 6
+
+COSE_SIGN1_TAG = 18
+COSE_SIGN_TAG = 98
+
+# Every message type pycose's CoseMessage.decode understands
+COSE_TAGS = {
+    16: 'cose_encrypt0',
+    17: 'cose_mac0',
+    18: 'cose_sign1',
+    96: 'cose_encrypt',
+    97: 'cose_mac',
+    98: 'cose_sign',
+}
+
+FORMAT_ARRAY = 'array'
+FORMAT_MAP = 'map'
+FORMAT_TAGGED = 'tagged'
+FORMAT_OTHER = 'other'
+
+
+def read_head(data: bytes, offset: int = 0) -> Optional[Tuple[int, int, int]]:
+    """
+    Read one CBOR data item head at offset.
+
+    Returns (major type, argument, offset after the head), or None when the
+    head is truncated or uses a reserved length. Indefinite lengths return
+    an argument of -1.
+    """
+    if offset >= len(data):
+        return None
+
+    initial = data[offset]
+    major = initial >> 5
+    info = initial & 0x1f
+    offset += 1
+
+    if info < 24:
+        return major, info, offset
+    if info == 31:
+        return major, -1, offset
+    if info > 27:
+        return None
+
+    size = 1 << (info - 24)
+    if offset + size > len(data):
+        return None
+    return major, int.from_bytes(data[offset:offset + size], 'big'), offset + size
+
+
+def sniff_format(data: bytes) -> str:
+    """Classify a document as one of the COSE_TAGS names, or array/map/tagged/other."""
+    head = read_head(data)
+    if head is None:
+        return FORMAT_OTHER
+
+    major, argument, _ = head
+    if major == MAJOR_TAG:
+        return COSE_TAGS.get(argument, FORMAT_TAGGED)
+    if major == MAJOR_ARRAY:
+        return FORMAT_ARRAY
+    if major == MAJOR_MAP:
+        return FORMAT_MAP
+    return FORMAT_OTHER
+
+
+def is_cose(fmt: str) -> bool:
+    return fmt.startswith('cose_')
+
+
+def plausible_item(data: bytes, offset: int = 0, available: Optional[int] = None) -> bool:
+    """
+    False when the item head at offset promises more than the data can hold:
+    a string longer than the bytes after its head, or more container elements
+    than there are bytes left (every element takes at least one). available
+    overrides len(data) - head end, for streams whose length isn't known.
+
+    Text that isn't CBOR often reads as such a head ('{' and '[' are strings
+    with an 8-byte length), and cbor2's C decoder has corrupted the heap while
+    chasing those lengths through a buffer, so check before decoding.
+    """
+    head = read_head(data, offset)
+    if head is None:
+        return False
+    major, argument, end = head
+    if available is None:
+        available = len(data) - end
+    if major in (2, 3):
+        return argument <= available
+    if major in (MAJOR_ARRAY, MAJOR_MAP):
+        return argument * (2 if major == MAJOR_MAP else 1) <= available
+    return True
+
+
+def skip_item(data: bytes, offset: int = 0) -> Optional[int]:
+    """
+    Offset just past the complete data item starting at offset, found from
+    the item heads alone. None when the item is truncated or malformed.
+    """
+    # Items still expected at each nesting level; -1 runs until a break code
+    pending = [1]
+    while pending:
+        if pending[-1] == 0:
+            pending.pop()
+            continue
+
+        head = read_head(data, offset)
+        if head is None:
+            return None
+        major, argument, offset = head
+
+        if major == 7 and argument == -1:
+            if pending[-1] != -1:
+                return None
+            pending.pop()
+            continue
+        if argument == -1 and major in (0, 1, MAJOR_TAG):
+            return None
+        if pending[-1] > 0:
+            pending[-1] -= 1
+
+        if major in (2, 3):
+            if argument == -1:
+                pending.append(-1)
+            else:
+                offset += argument
+                if offset > len(data):
+                    return None
+        elif major in (MAJOR_ARRAY, MAJOR_MAP):
+            if argument == -1:
+                pending.append(-1)
+            else:
+                pending.append(argument * 2 if major == MAJOR_MAP else argument)
+        elif major == MAJOR_TAG:
+            pending.append(1)
+
+    return offset
+
+
+def cose_payload_span(data: bytes) -> Optional[Tuple[int, int]]:
+    """(start, end) of the payload item of a tagged COSE message, None if it can't be located."""
+    head = read_head(data)
+    if head is None or head[0] != MAJOR_TAG or head[1] not in COSE_TAGS:
+        return None
+    head = read_head(data, head[2])
+    if head is None or head[0] != MAJOR_ARRAY or head[1] < 3:
+        return None
+
+    offset = head[2]
+    for _ in range(2):  # protected and unprotected headers
+        offset = skip_item(data, offset)
+        if offset is None:
+            return None
+    end = skip_item(data, offset)
+    if end is None:
+        return None
+    return offset, end
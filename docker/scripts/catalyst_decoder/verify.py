@@ -0,0 +1,204 @@
+"""
+Ed25519 verification of COSE signatures.
+
+Proposal documents are COSE_Sign (tag 98). Each signature's KID is a
+Catalyst ID,
+
+    id.catalyst://[username[:nonce]@]network/<base64url role 0 key>[/role[/rotation]]
+
+and the key in it is the role 0, rotation 0 key. Signatures made with any
+other role or rotation key can only be checked once that key has been
+resolved from the RBAC registration chain, so they are reported as
+unverified with a reason rather than as failed.
+
+Wallet logins are CIP-30 signData COSE_Sign1 messages. The signing key
+isn't part of the signature, so it has to be supplied (the COSE_Key or the
+raw 32 bytes wallets return alongside it). It must hash to the payment or
+stake key hash of the signed address.
+
+Key objects are cached, so documents signed by the same ID share one.
+"""
+import base64
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import cbor2
+from cbor2 import CBORTag
+from nacl.exceptions import BadSignatureError
+from nacl.signing import VerifyKey
+
+from catalyst_decoder.keys import KEY_CACHE_SIZE
+from catalyst_decoder.sniff import COSE_SIGN_TAG, COSE_SIGN1_TAG
+
+ED25519_KEY_SIZE = 32
+ED25519_SIGNATURE_SIZE = 64
+COSE_KEY_X = -2  # OKP public key parameter
+
+
+class VerificationError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _verify_key(public_key: bytes) -> VerifyKey:
+    return VerifyKey(public_key)
+
+
+def verify_ed25519(public_key: bytes, message: bytes, signature: bytes) -> bool:
+    if len(public_key) != ED25519_KEY_SIZE or len(signature) != ED25519_SIGNATURE_SIZE:
+        return False
+    try:
+        _verify_key(public_key).verify(message, signature)
+        return True
+    except (BadSignatureError, ValueError):
+        return False
+
+
+def parse_catalyst_id(kid: str) -> Dict[str, Any]:
+    """Network, role 0 public key, role and rotation from a Catalyst ID."""
+    scheme, separator, rest = kid.partition('://')
+    if not separator or not scheme.endswith('.catalyst'):
+        raise VerificationError(f"Not a Catalyst ID: {kid[:100]}")
+
+    authority, _, path = rest.partition('/')
+    network = authority.rpartition('@')[2]
+    parts = path.split('/') if path else []
+    if not parts or not parts[0]:
+        raise VerificationError("Catalyst ID has no public key")
+
+    encoded = parts[0]
+    try:
+        public_key = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+    except (ValueError, TypeError) as e:
+        raise VerificationError(f"Invalid Catalyst ID key: {str(e)}")
+    if len(public_key) != ED25519_KEY_SIZE:
+        raise VerificationError(f"Catalyst ID key is {len(public_key)} bytes, expected {ED25519_KEY_SIZE}")
+
+    try:
+        role = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+        rotation = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+    except ValueError:
+        raise VerificationError("Invalid role or rotation in Catalyst ID")
+
+    return {'network': network, 'public_key': public_key, 'role': role, 'rotation': rotation}
+
+
+def _unwrap(raw_data: bytes, tag: int) -> list:
+    message = cbor2.loads(raw_data)
+    if isinstance(message, CBORTag):
+        if message.tag != tag:
+            raise VerificationError(f"Expected COSE tag {tag}, got {message.tag}")
+        message = message.value
+    if not isinstance(message, list) or len(message) != 4:
+        raise VerificationError("Not a COSE message")
+    return message
+
+
+def document_signatures(raw_data: bytes) -> List[Dict[str, Any]]:
+    """
+    One entry per COSE_Sign signature: its "kid", and either the (key,
+    message, signature) "triple" to check or the "error" that prevents it.
+    """
+    body_protected, _, payload, signers = _unwrap(raw_data, COSE_SIGN_TAG)
+    if not isinstance(payload, bytes):
+        raise VerificationError("Detached or missing payload")
+    if not isinstance(signers, list):
+        raise VerificationError("Invalid COSE_Sign signatures")
+
+    entries = []
+    for signer in signers:
+        entry: Dict[str, Any] = {'kid': None}
+        entries.append(entry)
+        try:
+            sign_protected, unprotected, signature = signer
+            headers = cbor2.loads(sign_protected) if sign_protected else {}
+            kid = headers.get(4) or (unprotected or {}).get(4)
+            if isinstance(kid, bytes):
+                kid = kid.decode()
+            if not kid:
+                raise VerificationError("Signature has no KID")
+            entry['kid'] = kid
+
+            catalyst_id = parse_catalyst_id(kid)
+            if catalyst_id['role'] or catalyst_id['rotation']:
+                raise VerificationError("Signing key is not the role 0 key; it has to be resolved from the RBAC chain")
+
+            to_be_signed = cbor2.dumps(['Signature', body_protected, sign_protected, b'', payload])
+            entry['triple'] = (catalyst_id['public_key'], to_be_signed, signature)
+        except VerificationError as e:
+            entry['error'] = str(e)
+        except Exception as e:
+            entry['error'] = f"Invalid signature structure: {str(e)}"
+    return entries
+
+
+def summarize(entries: List[Dict[str, Any]], results: Iterable[bool]) -> Dict[str, Any]:
+    results = iter(results)
+    signatures = []
+    for entry in entries:
+        item = {'kid': entry['kid']}
+        if 'triple' in entry:
+            item['verified'] = next(results)
+        else:
+            item['verified'] = None
+            item['error'] = entry['error']
+        signatures.append(item)
+
+    return {
+        'verified': bool(signatures) and all(item['verified'] for item in signatures),
+        'signatures': signatures,
+    }
+
+
+def verify_document(raw_data: bytes) -> Dict[str, Any]:
+    """{"verified": all signatures valid, "signatures": [{"kid", "verified", "error"?}, ...]}"""
+    try:
+        entries = document_signatures(raw_data)
+    except Exception as e:
+        return {'verified': False, 'signatures': [], 'error': str(e)}
+
+    return summarize(entries, (verify_ed25519(*entry['triple']) for entry in entries if 'triple' in entry))
+
+
+def public_key_from_cose_key(key_hex: str) -> bytes:
+    """The Ed25519 key from a hex COSE_Key, or from 32 raw key bytes."""
+    try:
+        key_bytes = bytes.fromhex(key_hex.strip())
+    except ValueError as e:
+        raise VerificationError(f"Invalid key hex: {str(e)}")
+    if len(key_bytes) == ED25519_KEY_SIZE:
+        return key_bytes
+
+    try:
+        cose_key = cbor2.loads(key_bytes)
+    except Exception as e:
+        raise VerificationError(f"Invalid COSE key: {str(e)}")
+    public_key = cose_key.get(COSE_KEY_X) if isinstance(cose_key, dict) else None
+    if not isinstance(public_key, bytes) or len(public_key) != ED25519_KEY_SIZE:
+        raise VerificationError("COSE key has no Ed25519 public key")
+    return public_key
+
+
+def verify_wallet_signature(signature_hex: str, key_hex: Optional[str], decoded: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Check a CIP-30 signData signature. decoded is decode_signature's output
+    for the same signature, used for the signed address's key hashes.
+    """
+    if not key_hex:
+        return {'signature_verified': None, 'verification_error': "No public key provided"}
+
+    try:
+        public_key = public_key_from_cose_key(key_hex)
+        key_hash = hashlib.blake2b(public_key, digest_size=28).hexdigest()
+        if key_hash not in (decoded.get('payment_key_hash'), decoded.get('stake_key_hash')):
+            raise VerificationError("Public key does not belong to the signing address")
+
+        protected, _, payload, signature = _unwrap(bytes.fromhex(signature_hex.strip()), COSE_SIGN1_TAG)
+        to_be_signed = cbor2.dumps(['Signature1', protected, b'', payload])
+    except VerificationError as e:
+        return {'signature_verified': False, 'verification_error': str(e)}
+    except Exception as e:
+        return {'signature_verified': False, 'verification_error': f"Invalid signature structure: {str(e)}"}
+
+    return {'signature_verified': verify_ed25519(public_key, to_be_signed, signature)}
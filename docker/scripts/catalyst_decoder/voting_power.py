@@ -0,0 +1,194 @@
+"""
+Voting power snapshots from CIP-15 / CIP-36 registrations.
+
+Registrations are loaded once into columns (one row per delegation: interned
+voting key id, registration id, weight; one row per registration: stake key
+id, nonce, purpose), and everything after that runs as NumPy array
+operations: picking each stake key's latest registration, splitting its
+stake across delegations by weight, and summing per voting key. A snapshot
+over a million registrations is bound by loading the rows, not by the
+arithmetic.
+
+CIP-36 splitting: each delegation gets floor(stake * weight / total_weight)
+and whatever rounding leaves over goes to the last delegation of the
+registration, so the registration's whole stake is always assigned.
+"""
+from array import array
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+from catalyst_decoder.records import Registration
+
+CATALYST_PURPOSE = 0
+
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+def _column(values: array) -> np.ndarray:
+    # A copy, so the array module buffer can keep growing afterwards
+    return np.frombuffer(values, dtype=np.int64).copy()
+
+
+def _delegations(registration: Any):
+    """(voting_key, weight) pairs of a compact Registration or a normalize_metadata dict."""
+    if isinstance(registration, Registration):
+        return registration.voter_delegations or ()
+    return ((d.get('voting_key'), d.get('weight', 1)) for d in registration.get('voter_delegations') or ())
+
+
+def _field(registration: Any, name: str):
+    if isinstance(registration, Registration):
+        return getattr(registration, name)
+    return registration.get(name)
+
+
+class DelegationTable:
+    """Columnar delegations; build with add()/extend(), then call voting_power()."""
+
+    def __init__(self):
+        self.voting_keys: List[str] = []
+        self.stake_keys: List[str] = []
+        self.stake_hexes: List[Optional[str]] = []
+        self._voting_ids: Dict[str, int] = {}
+        self._stake_ids: Dict[str, int] = {}
+        # One entry per registration
+        self._reg_stake = array('q')
+        self._reg_nonce = array('q')
+        self._reg_purpose = array('q')
+        # One entry per delegation
+        self._row_registration = array('q')
+        self._row_voting_key = array('q')
+        self._row_weight = array('q')
+
+    def __len__(self) -> int:
+        return len(self._reg_stake)
+
+    def add(self, registration: Any) -> bool:
+        """Add one registration; False (and nothing added) when it has no stake key or delegations."""
+        stake_key = _field(registration, 'stake_key')
+        if not stake_key:
+            return False
+        rows = []
+        for voting_key, weight in _delegations(registration):
+            if not voting_key or not isinstance(weight, int) or weight < 0:
+                continue
+            voting_id = self._voting_ids.get(voting_key)
+            if voting_id is None:
+                voting_id = self._voting_ids[voting_key] = len(self.voting_keys)
+                self.voting_keys.append(voting_key)
+            rows.append((voting_id, min(weight, _INT64_MAX)))
+        if not rows:
+            return False
+
+        stake_id = self._stake_ids.get(stake_key)
+        if stake_id is None:
+            stake_id = self._stake_ids[stake_key] = len(self.stake_keys)
+            self.stake_keys.append(stake_key)
+            self.stake_hexes.append(_field(registration, 'stake_hex'))
+
+        nonce = _field(registration, 'nonce')
+        purpose = _field(registration, 'voting_purpose')
+        registration_id = len(self._reg_stake)
+        self._reg_stake.append(stake_id)
+        self._reg_nonce.append(nonce if isinstance(nonce, int) and 0 <= nonce <= _INT64_MAX else -1)
+        # CIP-15 registrations have no purpose and count as Catalyst
+        self._reg_purpose.append(purpose if isinstance(purpose, int) and 0 <= purpose <= _INT64_MAX else CATALYST_PURPOSE)
+        for voting_id, weight in rows:
+            self._row_registration.append(registration_id)
+            self._row_voting_key.append(voting_id)
+            self._row_weight.append(weight)
+        return True
+
+    def extend(self, registrations: Iterable[Any]) -> 'DelegationTable':
+        for registration in registrations:
+            self.add(registration)
+        return self
+
+    def stake_amounts(self, amounts: Mapping[str, int]) -> np.ndarray:
+        """Stake per stake key id, looked up by bech32 stake address or stake address hex."""
+        result = np.zeros(len(self.stake_keys), dtype=np.int64)
+        for stake_id, (stake_key, stake_hex) in enumerate(zip(self.stake_keys, self.stake_hexes)):
+            amount = amounts.get(stake_key)
+            if amount is None and stake_hex:
+                amount = amounts.get(stake_hex)
+            if amount:
+                result[stake_id] = amount
+        return result
+
+    def latest_registrations(self, purpose: Optional[int] = CATALYST_PURPOSE) -> np.ndarray:
+        """Mask of the registrations that count: per stake key, the highest nonce (then the last added) for purpose."""
+        stake = _column(self._reg_stake)
+        nonce = _column(self._reg_nonce)
+        eligible = np.ones(len(stake), dtype=bool)
+        if purpose is not None:
+            eligible = _column(self._reg_purpose) == purpose
+        candidates = np.flatnonzero(eligible)
+        mask = np.zeros(len(stake), dtype=bool)
+        if len(candidates) == 0:
+            return mask
+
+        # Sorted by stake key, then nonce, then insertion order: the last of each stake key wins
+        order = candidates[np.lexsort((candidates, nonce[candidates], stake[candidates]))]
+        sorted_stake = stake[order]
+        last = np.r_[sorted_stake[1:] != sorted_stake[:-1], True]
+        mask[order[last]] = True
+        return mask
+
+    def voting_power(self, amounts: Mapping[str, int], purpose: Optional[int] = CATALYST_PURPOSE) -> List[Dict[str, Any]]:
+        """Per voting key: delegated voting power and number of delegations, largest first."""
+        stake_by_id = self.stake_amounts(amounts)
+        counted = self.latest_registrations(purpose)
+
+        row_registration = _column(self._row_registration)
+        keep = counted[row_registration] if len(row_registration) else np.zeros(0, dtype=bool)
+        registration = row_registration[keep]
+        voting_key = _column(self._row_voting_key)[keep]
+        weight = _column(self._row_weight)[keep]
+        if len(registration) == 0:
+            return []
+
+        registration_stake = stake_by_id[_column(self._reg_stake)]
+        power = split_stake(registration, weight, registration_stake)
+
+        order = np.argsort(voting_key, kind='stable')
+        sorted_keys = voting_key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        totals = np.add.reduceat(power[order], starts)
+        counts = np.diff(np.r_[starts, len(sorted_keys)])
+
+        result = [
+            {'voting_key': self.voting_keys[key_id], 'voting_power': int(total), 'delegations': int(count)}
+            for key_id, total, count in zip(sorted_keys[starts].tolist(), totals.tolist(), counts.tolist())
+        ]
+        result.sort(key=lambda item: (-item['voting_power'], item['voting_key']))
+        return result
+
+
+def split_stake(registration: np.ndarray, weight: np.ndarray, registration_stake: np.ndarray) -> np.ndarray:
+    """
+    Voting power of every delegation row. Rows of one registration must be
+    contiguous (they are, as DelegationTable adds them); registration_stake
+    is indexed by registration id.
+    """
+    starts = np.flatnonzero(np.r_[True, registration[1:] != registration[:-1]])
+    sizes = np.diff(np.r_[starts, len(registration)])
+    total_weight = np.add.reduceat(weight, starts)
+    stake = registration_stake[registration[starts]]
+
+    row_total = np.repeat(total_weight, sizes)
+    row_stake = np.repeat(stake, sizes)
+    divisor = np.where(row_total == 0, 1, row_total)
+
+    # stake * weight // total without overflowing int64: q*w + r*w // total, r < total
+    quotient, remainder = np.divmod(row_stake, divisor)
+    overflow = row_total > _INT64_MAX // np.maximum(weight, 1)
+    power = quotient * weight + (remainder * np.where(overflow, 0, weight)) // divisor
+    for row in np.flatnonzero(overflow).tolist():
+        power[row] = int(row_stake[row]) * int(weight[row]) // int(row_total[row])
+    power[row_total == 0] = 0
+
+    # Rounding leftovers go to the last delegation of each registration
+    leftover = np.where(total_weight == 0, 0, stake - np.add.reduceat(power, starts))
+    power[starts + sizes - 1] += leftover
+    return power
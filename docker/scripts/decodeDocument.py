@@ -0,0 +1,27 @@
+import sys
+from catalyst_decoder import metrics
+from catalyst_decoder.cli import parse_args, run_document_batch
+from catalyst_decoder.encoding import print_json
+from catalyst_decoder.proposals import DecodeError, decode_with_options, read_input
+
+args = parse_args("Decode a Catalyst document with the decoder its CBOR head calls for")
+
+if args.batch:
+    sys.exit(run_document_batch('auto', args))
+
+# === Step 1: Read input with validation
+try:
+    raw_data = read_input(args.file)
+except DecodeError as e:
+    print_json({"error": str(e)})
+    sys.exit(1)
+
+# === Step 2: Sniff the leading CBOR head and run the matching decoder once
+try:
+    output = decode_with_options('auto', raw_data, args.verify, args.fields, args.normalize)
+except DecodeError as e:
+    print_json({"error": str(e)})
+    sys.exit(1)
+
+# === Step 3: Output result
+print_json(metrics.attach(output))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Maintain and query the on-disk registration index.
+
+    indexRegistrations.py --index registrations.db ingest < transactions.jsonl
+    indexRegistrations.py --index registrations.db stake stake1u...
+    indexRegistrations.py --index registrations.db delegators <voting key hex>
+    indexRegistrations.py --index registrations.db purpose ca7a1457-ef9f-4c7f-9c74-7f8c4a4cfa6c
+    indexRegistrations.py --index registrations.db roles stake1u...
+    indexRegistrations.py --index registrations.db snapshot --stake stake.jsonl
+    indexRegistrations.py --index registrations.db checkpoint
+
+ingest reads one transaction per line ({"tx_hash", "slot", "json_metadata"})
+in slot order and picks up from the index's checkpoint, so an interrupted
+sync is resumed by feeding the same stream again.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+from catalyst_decoder.encoding import print_json
+from catalyst_decoder.rbac import ChainIndex
+from catalyst_decoder.registrations import DEFAULT_COMMIT_EVERY, RegistrationIndex, index_transactions
+from metadata_decoder import TransactionsService
+
+logger = logging.getLogger(__name__)
+
+
+def read_transactions(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.error(f"Skipping line {number}: {e}")
+
+
+def read_stake_amounts(path: str) -> dict:
+    """{"stake_key": ..., "amount": ...} per line (stake_address is accepted too), or one JSON object of stake -> amount."""
+    with open(path) as f:
+        text = f.read()
+    try:
+        amounts = json.loads(text)
+        if isinstance(amounts, dict) and 'amount' not in amounts:
+            return {stake: int(amount) for stake, amount in amounts.items()}
+    except json.JSONDecodeError:
+        pass
+    amounts = {}
+    for line in text.splitlines():
+        if line.strip():
+            record = json.loads(line)
+            amounts[record.get('stake_key') or record['stake_address']] = int(record['amount'])
+    return amounts
+
+
+def snapshot(index: RegistrationIndex, args) -> int:
+    # numpy is only needed here; the other commands don't pay for importing it
+    from catalyst_decoder.voting_power import DelegationTable
+
+    table = DelegationTable().extend(index.voter_registrations())
+    purpose = None if args.purpose < 0 else args.purpose
+    print_json(table.voting_power(read_stake_amounts(args.stake), purpose))
+    return 0
+
+
+def ingest(index: RegistrationIndex, args) -> int:
+    # The index keeps neither the certificates nor the raw x509 payload
+    service = TransactionsService(include_raw_data=False)
+    checkpoint = index.checkpoint()
+    if checkpoint:
+        logger.info(f"Resuming after slot {checkpoint['slot']} ({checkpoint['transactions']} registrations indexed)")
+
+    def on_error(tx_id, error):
+        logger.error(f"Skipping transaction {tx_id}: {error}")
+
+    stats = index_transactions(
+        index,
+        service.normalize_metadata,
+        read_transactions(sys.stdin),
+        commit_every=args.commit_every,
+        on_error=on_error,
+    )
+    logger.info(
+        f"Read {stats.transactions} transactions: {stats.indexed} indexed, "
+        f"{stats.skipped} skipped, {stats.errors} errors"
+    )
+    print_json(index.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Index CIP-15 / CIP-36 / x509 registrations by stake key, voting key and purpose")
+    parser.add_argument('--index', default=os.environ.get('REGISTRATION_INDEX_PATH'), required='REGISTRATION_INDEX_PATH' not in os.environ, help="SQLite index file (default: $REGISTRATION_INDEX_PATH)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help="Index transactions read from stdin as JSONL")
+    ingest_parser.add_argument('--commit-every', type=int, default=DEFAULT_COMMIT_EVERY, help="Transactions per checkpoint commit")
+
+    commands.add_parser('stake', help="Latest registration of a stake address").add_argument('stake_key')
+    commands.add_parser('delegators', help="Stake keys delegating to a voting key").add_argument('voting_key')
+    purpose_parser = commands.add_parser('purpose', help="x509 registrations under a purpose UUID")
+    purpose_parser.add_argument('purpose_uuid')
+    purpose_parser.add_argument('--limit', type=int, default=None)
+    commands.add_parser('roles', help="Effective RBAC roles of the registration chain holding a stake address").add_argument('stake_key')
+    snapshot_parser = commands.add_parser('snapshot', help="Voting power per voting key from the latest registrations")
+    snapshot_parser.add_argument('--stake', required=True, help="Stake amounts: JSONL of {stake_key, amount} or a JSON object")
+    snapshot_parser.add_argument('--purpose', type=int, default=0, help="Voting purpose to count (-1 for all; default 0, Catalyst)")
+    commands.add_parser('checkpoint', help="Last indexed slot and index size")
+
+    args = parser.parse_args()
+    index = RegistrationIndex(args.index)
+    try:
+        if args.command == 'ingest':
+            sys.exit(ingest(index, args))
+        elif args.command == 'stake':
+            print_json(index.latest_registration(args.stake_key))
+        elif args.command == 'delegators':
+            print_json(index.delegators(args.voting_key))
+        elif args.command == 'purpose':
+            print_json(index.purpose_registrations(args.purpose_uuid, args.limit))
+        elif args.command == 'snapshot':
+            sys.exit(snapshot(index, args))
+        elif args.command == 'roles':
+            # One query loads every envelope; the chain is then walked in memory
+            print_json(ChainIndex().extend(index.envelopes()).roles_for_stake(args.stake_key))
+        else:
+            print_json(index.stats())
+    finally:
+        index.close()
@@ -1,35 +1,47 @@
 import os
 import sys
 import json
+import argparse
 import uuid
 import logging
-import re
-from typing import Dict, Any, List, Union, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Union, Optional, BinaryIO
 import cbor2
-import brotli
-import zstandard as zstd
-from pycardano import (
-    Address,
-    Network,
-    VerificationKey,
-    PaymentVerificationKey,
-    StakeVerificationKey,
-)
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+
+from catalyst_decoder import certificates, keys, metrics, records
+from catalyst_decoder.batch_options import add_batch_arguments
+from catalyst_decoder.decompress import BROTLI, ZSTD, decompress, open_decompressed
+from catalyst_decoder.encoding import Serializer
+
+if TYPE_CHECKING:
+    from pycardano import Network
+
+# pycardano is imported where an address is built (here and in catalyst_decoder.keys):
+# it costs over a second per process, and x509 envelopes never need it
 logger = logging.getLogger(__name__)
 
 class TransactionsService:
-    def __init__(self):
-        pass
+    def __init__(self, include_raw_data: bool = True, max_decompressed_size: Optional[int] = None):
+        # x509 payloads are handled as bytes throughout; hex is only produced for the
+        # 'data' field of the output, and only when include_raw_data is set
+        self.include_raw_data = include_raw_data
+        # None uses DECODER_MAX_DECOMPRESSED_SIZE from the environment, 0 disables the cap
+        self.max_decompressed_size = max_decompressed_size
 
     def decode_transaction(self, raw_tx: Dict[str, Any]) -> Dict[str, Any]:
         if not raw_tx:
             raise ValueError("Invalid transaction")
         return self.normalize_metadata(raw_tx.get('json_metadata'))
 
-    def get_network(self) -> Network:
+    def compact_registration(self, metadata: Dict[str, Any], keep_raw: bool = False) -> Optional[records.Registration]:
+        """normalize_metadata as a slotted Registration, for holding many in memory; to_dict() gives the usual output."""
+        normalized = self.normalize_metadata(metadata)
+        if not normalized:
+            return None
+        return records.Registration.from_normalized(normalized, keep_raw=keep_raw and self.include_raw_data)
+
+    def get_network(self) -> 'Network':
+        from pycardano import Network
+
         return Network.TESTNET if os.environ.get('NETWORK') == '0' else Network.MAINNET
 
     def normalize_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
@@ -149,8 +161,11 @@ class TransactionsService:
                 if tx_type != 'x509_envelope':
                     reward_addr_bytes = bytes.fromhex(self.cbor_array_to_str(value))
                     try:
-                        reward_address = Address.from_primitive(reward_addr_bytes)
-                        acc['payment_address'] = str(reward_address)
+                        from pycardano import Address
+
+                        with metrics.stage('keys'):
+                            reward_address = Address.from_primitive(reward_addr_bytes)
+                            acc['payment_address'] = str(reward_address)
                     except Exception as e:
                         logger.error(f"Failed to parse payment address: {e}")
                         acc['payment_address'] = None
@@ -220,29 +235,20 @@ class TransactionsService:
         return acc
 
     def get_purpose_info(self, purpose_uuid: str) -> Dict[str, Any]:
-        known_purposes = {
-            'ca7a1457-ef9f-4c7f-9c74-7f8c4a4cfa6c': 'Project Catalyst User Role Registrations',
-            'ca7ad312-a19b-4412-ad53-2a36fb14e2e5': 'Project Catalyst Admin Role Registrations',
-        }
-
-        uuid_str = self.hex_to_uuid(purpose_uuid)
-
-        return {
-            'uuid': uuid_str,
-            'description': known_purposes.get(uuid_str, 'Unknown purpose'),
-            'is_catalyst': uuid_str.startswith('ca7a'),
-            'is_known': uuid_str in known_purposes,
-        }
+        return records.purpose_info(purpose_uuid)
 
     def hex_to_uuid(self, hex_str: str) -> str:
-        if len(hex_str) == 32:
-            return f"{hex_str[0:8]}-{hex_str[8:12]}-{hex_str[12:16]}-{hex_str[16:20]}-{hex_str[20:32]}"
-        return hex_str
+        return records.hex_to_uuid(hex_str)
 
     def parse_x509_chunked_data(self, chunks: List[Any], compression_type: str) -> Dict[str, Any]:
         try:
             reconstructed_data = self.reconstruct_chunked_data(chunks)
-            decompressed_data = None
+            decompressed_data = b''
+
+            if not self.include_raw_data and compression_type in (BROTLI, ZSTD):
+                # Nobody wants the decompressed bytes, so stream them straight into the CBOR decoder
+                stream = open_decompressed(reconstructed_data, compression_type, self.max_decompressed_size)
+                return {'parsed_rbac': self.decode_rbac_structure(stream)}
 
             if compression_type == 'raw':
                 decompressed_data = reconstructed_data
@@ -255,10 +261,11 @@ class TransactionsService:
             
             parsed_rbac = self.decode_rbac_structure(decompressed_data)
 
-            return {
-                'data': decompressed_data,
-                'parsed_rbac': parsed_rbac
-            }
+            result = {}
+            if self.include_raw_data:
+                result['data'] = decompressed_data.hex()
+            result['parsed_rbac'] = parsed_rbac
+            return result
         except Exception as e:
             logger.error(f"Failed to parse x509 chunked data: {e}")
             return {
@@ -266,32 +273,29 @@ class TransactionsService:
                 'compression': compression_type
             }
 
-    def reconstruct_chunked_data(self, chunks: List[Any]) -> str:
-        return "".join([self.cbor_array_to_str(chunk) for chunk in chunks])
+    def reconstruct_chunked_data(self, chunks: List[Any]) -> bytes:
+        return b"".join([self.cbor_array_to_bytes(chunk) for chunk in chunks])
 
-    def decompress_brotli(self, compressed_hex: str) -> str:
+    def decompress_brotli(self, compressed: bytes) -> bytes:
         try:
-            compressed_bytes = bytes.fromhex(compressed_hex)
-            decompressed_bytes = brotli.decompress(compressed_bytes)
-            return decompressed_bytes.hex()
+            return decompress(compressed, BROTLI, self.max_decompressed_size)
         except Exception as e:
             logger.error(f"Brotli decompression failed: {e}")
-            return compressed_hex
+            return compressed
 
-    def decompress_zstd(self, compressed_hex: str) -> str:
+    def decompress_zstd(self, compressed: bytes) -> bytes:
         try:
-            compressed_bytes = bytes.fromhex(compressed_hex)
-            dctx = zstd.ZstdDecompressor()
-            decompressed_bytes = dctx.decompress(compressed_bytes)
-            return decompressed_bytes.hex()
+            return decompress(compressed, ZSTD, self.max_decompressed_size)
         except Exception as e:
             logger.error(f"Zstd decompression failed: {e}")
-            return compressed_hex
+            return compressed
 
-    def decode_rbac_structure(self, rbac_data_hex: str) -> Dict[str, Any]:
+    def decode_rbac_structure(self, rbac_data: Union[bytes, BinaryIO]) -> Dict[str, Any]:
         try:
-            rbac_bytes = bytes.fromhex(rbac_data_hex)
-            decoded_rbac = cbor2.loads(rbac_bytes)
+            if isinstance(rbac_data, bytes):
+                decoded_rbac = cbor2.loads(rbac_data)
+            else:
+                decoded_rbac = cbor2.load(rbac_data)
 
             result = {
                 'structure_type': 'cbor_map',
@@ -304,12 +308,19 @@ class TransactionsService:
             }
 
             for key, value in decoded_rbac.items():
-                if key == 10:
+                if key in (10, 20):
                     if isinstance(value, list) and len(value) > 0:
-                        cert_data = self.parse_x509_certificate(value[0])
-                        result['extracted_data']['certificate'] = cert_data
-                        if cert_data.get('stake_address'):
-                            result['stake_key'] = cert_data['stake_address']
+                        if key == 10:
+                            certs = [self.parse_x509_certificate(cert) for cert in value]
+                            result['extracted_data']['certificate'] = certs[0]
+                            result['extracted_data']['certificates'] = certs
+                        else:
+                            certs = [self.parse_c509_certificate(cert) for cert in value]
+                            result['extracted_data']['c509_certificates'] = certs
+                        for cert_data in certs:
+                            # The first stake address found wins; X.509 (key 10) is read before C509 (key 20)
+                            if cert_data.get('stake_address') and not result['stake_key']:
+                                result['stake_key'] = cert_data['stake_address']
                 
                 elif key == 30:
                     result['extracted_data']['key_30'] = value
@@ -326,30 +337,13 @@ class TransactionsService:
 
     def parse_x509_certificate(self, cert_bytes: bytes) -> Dict[str, Any]:
         try:
-            cert_hex = cert_bytes.hex()
-            has_valid_start = cert_hex.startswith('30820')
-            
-            cert_str = ""
-            try:
-                cert_str = cert_bytes.decode('utf-8', errors='ignore')
-            except:
-                pass
-            
-            cardano_match = re.search(r'web\+cardano://addr/(stake[a-z0-9]+)', cert_str)
-            
-            stake_address = None
-            if cardano_match:
-                raw_stake = cardano_match.group(1)
-                # Mimic TS: slice(0, length - 1)
-                if raw_stake:
-                    stake_address = raw_stake[:-1]
+            return certificates.certificate_info(cert_bytes)
+        except Exception as e:
+            return {'error': str(e)}
 
-            return {
-                'length': len(cert_bytes),
-                'has_asn1_structure': has_valid_start,
-                'cardano_uri_found': bool(cardano_match),
-                'stake_address': stake_address,
-            }
+    def parse_c509_certificate(self, cert: Any) -> Dict[str, Any]:
+        try:
+            return certificates.certificate_info(cert, c509=True)
         except Exception as e:
             return {'error': str(e)}
 
@@ -387,27 +381,22 @@ class TransactionsService:
         try:
             cbor_str = self.cbor_array_to_str(cbor_hex)
             key_bytes = bytes.fromhex(cbor_str)
-            # Try to assume it's a VerificationKey (Ed25519)
-            vk = PaymentVerificationKey.from_primitive(key_bytes)
-            return str(vk)
+            # Try to assume it's a VerificationKey (Ed25519); memoised per key
+            return keys.public_key_bech32(key_bytes)
         except Exception as e:
             logger.error(f"{e} on : {cbor_hex}")
             raise ValueError("Invalid public key")
 
-    def get_stake_key_info(self, key_pub: str, network: Network) -> Dict[str, str]:
+    def get_stake_key_info(self, key_pub: str, network: 'Network') -> Dict[str, str]:
         # key_pub is hex string of the public key
         try:
             key_bytes = bytes.fromhex(self.cbor_array_to_str(key_pub))
-            # Create a StakeVerificationKey
-            stake_vk = StakeVerificationKey.from_primitive(key_bytes)
-            
-            
-            stake_credential = stake_vk.hash()
-            address = Address(staking_part=stake_credential, network=network)
+            # Stake key hash + stake address, memoised per (key, network)
+            stake_hex, stake_key = keys.stake_address(key_bytes, network)
             
             return {
-                'stake_hex': address.to_primitive().hex(), # or address.bytes.hex()
-                'stake_key': str(address), # bech32
+                'stake_hex': stake_hex,
+                'stake_key': stake_key, # bech32
             }
         except Exception as e:
             logger.error(f"Error getting stake key: {e}")
@@ -415,14 +404,18 @@ class TransactionsService:
 
     def get_stake_address_variants_from_stake_bech(self, stake_bech: str) -> Dict[str, str]:
         try:
-            address = Address.from_primitive(stake_bech)
             return {
-                'stake_hex': address.to_primitive().hex(),
+                'stake_hex': keys.stake_address_hex(stake_bech),
                 'stake_key': stake_bech,
             }
         except:
              return {'stake_hex': '', 'stake_key': stake_bech}
 
+    def cbor_array_to_bytes(self, value: Union[str, bytes]) -> bytes:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return bytes.fromhex(self.cbor_array_to_str(value))
+
     def cbor_array_to_str(self, byte_str: Union[str, bytes]) -> str:
         if isinstance(byte_str, bytes):
             return byte_str.hex()
@@ -446,22 +439,70 @@ def json_serial(obj):
     
     return str(obj)
 
-if __name__ == "__main__":
+
+result_serializer = Serializer(json_serial)
+
+
+def decode_single(args):
     try:
         # Read from stdin
-        input_data = sys.stdin.read()
+        with metrics.stage('read'):
+            input_data = sys.stdin.read()
         if not input_data:
             print(json.dumps({"error": "No input provided"}))
             sys.exit(1)
+        metrics.count('bytes_in', len(input_data))
+
+        with metrics.stage('read'):
+            raw_tx = json.loads(input_data)
         
-        raw_tx = json.loads(input_data)
-        
-        service = TransactionsService()
+        service = TransactionsService(include_raw_data=args.raw_data)
         result = service.decode_transaction(raw_tx)
         
         # use custom serializer
-        print(json.dumps(result, default=json_serial))
+        print(dumps_result(metrics.attach(result)))
     except Exception as e:
         # also use custom serializer for error just in case exc contains weird stuff
-        print(json.dumps({"error": str(e)}, default=json_serial))
+        print(dumps_result({"error": str(e)}))
         sys.exit(1)
+
+
+def dumps_result(obj) -> str:
+    return result_serializer.dumps(obj)
+
+
+def decode_batch(args):
+    """One transaction per stdin line, one {"index", "id", "result", "error"} line per transaction on stdout."""
+    from catalyst_decoder.batch import run_batch
+
+    service = TransactionsService(include_raw_data=args.raw_data)
+    stats = run_batch(
+        service.decode_transaction,
+        sys.stdin,
+        sys.stdout,
+        dumps=dumps_result,
+        buffer_size=args.buffer_size,
+        workers=args.workers,
+        chunksize=args.chunksize,
+    )
+    logger.info(f"Decoded {stats.records} transactions, {stats.errors} errors")
+    if args.workers <= 1:
+        # Pool workers keep their own caches, so only the in-process numbers are meaningful
+        logger.info(f"Key derivation cache: {keys.cache_stats()}")
+
+
+if __name__ == "__main__":
+    # Only when run as a script: importing this module (indexRegistrations, benchmarks) leaves logging alone
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Decode CIP-15 / CIP-36 / x509 registration metadata")
+    parser.add_argument('--no-raw-data', dest='raw_data', action='store_false', help="Leave the decompressed x509 payload hex out of x509_data")
+    parser.add_argument('--metrics', action='store_true', help="Add per-stage timings and counters as \"_metrics\" (see catalyst_decoder/metrics.py)")
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('metadata_decoder', embed=args.metrics)
+
+    if args.batch:
+        decode_batch(args)
+    else:
+        decode_single(args)
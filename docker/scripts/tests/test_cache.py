@@ -0,0 +1,82 @@
+import itertools
+
+import pytest
+
+from catalyst_decoder import cache
+from catalyst_decoder.cache import DecodeCache
+
+
+class Clock:
+    """time.time() for the cache, one tick per call, so last_used never ties."""
+
+    def __init__(self):
+        self._ticks = itertools.count(1)
+
+    def time(self):
+        return float(next(self._ticks))
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    monkeypatch.setattr(cache, 'time', Clock())
+
+
+def stored_keys(path):
+    reader = DecodeCache(path, max_bytes=0)
+    try:
+        return {key for (key,) in reader._conn.execute('SELECT key FROM decode_cache')}
+    finally:
+        reader.close()
+
+
+def test_replacing_an_entry_does_not_grow_the_size(tmp_path):
+    decode_cache = DecodeCache(str(tmp_path / 'cache.db'), max_bytes=1000)
+    for _ in range(20):
+        decode_cache.put('auto', b'document', b'v' * 100)
+    decode_cache.put('auto', b'document', b'v' * 40)
+
+    assert decode_cache.stats()['entries'] == 1
+    assert decode_cache.stats()['bytes'] == 40
+
+
+def test_workers_sharing_the_file_stay_under_the_limit(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    workers = [DecodeCache(path, max_bytes=1000) for _ in range(4)]
+
+    for index in range(40):
+        workers[index % len(workers)].put('auto', b'document %d' % index, b'v' * 100)
+        stored = workers[0]._conn.execute('SELECT COALESCE(SUM(size), 0) FROM decode_cache').fetchone()[0]
+        assert stored <= 1000
+        assert all(worker.stats()['bytes'] == stored for worker in workers)
+
+
+def test_the_least_recently_used_entries_are_evicted(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first, second = DecodeCache(path, max_bytes=1000), DecodeCache(path, max_bytes=1000)
+    for index in range(10):
+        (first if index % 2 else second).put('auto', b'document %d' % index, b'v' * 100)
+
+    # Used again, so documents 1 and 2 are now more recent than 3 and 4
+    assert first.get('auto', b'document 1') is not None
+    assert second.get('auto', b'document 2') is not None
+
+    # Over the limit: evicts down to 900 bytes, the two least recently used entries
+    first.put('auto', b'document 10', b'v' * 100)
+
+    keys = stored_keys(path)
+    evicted = {cache.cache_key('auto', b'document %d' % index) for index in (0, 3)}
+    kept = {cache.cache_key('auto', b'document %d' % index) for index in (1, 2, 4, 5, 6, 7, 8, 9, 10)}
+    assert keys.isdisjoint(evicted)
+    assert kept <= keys
+    assert first.stats()['bytes'] == 900
+
+
+def test_an_existing_file_is_counted_when_opened(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    writer = DecodeCache(path, max_bytes=1000)
+    writer.put('auto', b'one', b'v' * 100)
+    writer.put('auto', b'two', b'v' * 50)
+    writer._conn.execute('DROP TABLE decode_cache_size')
+    writer.close()
+
+    assert DecodeCache(path, max_bytes=1000).stats()['bytes'] == 150
@@ -0,0 +1,80 @@
+from catalyst_decoder.rbac import ChainIndex, Envelope
+
+
+def envelope(tx_id, slot, previous=None, stake_key=None, roles=None):
+    return Envelope(tx_id, slot, previous, 'ca7a1457-ef9f-4c7f-9c74-7f8c4a4cfa6c', stake_key, roles or {})
+
+
+def role(key_ref):
+    return {'signing_key_ref': key_ref, 'payment_key_ref': None}
+
+
+def test_child_before_its_parent_is_re_resolved_when_the_parent_arrives():
+    index = ChainIndex()
+    index.add(envelope('b', 20, previous='a', roles={3: role('b3')}))
+
+    waiting = index.resolve('b')
+    assert not waiting.complete
+    assert waiting.missing == 'a'
+
+    index.add(envelope('a', 10, stake_key='stake1', roles={0: role('a0')}))
+
+    state = index.resolve('b')
+    assert state.complete
+    assert (state.root, state.length, state.stake_key) == ('a', 2, 'stake1')
+    assert sorted(state.roles) == [0, 3]
+    assert index.roles_for_stake('stake1')['head_tx_id'] == 'b'
+
+
+def test_several_links_waiting_on_the_same_root():
+    index = ChainIndex()
+    index.add(envelope('c', 30, previous='b', roles={0: role('c0')}))
+    index.add(envelope('b', 20, previous='a'))
+    assert index.resolve('c').missing == 'a'
+
+    index.add(envelope('a', 10, stake_key='stake1', roles={0: role('a0')}))
+
+    state = index.resolve('c')
+    assert (state.root, state.length, state.missing) == ('a', 3, None)
+    assert state.roles[0]['signing_key_ref'] == 'c0'
+    assert state.roles[0]['tx_id'] == 'c'
+    assert index.roles_for_stake('stake1')['chain_length'] == 3
+
+
+def test_stake_key_moves_to_a_later_certificate():
+    index = ChainIndex().extend([
+        envelope('a', 10, stake_key='stake1', roles={0: role('a0')}),
+        envelope('b', 20, previous='a', stake_key='stake2'),
+    ])
+
+    assert index.roles_for_stake('stake1') is None
+    moved = index.roles_for_stake('stake2')
+    assert (moved['root_tx_id'], moved['head_tx_id']) == ('a', 'b')
+    assert moved['roles'][0]['signing_key_ref'] == 'a0'
+
+
+def test_stake_key_moves_on_a_link_that_arrived_first():
+    index = ChainIndex().extend([
+        envelope('b', 20, previous='a', stake_key='stake2'),
+        envelope('a', 10, stake_key='stake1', roles={0: role('a0')}),
+    ])
+
+    assert index.roles_for_stake('stake1') is None
+    assert index.roles_for_stake('stake2')['head_tx_id'] == 'b'
+
+
+def test_fork_resolves_each_branch_and_the_later_slot_is_the_head():
+    index = ChainIndex().extend([
+        envelope('a', 10, stake_key='stake1', roles={0: role('a0')}),
+        envelope('c', 30, previous='a', roles={0: role('c0')}),
+        # Arrives after c but is the earlier slot
+        envelope('b', 20, previous='a', roles={0: role('b0')}),
+    ])
+
+    assert (index.resolve('b').root, index.resolve('b').length) == ('a', 2)
+    assert (index.resolve('c').root, index.resolve('c').length) == ('a', 2)
+    assert index.resolve('b').roles[0]['signing_key_ref'] == 'b0'
+
+    current = index.roles_for_stake('stake1')
+    assert current['head_tx_id'] == 'c'
+    assert current['roles'][0]['signing_key_ref'] == 'c0'
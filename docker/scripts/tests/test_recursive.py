@@ -0,0 +1,52 @@
+import brotli
+import cbor2
+
+from catalyst_decoder.recursive import NOT_DECODED, RecursiveDecoder
+
+
+def test_node_budget_leaves_remaining_values_undecoded(capsys):
+    decoder = RecursiveDecoder(max_nodes=3)
+
+    # list, '01' and its decoded int use up the budget
+    assert decoder.decode(['01', '02', '03']) == [1, '02', '03']
+    assert decoder.budget_exhausted
+    assert capsys.readouterr().err.count('WARNING: Maximum nodes (3) reached') == 1
+
+
+def test_byte_budget_returns_bytes_as_hex(capsys):
+    decoder = RecursiveDecoder(max_bytes=2)
+
+    assert decoder.decode([b'\x01', b'\x02', b'\x03', b'\x04']) == [1, 2, '03', '04']
+    assert decoder.budget_exhausted
+    assert capsys.readouterr().err.count('WARNING: Byte budget (2) reached') == 1
+
+
+def test_within_budget_decodes_nested_items():
+    decoder = RecursiveDecoder()
+
+    assert decoder.decode(cbor2.dumps([1, {'a': b'\x02'}]).hex()) == [1, {'a': 2}]
+    assert not decoder.budget_exhausted
+
+
+def test_trailing_bytes_are_not_read_as_the_leading_int():
+    decoder = RecursiveDecoder()
+
+    # cbor2.loads(b'\x01\x02') is 1; the trailing byte means it is not one item
+    assert decoder.load_complete_cbor(b'\x01\x02') is NOT_DECODED
+    assert decoder.decode(b'\x01\x02') == '0102'
+
+
+def test_truncated_items_are_not_decoded():
+    decoder = RecursiveDecoder()
+
+    assert decoder.load_complete_cbor(b'\x1a\x00\x01') is NOT_DECODED
+    assert decoder.load_complete_cbor(b'\x83\x01\x02') is NOT_DECODED
+    assert decoder.decode(b'\x83\x01\x02') == '830102'
+
+
+def test_brotli_stream_starting_with_an_int_head_is_decompressed():
+    compressed = brotli.compress(cbor2.dumps({'title': 'x'}))
+    # 0x0b is also the head of the CBOR int 11
+    assert compressed[0] == 0x0b
+
+    assert RecursiveDecoder().decode(compressed) == {'title': 'x'}
@@ -0,0 +1,84 @@
+from catalyst_decoder.registrations import RegistrationIndex, index_transactions
+
+
+def transaction(tx_hash, slot, stake_key='stake1', nonce=1, delegations=(('aa', 1),)):
+    # json_metadata is already normalised; the tests feed it through unchanged
+    return {
+        'tx_hash': tx_hash,
+        'slot': slot,
+        'json_metadata': {
+            'txType': 'cip36',
+            'stake_key': stake_key,
+            'nonce': nonce,
+            'voting_purpose': 0,
+            'voter_delegations': [{'voting_key': key, 'weight': weight} for key, weight in delegations],
+        },
+    }
+
+
+def unchanged(metadata):
+    return metadata
+
+
+STREAM = [
+    transaction('tx1', 10, 'stake1', nonce=1),
+    transaction('tx2', 20, 'stake2', nonce=1),
+    transaction('tx3', 20, 'stake3', nonce=1),
+    transaction('tx4', 30, 'stake1', nonce=2, delegations=(('bb', 1),)),
+]
+
+
+def test_feeding_the_same_stream_twice_indexes_nothing_the_second_time(tmp_path):
+    index = RegistrationIndex(str(tmp_path / 'index.db'))
+
+    first = index_transactions(index, unchanged, STREAM)
+    second = index_transactions(index, unchanged, STREAM)
+
+    assert first.indexed == 4
+    assert second.indexed == 0
+    assert index.stats()['registrations'] == 4
+    assert index.checkpoint() == {'slot': 30, 'tx_id': 'tx4', 'transactions': 4}
+
+
+def test_resuming_in_the_middle_of_a_slot(tmp_path):
+    path = str(tmp_path / 'index.db')
+    index = RegistrationIndex(path)
+    # Stopped after the first transaction of slot 20
+    index_transactions(index, unchanged, STREAM[:2])
+    index.close()
+
+    index = RegistrationIndex(path)
+    stats = index_transactions(index, unchanged, STREAM)
+
+    # Slot 10 is before the checkpoint; tx2 is in the checkpoint slot and already indexed
+    assert stats.indexed == 2
+    assert stats.skipped == 2
+    assert index.stats()['registrations'] == 4
+    assert index.checkpoint() == {'slot': 30, 'tx_id': 'tx4', 'transactions': 4}
+    assert index.latest_registration('stake3')['tx_id'] == 'tx3'
+
+
+def test_lower_nonce_in_a_later_slot_does_not_replace_the_latest_registration(tmp_path):
+    index = RegistrationIndex(str(tmp_path / 'index.db'))
+    index_transactions(index, unchanged, [
+        transaction('tx1', 10, 'stake1', nonce=5, delegations=(('aa', 1), ('bb', 3))),
+        transaction('tx2', 20, 'stake1', nonce=4, delegations=(('cc', 1),)),
+    ])
+
+    assert index.latest_registration('stake1')['tx_id'] == 'tx1'
+    assert [(d['stake_key'], d['weight'], d['tx_id']) for d in index.delegators('bb')] == [('stake1', 3, 'tx1')]
+    assert index.delegators('cc') == []
+    # Both are still indexed as registrations
+    assert index.registration('tx2')['nonce'] == 4
+
+
+def test_equal_nonce_in_a_later_slot_replaces_the_latest_registration(tmp_path):
+    index = RegistrationIndex(str(tmp_path / 'index.db'))
+    index_transactions(index, unchanged, [
+        transaction('tx1', 10, 'stake1', nonce=5, delegations=(('aa', 1),)),
+        transaction('tx2', 20, 'stake1', nonce=5, delegations=(('cc', 1),)),
+    ])
+
+    assert index.latest_registration('stake1')['tx_id'] == 'tx2'
+    assert index.delegators('aa') == []
+    assert [d['tx_id'] for d in index.delegators('cc')] == ['tx2']
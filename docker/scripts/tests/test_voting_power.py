@@ -0,0 +1,89 @@
+import numpy as np
+
+from catalyst_decoder.voting_power import DelegationTable, split_stake
+
+
+def registration(stake_key, delegations, nonce=1, purpose=0):
+    return {
+        'stake_key': stake_key,
+        'nonce': nonce,
+        'voting_purpose': purpose,
+        'voter_delegations': [{'voting_key': key, 'weight': weight} for key, weight in delegations],
+    }
+
+
+def powers(table, amounts, purpose=0):
+    return {item['voting_key']: item['voting_power'] for item in table.voting_power(amounts, purpose)}
+
+
+def test_floor_split_gives_the_remainder_to_the_last_delegation():
+    table = DelegationTable().extend([registration('stake1', [('a', 1), ('b', 1), ('c', 1)])])
+
+    assert powers(table, {'stake1': 10}) == {'a': 3, 'b': 3, 'c': 4}
+
+
+def test_split_assigns_the_whole_stake_of_every_registration():
+    power = split_stake(
+        np.array([0, 0, 1, 1, 1]),
+        np.array([3, 7, 1, 2, 4]),
+        np.array([1001, 50]),
+    )
+
+    # floor(1001 * 3 / 10) = 300, 701 for the last; floor(50 * 1 / 7) = 7, floor(50 * 2 / 7) = 14, 29 for the last
+    assert power.tolist() == [300, 701, 7, 14, 29]
+
+
+def test_all_weights_zero_assigns_nothing():
+    table = DelegationTable().extend([registration('stake1', [('a', 0), ('b', 0)])])
+
+    assert powers(table, {'stake1': 1000}) == {'a': 0, 'b': 0}
+
+
+def test_highest_nonce_wins():
+    table = DelegationTable().extend([
+        registration('stake1', [('a', 1)], nonce=5),
+        registration('stake1', [('b', 1)], nonce=9),
+        registration('stake1', [('c', 1)], nonce=7),
+    ])
+
+    assert table.latest_registrations().tolist() == [False, True, False]
+    assert powers(table, {'stake1': 100}) == {'b': 100}
+
+
+def test_later_slot_breaks_a_nonce_tie():
+    # Registrations are added in slot order, as RegistrationIndex.voter_registrations yields them
+    table = DelegationTable().extend([
+        registration('stake1', [('a', 1)], nonce=5),
+        registration('stake1', [('b', 1)], nonce=5),
+        registration('stake2', [('c', 1)], nonce=1),
+    ])
+
+    assert table.latest_registrations().tolist() == [False, True, True]
+    assert powers(table, {'stake1': 100, 'stake2': 20}) == {'b': 100, 'c': 20}
+
+
+def test_purpose_filter():
+    table = DelegationTable().extend([
+        registration('stake1', [('a', 1)], nonce=1, purpose=0),
+        registration('stake1', [('b', 1)], nonce=2, purpose=7),
+        # CIP-15: no purpose, counts as Catalyst
+        {'stake_key': 'stake2', 'nonce': 1, 'voter_delegations': [{'voting_key': 'c', 'weight': 1}]},
+    ])
+
+    assert powers(table, {'stake1': 100, 'stake2': 20}) == {'a': 100, 'c': 20}
+    assert powers(table, {'stake1': 100, 'stake2': 20}, purpose=7) == {'b': 100}
+    # No filter: the highest nonce across purposes
+    assert powers(table, {'stake1': 100, 'stake2': 20}, purpose=None) == {'b': 100, 'c': 20}
+
+
+def test_weights_too_large_for_int64_products():
+    weights = [3 * 2 ** 40, 2 ** 40 + 1]
+    stake = 45_000_000_000_000_007
+    total = sum(weights)
+    # remainder * weight would overflow int64, so these rows take the Python integer branch
+    assert total > np.iinfo(np.int64).max // weights[0]
+
+    power = split_stake(np.array([0, 0]), np.array(weights), np.array([stake]))
+
+    first = stake * weights[0] // total
+    assert power.tolist() == [first, stake - first]